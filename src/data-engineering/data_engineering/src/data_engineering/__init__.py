@@ -1 +0,0 @@
-import arcgis
\ No newline at end of file
@@ -0,0 +1,175 @@
+from functools import lru_cache, partial
+import argparse
+import asyncio
+import os
+import pandas as pd
+
+
+# The commands import ArcGIS and scikit-learn on first use, so local commands start fast
+CATEGORICAL_COLS = ["uwochentag", "uart", "ukategorie", "ulichtverh", "ist_strasse"]
+NUMERIC_COLS = ["ustunde"]
+
+
+@lru_cache(maxsize=1)
+def get_gis():
+    """Logs in to ArcGIS Online using the ARCGIS_API_KEY environment variable when a command first needs the GIS.
+
+    Returns:
+        An authenticated GIS object.
+    """
+    from arcgis.gis import GIS
+
+    api_key = os.getenv("ARCGIS_API_KEY")
+    if not api_key:
+        raise ValueError("ARCGIS_API_KEY environment variable is not set!")
+    return GIS(api_key=api_key)
+
+def get_traffic_data_filepath(filepath: str = None) -> str:
+    """Gets the traffic database filepath, defaults to the traffic_data_file environment variable."""
+    filepath = filepath or os.getenv("traffic_data_file")
+    if not filepath:
+        raise ValueError("traffic_data_file environment variable is not set!")
+    return filepath
+
+def write_frame(data_frame: pd.DataFrame, output: str = None):
+    """Writes a DataFrame as JSON records to stdout, or to a JSON, CSV or Parquet file.
+
+    Args:
+        data_frame (pd.DataFrame): The DataFrame to write.
+        output (str, optional): The output filepath, the extension selects the format. Defaults to stdout.
+    """
+    if not output:
+        print(data_frame.to_json(orient="records"))
+    elif output.endswith(".parquet"):
+        if "SHAPE" in data_frame.columns:
+            data_frame.spatial.to_parquet(output)
+        else:
+            data_frame.to_parquet(output)
+    elif output.endswith(".csv"):
+        data_frame.to_csv(output, index=False)
+    elif output.endswith(".json"):
+        data_frame.to_json(output, orient="records")
+    else:
+        raise ValueError("The output must be a JSON, CSV or Parquet file!")
+
+def print_frame(data_frame: pd.DataFrame, columns: list[str]):
+    data_frame.info()
+    print(data_frame[columns].describe())
+    print(data_frame.to_json(orient="records"))
+
+def explore(args: argparse.Namespace):
+    from data_engineering.orchestration import gather_sources
+    from data_engineering.utils import fetch_charging_stations, fetch_traffic_accidents
+    from urban_traffic.utils import fetch_traffic_data
+
+    gis = get_gis()
+    traffic_data_filepath = get_traffic_data_filepath(args.filepath)
+
+    # The portal queries and the local database read are independent
+    frames = asyncio.run(gather_sources({
+        "charging_stations": partial(fetch_charging_stations, gis, max_record_count=args.max_record_count),
+        "traffic_accidents": partial(fetch_traffic_accidents, gis, max_record_count=args.max_record_count),
+        "traffic_data": partial(fetch_traffic_data, traffic_data_filepath, max_record_count=args.max_record_count),
+    }, max_concurrency=3, timeout=args.timeout))
+    print_frame(frames["charging_stations"], ["Anzahl_Ladepunkte", "Inbetriebnahmedatum"])
+    print_frame(frames["traffic_accidents"], ["UART", "UTYP1"])
+    print_frame(frames["traffic_data"], ["vehicle_type", "trip_time"])
+
+def fetch(args: argparse.Namespace):
+    from data_engineering.utils import fetch_charging_stations, fetch_traffic_accidents
+
+    fetch_source = fetch_charging_stations if "charging-stations" == args.source else fetch_traffic_accidents
+    data_frame = fetch_source(get_gis(), max_record_count=args.max_record_count, return_all_records=args.all)
+    write_frame(data_frame, args.output)
+
+def traffic(args: argparse.Namespace):
+    from urban_traffic.utils import read_traffic_sql
+
+    write_frame(read_traffic_sql(get_traffic_data_filepath(args.filepath), args.limit, args.compact), args.output)
+
+def prepare(args: argparse.Namespace):
+    from urban_traffic.utils import filter_commute_cars, prepare_traffic, read_traffic_sql
+
+    filepath = get_traffic_data_filepath(args.filepath)
+    if 1 < args.workers:
+        if 0 < args.limit:
+            raise ValueError("The limit cannot be combined with multiple workers!")
+        from urban_traffic.pipeline import run_traffic_pipeline
+        traffic_df = run_traffic_pipeline(filepath, args.commute, args.compact, args.workers)
+    else:
+        traffic_df = prepare_traffic(read_traffic_sql(filepath, args.limit, args.compact), inplace=True)
+        if args.commute:
+            traffic_df = filter_commute_cars(traffic_df)
+    write_frame(traffic_df, args.output)
+
+def read_table(filepath: str) -> pd.DataFrame:
+    """Reads a CSV or Parquet table, any other filepath is read as a local feature class."""
+    if filepath.endswith(".csv"):
+        return pd.read_csv(filepath)
+    if filepath.endswith(".parquet"):
+        return pd.read_parquet(filepath)
+
+    from arcgis.features import GeoAccessor
+    return GeoAccessor.from_featureclass(filepath)
+
+def train(args: argparse.Namespace):
+    from urban_traffic.model import save_model, train_model
+    from urban_traffic.utils import prepare_traffic_accidents
+
+    traffic_accidents = read_table(args.input)
+    target_col = "utyp1_grouped"
+    if target_col not in traffic_accidents.columns:
+        traffic_accidents, target_col = prepare_traffic_accidents(traffic_accidents)
+    traffic_accidents = traffic_accidents.dropna(subset=[target_col])
+    search = train_model(traffic_accidents, CATEGORICAL_COLS, NUMERIC_COLS, target_col, cv=args.cv, n_jobs=args.n_jobs)
+    save_model(search.best_estimator_, args.model)
+    print(f"Best parameters: {search.best_params_}")
+    print(f"Cross-validated accuracy: {search.best_score_:.2f}")
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="data-engineering", description="Fetches, prepares and models the Frankfurt am Main samples.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    explore_parser = subparsers.add_parser("explore", help="Fetches and describes the portal and traffic data concurrently.")
+    explore_parser.add_argument("--filepath", help="The traffic database. Defaults to the traffic_data_file environment variable.")
+    explore_parser.add_argument("--max-record-count", type=int, default=10)
+    explore_parser.add_argument("--timeout", type=float, default=120, help="The maximum number of seconds of every fetch.")
+    explore_parser.set_defaults(handler=explore)
+
+    fetch_parser = subparsers.add_parser("fetch", help="Fetches features from the portal.")
+    fetch_parser.add_argument("source", choices=["charging-stations", "traffic-accidents"])
+    fetch_parser.add_argument("--max-record-count", type=int, default=1000)
+    fetch_parser.add_argument("--all", action="store_true", help="Fetch all records in parallel pages.")
+    fetch_parser.add_argument("--output", help="A JSON, CSV or Parquet file. Defaults to JSON on stdout.")
+    fetch_parser.set_defaults(handler=fetch)
+
+    traffic_parser = subparsers.add_parser("traffic", help="Reads agent positions from the traffic database.")
+    traffic_parser.add_argument("--filepath", help="The traffic database. Defaults to the traffic_data_file environment variable.")
+    traffic_parser.add_argument("--limit", type=int, default=1000, help="The maximum number of rows, 0 reads all rows.")
+    traffic_parser.add_argument("--compact", action="store_true", help="Read the rows using compact Arrow backed types.")
+    traffic_parser.add_argument("--output", help="A JSON, CSV or Parquet file. Defaults to JSON on stdout.")
+    traffic_parser.set_defaults(handler=traffic)
+
+    prepare_parser = subparsers.add_parser("prepare", help="Prepares the agent positions for analysis.")
+    prepare_parser.add_argument("--filepath", help="The traffic database. Defaults to the traffic_data_file environment variable.")
+    prepare_parser.add_argument("--limit", type=int, default=0, help="The maximum number of rows, 0 reads all rows.")
+    prepare_parser.add_argument("--commute", action="store_true", help="Keep only the commuting cars.")
+    prepare_parser.add_argument("--compact", action="store_true", help="Read the rows using compact Arrow backed types.")
+    prepare_parser.add_argument("--workers", type=int, default=1, help="The number of worker processes over rowid partitions.")
+    prepare_parser.add_argument("--output", help="A JSON, CSV or Parquet file. Defaults to JSON on stdout.")
+    prepare_parser.set_defaults(handler=prepare)
+
+    train_parser = subparsers.add_parser("train", help="Trains the traffic accident model.")
+    train_parser.add_argument("--input", required=True, help="A CSV or Parquet table or a feature class of traffic accidents.")
+    train_parser.add_argument("--model", required=True, help="The filepath of the trained model.")
+    train_parser.add_argument("--cv", type=int, default=5, help="The number of cross-validation folds.")
+    train_parser.add_argument("--n-jobs", type=int, default=-1, help="The number of parallel fits, -1 uses all cores.")
+    train_parser.set_defaults(handler=train)
+    return parser
+
+def main(arguments: list[str] = None):
+    args = create_parser().parse_args(arguments)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+
+def point_coordinates(spatial_features: pd.DataFrame, x_column: str = None, y_column: str = None) -> tuple[np.ndarray, np.ndarray]:
+    """Extracts the point coordinates of a DataFrame as arrays.
+
+    Args:
+        spatial_features (pd.DataFrame): A DataFrame containing points.
+        x_column (str, optional): The column containing the x coordinates. Defaults to the geometry column.
+        y_column (str, optional): The column containing the y coordinates. Defaults to the geometry column.
+
+    Returns:
+        A tuple containing the x and y coordinates.
+    """
+    if x_column and y_column:
+        return spatial_features[x_column].to_numpy(dtype=np.float64), spatial_features[y_column].to_numpy(dtype=np.float64)
+
+    geometries = spatial_features[spatial_features.spatial.name]
+    x = np.fromiter((geometry["x"] for geometry in geometries), dtype=np.float64, count=len(geometries))
+    y = np.fromiter((geometry["y"] for geometry in geometries), dtype=np.float64, count=len(geometries))
+    return x, y
+
+def polygon_edges(rings: list) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Collects the edges of all rings of a polygon into arrays.
+
+    Args:
+        rings (list): The rings of the polygon, each a list of [x, y] positions.
+
+    Returns:
+        A tuple containing the x1, y1, x2 and y2 arrays of the edges.
+    """
+    starts = []
+    ends = []
+    for ring in rings:
+        positions = np.asarray(ring, dtype=np.float64)
+        if len(positions) < 2:
+            continue
+        positions = positions[:, :2]
+        if not np.array_equal(positions[0], positions[-1]):
+            positions = np.vstack([positions, positions[:1]])
+        starts.append(positions[:-1])
+        ends.append(positions[1:])
+
+    if not starts:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty, empty, empty
+    starts = np.concatenate(starts)
+    ends = np.concatenate(ends)
+    return starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1]
+
+def points_in_polygon(x: np.ndarray, y: np.ndarray, edges: tuple, batch_size: int = 1_000_000) -> np.ndarray:
+    """Tests which points are inside a polygon using the even-odd rule.
+
+    The points are tested against all edges at once, in batches of at most
+    batch_size point-edge pairs. Holes are handled by the even-odd rule.
+
+    Args:
+        x (np.ndarray): The x coordinates of the points.
+        y (np.ndarray): The y coordinates of the points.
+        edges (tuple): The x1, y1, x2 and y2 arrays of the polygon edges.
+        batch_size (int, optional): The maximum number of point-edge pairs per batch. Defaults to 1000000.
+
+    Returns:
+        A boolean array which is True for the points inside the polygon.
+    """
+    x1, y1, x2, y2 = edges
+    inside = np.zeros(len(x), dtype=bool)
+    if 0 == len(x1):
+        return inside
+
+    points_per_batch = max(1, batch_size // len(x1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, len(x), points_per_batch):
+            px = x[start:start + points_per_batch, np.newaxis]
+            py = y[start:start + points_per_batch, np.newaxis]
+            straddles = (y1 > py) != (y2 > py)
+            crosses = straddles & (px < (x2 - x1) * (py - y1) / (y2 - y1) + x1)
+            inside[start:start + points_per_batch] = np.count_nonzero(crosses, axis=1) % 2 == 1
+    return inside
@@ -0,0 +1,333 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Generator, Iterator
+import atexit
+import functools
+import importlib
+import inspect
+import json
+import os
+import threading
+import time
+
+
+PROFILE_ENV = "DATA_ENGINEERING_PROFILE"
+
+# The portal methods are patched while a run is active, modules which cannot be imported are skipped.
+# Portal functions imported into a module are wrapped using instrumented(category="portal") instead.
+PORTAL_CALLS = [
+    ("arcgis.gis", "ContentManager.get"),
+    ("arcgis.features", "FeatureLayer.query"),
+]
+
+_run = None
+_run_lock = threading.Lock()
+# The open spans of the current context, workers started using contextvars.copy_context inherit them
+_open_spans: ContextVar[tuple] = ContextVar("open_spans", default=())
+
+
+@dataclass
+class Span:
+    """A single recorded call."""
+    name: str
+    category: str
+    thread_id: int
+    parent: str
+    start_ns: int
+    end_ns: int = 0
+    rows: int = None
+    portal_calls: int = 0
+    bytes_read: int = 0
+    error: str = None
+    active_ns: int = None
+
+    @property
+    def seconds(self) -> float:
+        # Generator spans only count the time spent producing their items
+        if self.active_ns is not None:
+            return self.active_ns / 1e9
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+def _row_count(result) -> int:
+    if isinstance(result, tuple):
+        return _row_count(result[0]) if result else None
+    if hasattr(result, "shape"):
+        return int(result.shape[0]) if result.shape else None
+    if hasattr(result, "features"):
+        return len(result.features)
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return None
+
+def _item_rows(item) -> int:
+    # Generators yield either chunks, e.g. DataFrames, or single records
+    if isinstance(item, tuple) and item:
+        return _item_rows(item[0])
+    if hasattr(item, "shape") and item.shape:
+        return int(item.shape[0])
+    return 1
+
+
+class ProfileRun:
+    """Records the instrumented calls of a pipeline run."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.bytes_read = 0
+        self._lock = threading.Lock()
+
+    def call(self, name: str, category: str, func: Callable, args: tuple, kwargs: dict):
+        """Calls the function and records a span, recursive calls are part of the outermost span.
+
+        Returned generators are wrapped, so the span includes the time and rows of their iteration.
+        """
+        stack = _open_spans.get()
+        if any(name == open_span.name for open_span in stack):
+            return func(*args, **kwargs)
+
+        span = Span(name, category, threading.get_ident(), stack[-1].name if stack else None, time.perf_counter_ns())
+        token = _open_spans.set(stack + (span,))
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as error:
+            span.error = type(error).__name__
+            self._pop(span, token)
+            self._finish(span)
+            raise
+        self._pop(span, token)
+
+        if inspect.isgenerator(result):
+            span.active_ns = span.end_ns - span.start_ns
+            return self._iterate(span, result)
+        span.rows = _row_count(result)
+        self._finish(span)
+        return result
+
+    def _pop(self, span: Span, token):
+        span.end_ns = time.perf_counter_ns()
+        _open_spans.reset(token)
+        if "portal" == span.category:
+            # The open spans may belong to the thread which started this worker
+            with self._lock:
+                for open_span in _open_spans.get():
+                    open_span.portal_calls += 1
+
+    def add_bytes(self, byte_count: int):
+        """Credits bytes read by a reader to the run and to all open spans of the current context."""
+        with self._lock:
+            self.bytes_read += byte_count
+            for open_span in _open_spans.get():
+                open_span.bytes_read += byte_count
+
+    def _iterate(self, span: Span, generator: Generator) -> Generator:
+        # Every step runs within the context of the consumer, so nested calls refer to the span
+        span.rows = 0
+        try:
+            while True:
+                token = _open_spans.set(_open_spans.get() + (span,))
+                step_start_ns = time.perf_counter_ns()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                except BaseException as error:
+                    span.error = type(error).__name__
+                    raise
+                finally:
+                    span.active_ns += time.perf_counter_ns() - step_start_ns
+                    _open_spans.reset(token)
+                span.rows += _item_rows(item)
+                yield item
+        finally:
+            generator.close()
+            span.end_ns = time.perf_counter_ns()
+            self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> dict:
+        """Aggregates the spans by function.
+
+        Returns:
+            A dict containing the wall time of the run, the portal round-trips, the bytes read and one entry for every function.
+        """
+        end_ns = self.end_ns or time.perf_counter_ns()
+        with self._lock:
+            spans = list(self.spans)
+
+        functions = {}
+        for span in spans:
+            entry = functions.setdefault(span.name, {
+                "category": span.category, "calls": 0, "errors": 0, "seconds": 0.0,
+                "rows": 0, "portal_calls": 0, "bytes_read": 0,
+            })
+            entry["calls"] += 1
+            entry["errors"] += span.error is not None
+            entry["seconds"] += span.seconds
+            entry["rows"] += span.rows or 0
+            entry["portal_calls"] += span.portal_calls
+            entry["bytes_read"] += span.bytes_read
+        return {
+            "wall_seconds": (end_ns - self.start_ns) / 1e9,
+            "portal_calls": sum(1 for span in spans if "portal" == span.category),
+            "bytes_read": self.bytes_read,
+            "functions": dict(sorted(functions.items(), key=lambda item: -item[1]["seconds"])),
+        }
+
+    def trace_events(self) -> list[dict]:
+        """Converts the spans into complete events of the Chrome trace format, e.g. for Perfetto or speedscope."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start_ns)
+        return [{
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": (span.start_ns - self.start_ns) / 1e3,
+            "dur": (span.end_ns - span.start_ns) / 1e3,
+            "pid": os.getpid(),
+            "tid": span.thread_id,
+            "args": {
+                key: value for key, value in (("rows", span.rows), ("bytes_read", span.bytes_read or None), ("error", span.error))
+                if value is not None
+            },
+        } for span in spans]
+
+    def write(self, filepath_prefix: str) -> tuple[str, str]:
+        """Writes the summary and the trace.
+
+        Args:
+            filepath_prefix (str): The prefix of the JSON files.
+
+        Returns:
+            A tuple containing: the filepath of the summary, and the filepath of the trace.
+        """
+        summary_path = f"{filepath_prefix}.json"
+        trace_path = f"{filepath_prefix}.trace.json"
+        with open(summary_path, "w", encoding="utf-8") as file_out:
+            json.dump(self.summary(), file_out, indent=2)
+        with open(trace_path, "w", encoding="utf-8") as file_out:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, file_out)
+        return summary_path, trace_path
+
+
+def instrumented(func: Callable = None, *, category: str = "function") -> Callable:
+    """Records the calls of a function while a profile run is active.
+
+    When no run is active, the wrapper only checks a module global before calling the function.
+
+    Args:
+        func (Callable): The function to instrument.
+        category (str, optional): The category of the spans, portal spans count as round-trips. Defaults to "function".
+
+    Returns:
+        The wrapped function.
+    """
+    def decorate(func: Callable) -> Callable:
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = _run
+            if run is None:
+                return func(*args, **kwargs)
+            return run.call(name, category, func, args, kwargs)
+        return wrapper
+
+    return decorate(func) if func else decorate
+
+def record_bytes(byte_count: int):
+    """Records the bytes read by a reader, e.g. of a GeoJSON file, for the open spans.
+
+    When no run is active, only a module global is checked.
+
+    Args:
+        byte_count (int): The number of bytes read.
+    """
+    run = _run
+    if run is not None:
+        run.add_bytes(byte_count)
+
+def _resolve_portal_calls() -> list[tuple[type, str, Callable]]:
+    targets = []
+    for module_name, attribute_path in PORTAL_CALLS:
+        class_name, attribute = attribute_path.split(".")
+        try:
+            owner = getattr(importlib.import_module(module_name), class_name, None)
+        except ImportError:
+            continue
+        if owner is not None and hasattr(owner, attribute):
+            targets.append((owner, attribute, owner.__dict__.get(attribute)))
+    return targets
+
+def _start_run() -> ProfileRun:
+    global _run
+    run = ProfileRun()
+    run._patched = _resolve_portal_calls()
+    for owner, attribute, _ in run._patched:
+        setattr(owner, attribute, instrumented(getattr(owner, attribute), category="portal"))
+    _run = run
+    return run
+
+def _stop_run(run: ProfileRun):
+    global _run
+    _run = None
+    run.end_ns = time.perf_counter_ns()
+    for owner, attribute, original in reversed(run._patched):
+        if original is None:
+            # The method was inherited, so the base class method becomes visible again
+            delattr(owner, attribute)
+        else:
+            setattr(owner, attribute, original)
+
+def active_run() -> ProfileRun:
+    """Gets the active profile run, None if instrumentation is disabled."""
+    return _run
+
+@contextmanager
+def profile_run(filepath_prefix: str = None) -> Iterator[ProfileRun]:
+    """Enables the instrumentation and counts the portal round-trips within the block.
+
+    Nested blocks record into the outer run.
+
+    Args:
+        filepath_prefix (str, optional): Writes the summary and the trace using this prefix when the block exits.
+
+    Returns:
+        The active profile run.
+    """
+    with _run_lock:
+        outer_run = _run
+        run = outer_run or _start_run()
+    try:
+        yield run
+    finally:
+        if outer_run is None:
+            with _run_lock:
+                _stop_run(run)
+            if filepath_prefix:
+                run.write(filepath_prefix)
+
+def _start_from_environment():
+    # The environment variable contains the filepath prefix of the results
+    filepath_prefix = os.environ.get(PROFILE_ENV)
+    if not filepath_prefix:
+        return
+
+    with _run_lock:
+        run = _start_run()
+
+    def write_run():
+        with _run_lock:
+            if _run is run:
+                _stop_run(run)
+        run.write(filepath_prefix)
+    atexit.register(write_run)
+
+
+_start_from_environment()
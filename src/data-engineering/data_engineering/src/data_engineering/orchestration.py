@@ -0,0 +1,81 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Callable
+import asyncio
+
+
+async def _run_source(name: str, source: Callable, semaphore: asyncio.Semaphore, executor: Executor, timeout: float):
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+
+        def run_source():
+            loop.call_soon_threadsafe(started.set)
+            return source()
+
+        # The timeout starts when a worker runs the source, waiting for a slot or a busy worker is not counted
+        # The source runs in a copy of the current context, e.g. the open spans of an active profile run
+        future = loop.run_in_executor(executor, copy_context().run, run_source)
+        started_waiter = asyncio.ensure_future(started.wait())
+        await asyncio.wait([future, started_waiter], return_when=asyncio.FIRST_COMPLETED)
+        started_waiter.cancel()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Fetching {name} timed out after {timeout} seconds!") from None
+
+async def gather_sources(
+        sources: dict[str, Callable],
+        max_concurrency: int = 4,
+        timeout: float = None,
+        executor: Executor = None,
+        return_exceptions: bool = False) -> dict:
+    """Fetches independent sources concurrently, e.g. portal queries and local database reads.
+
+    The blocking fetches run in an executor, so the total latency is the slowest fetch instead of the sum.
+    A timeout only stops waiting for a fetch, the fetch itself cannot be interrupted and keeps running
+    in its worker thread until it returns. Until then it occupies the worker, later fetches wait for a free
+    worker before their own timeout starts.
+
+    Args:
+        sources (dict[str, Callable]): The fetch function of every source without arguments, use functools.partial to bind them.
+        max_concurrency (int, optional): The maximum number of concurrent fetches. Defaults to 4.
+        timeout (float, optional): The maximum number of seconds of every fetch, counted from when it starts running. Defaults to no timeout.
+        executor (Executor, optional): The executor running the fetches. Defaults to a thread pool of max_concurrency threads.
+        return_exceptions (bool, optional): Return the exception of a failed fetch instead of raising it. Defaults to False.
+
+    Returns:
+        A dict containing the result of every source.
+    """
+    if max_concurrency < 1:
+        raise ValueError("The maximum concurrency must be at least 1!")
+
+    owned_executor = executor is None
+    if owned_executor:
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="gather_sources")
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    try:
+        results = await asyncio.gather(
+            *(_run_source(name, source, semaphore, executor, timeout) for name, source in sources.items()),
+            return_exceptions=return_exceptions
+        )
+    finally:
+        if owned_executor:
+            # Timed out fetches cannot be interrupted, their threads finish in the background
+            executor.shutdown(wait=False, cancel_futures=True)
+    return dict(zip(sources.keys(), results))
+
+def gather_sources_blocking(sources: dict[str, Callable], max_concurrency: int = 4, timeout: float = None, return_exceptions: bool = False) -> dict:
+    """Fetches independent sources concurrently from synchronous code, e.g. a notebook cell without a running event loop.
+
+    Args:
+        sources (dict[str, Callable]): The fetch function of every source without arguments.
+        max_concurrency (int, optional): The maximum number of concurrent fetches. Defaults to 4.
+        timeout (float, optional): The maximum number of seconds of every fetch. Defaults to no timeout.
+        return_exceptions (bool, optional): Return the exception of a failed fetch instead of raising it. Defaults to False.
+
+    Returns:
+        A dict containing the result of every source.
+    """
+    return asyncio.run(gather_sources(sources, max_concurrency, timeout, return_exceptions=return_exceptions))
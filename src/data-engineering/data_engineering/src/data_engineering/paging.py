@@ -0,0 +1,169 @@
+from arcgis.features import FeatureLayer
+from arcgis.geometry.filters import intersects
+from arcgis.geometry import Envelope
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Iterator
+import pandas as pd
+import time
+
+
+def plan_object_id_pages(object_ids: list[int], page_size: int) -> list[tuple[int, int]]:
+    """Splits a list of object ids into inclusive OBJECTID ranges.
+
+    Every range covers at most page_size existing object ids, so gaps
+    in the id sequence never produce oversized or empty pages.
+
+    Args:
+        object_ids (list[int]): The object ids of the layer.
+        page_size (int): The maximum number of features per page.
+
+    Returns:
+        A list of (first, last) object id tuples in ascending order.
+    """
+    if page_size < 1:
+        raise ValueError("Page size must be a positive number!")
+
+    sorted_ids = sorted(object_ids)
+    return [
+        (sorted_ids[start], sorted_ids[min(start + page_size, len(sorted_ids)) - 1])
+        for start in range(0, len(sorted_ids), page_size)
+    ]
+
+def plan_offset_pages(record_count: int, page_size: int) -> list[tuple[int, int]]:
+    """Splits a record count into result offset pages.
+
+    Args:
+        record_count (int): The total number of features to fetch.
+        page_size (int): The maximum number of features per page.
+
+    Returns:
+        A list of (result_offset, result_record_count) tuples.
+    """
+    if page_size < 1:
+        raise ValueError("Page size must be a positive number!")
+
+    return [
+        (offset, min(page_size, record_count - offset))
+        for offset in range(0, record_count, page_size)
+    ]
+
+def query_with_retry(feature_layer: FeatureLayer, max_retries: int = 3, backoff: float = 0.5, **query_args):
+    """Queries a feature layer and retries failed requests with an exponential backoff.
+
+    Args:
+        feature_layer (FeatureLayer): The feature layer to query.
+        max_retries (int, optional): The number of retries after the first attempt. Defaults to 3.
+        backoff (float, optional): The initial delay between retries in seconds. Defaults to 0.5.
+        **query_args: The arguments passed to FeatureLayer.query.
+
+    Returns:
+        The query result.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return feature_layer.query(**query_args)
+        except Exception:
+            if max_retries <= attempt:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+def _page_size(feature_layer: FeatureLayer, page_size: int) -> int:
+    if page_size:
+        return page_size
+    return feature_layer.properties.get("maxRecordCount", 1000) or 1000
+
+def _object_id_field(feature_layer: FeatureLayer) -> str:
+    return feature_layer.properties.get("objectIdField", "OBJECTID") or "OBJECTID"
+
+def iter_feature_pages(
+        feature_layer: FeatureLayer,
+        where: str = "1=1",
+        out_fields: str = "*",
+        extent: Envelope = None,
+        page_size: int = None,
+        strategy: str = "objectid",
+        max_workers: int = 4,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        out_sr: int = None) -> Iterator[pd.DataFrame]:
+    """Fetches all matching features page by page using a bounded thread pool.
+
+    The pages are queried concurrently, but yielded in page order. At most
+    twice as many pages as workers are held in memory at the same time.
+
+    Args:
+        feature_layer (FeatureLayer): The feature layer to query.
+        where (str, optional): The where clause of the query. Defaults to "1=1".
+        out_fields (str, optional): The fields to return. Defaults to "*".
+        extent (Envelope, optional): An optional spatial extent to filter the features.
+        page_size (int, optional): The number of features per page. Defaults to the layer's maxRecordCount.
+        strategy (str, optional): Either "objectid" for OBJECTID ranges or "offset" for result offset pages. Defaults to "objectid".
+        max_workers (int, optional): The maximum number of concurrent requests. Defaults to 4.
+        max_retries (int, optional): The number of retries for every page. Defaults to 3.
+        backoff (float, optional): The initial delay between retries in seconds. Defaults to 0.5.
+        out_sr (int, optional): The wkid of the returned geometries. Defaults to the spatial reference of the layer.
+
+    Returns:
+        A generator of spatially enabled DataFrames, one for every page,
+        at least one even if no features match.
+    """
+    page_size = _page_size(feature_layer, page_size)
+    object_id_field = _object_id_field(feature_layer)
+    filter_args = {}
+    if extent:
+        filter_args["geometry_filter"] = intersects(extent, sr=extent.spatial_reference)
+    query_args = {"out_fields": out_fields, "return_all_records": False, "as_df": True, **filter_args}
+    if out_sr:
+        query_args["out_sr"] = out_sr
+
+    if "objectid" == strategy:
+        ids_result = query_with_retry(feature_layer, max_retries, backoff, where=where, return_ids_only=True, **filter_args)
+        object_ids = ids_result.get("objectIds") or []
+        object_id_field = ids_result.get("objectIdFieldName", object_id_field)
+        pages = [
+            {"where": f"({where}) AND ({object_id_field} BETWEEN {first} AND {last})"}
+            for first, last in plan_object_id_pages(object_ids, page_size)
+        ]
+    elif "offset" == strategy:
+        record_count = query_with_retry(feature_layer, max_retries, backoff, where=where, return_count_only=True, **filter_args)
+        pages = [
+            {"where": where, "result_offset": offset, "result_record_count": count, "order_by_fields": f"{object_id_field} ASC"}
+            for offset, count in plan_offset_pages(record_count, page_size)
+        ]
+    else:
+        raise ValueError(f"Unsupported paging strategy: {strategy}!")
+    if not pages:
+        # Without matching features one page is still queried, it carries the fields and the geometry column
+        pages = [{"where": where, "result_record_count": page_size}]
+
+    def fetch_page(page_args: dict) -> pd.DataFrame:
+        return query_with_retry(feature_layer, max_retries, backoff, **query_args, **page_args)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for page_args in pages:
+            # The workers run in a copy of the current context, so their queries count for the calling span
+            pending.append(executor.submit(copy_context().run, fetch_page, page_args))
+            if 2 * max_workers <= len(pending):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def fetch_all_features(feature_layer: FeatureLayer, **paging_args) -> pd.DataFrame:
+    """Fetches all matching features in parallel pages and combines them.
+
+    Args:
+        feature_layer (FeatureLayer): The feature layer to query.
+        **paging_args: The arguments passed to iter_feature_pages.
+
+    Returns:
+        A spatially enabled DataFrame containing all matching features,
+        an empty one with the fields of the layer if no features match.
+    """
+    pages = list(iter_feature_pages(feature_layer, **paging_args))
+    features = [page for page in pages if not page.empty]
+    if not features:
+        return pages[0]
+    return pd.concat(features, ignore_index=True)
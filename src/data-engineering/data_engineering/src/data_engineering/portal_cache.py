@@ -0,0 +1,146 @@
+from arcgis.gis import GIS, Item
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+from weakref import WeakKeyDictionary
+import threading
+import time
+
+
+DEFAULT_TTL = 3600.0
+DEFAULT_MAX_SIZE = 128
+
+
+class TTLCache:
+    """A thread-safe least recently used cache whose entries expire after a time to live.
+
+    Args:
+        ttl (float, optional): The time to live of an entry in seconds. Defaults to 3600.
+        max_size (int, optional): The maximum number of entries before the least recently used one is evicted. Defaults to 128.
+        clock (Callable, optional): The clock returning the current time in seconds. Defaults to time.monotonic.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_size: int = DEFAULT_MAX_SIZE, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Returns the cached value for the key or loads and caches it.
+
+        Args:
+            key (Hashable): The cache key.
+            loader (Callable): Creates the value if the key is missing or expired.
+
+        Returns:
+            The cached or newly loaded value.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[0]:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Load outside of the lock so that slow portal requests do not block other keys
+        value = loader()
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while self.max_size < len(self._entries):
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, key: Hashable = None):
+        """Removes one entry or, if no key is given, all entries from the cache.
+
+        Args:
+            key (Hashable, optional): The key of the entry to remove.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        """Returns the hit, miss and eviction counters and the current size of the cache."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._entries)}
+
+
+_portal_caches: "WeakKeyDictionary[GIS, TTLCache]" = WeakKeyDictionary()
+_portal_caches_lock = threading.Lock()
+
+def get_portal_cache(gis: GIS) -> TTLCache:
+    """Gets the lookup cache of a GIS, creating it on first use.
+
+    The cache lives as long as the GIS object.
+
+    Args:
+        gis (GIS): An authenticated GIS object.
+
+    Returns:
+        The lookup cache of the GIS.
+    """
+    with _portal_caches_lock:
+        cache = _portal_caches.get(gis)
+        if cache is None:
+            cache = TTLCache()
+            _portal_caches[gis] = cache
+        return cache
+
+def invalidate_portal_cache(gis: GIS = None, key: Hashable = None):
+    """Removes cached portal lookups.
+
+    Args:
+        gis (GIS, optional): The GIS whose cache should be invalidated. Defaults to all GIS objects.
+        key (Hashable, optional): The key of a single entry to remove. Defaults to all entries.
+    """
+    with _portal_caches_lock:
+        if gis is None:
+            caches = list(_portal_caches.values())
+        else:
+            caches = [_portal_caches[gis]] if gis in _portal_caches else []
+    for cache in caches:
+        cache.invalidate(key)
+
+def get_cached_item(gis: GIS, item_id: str) -> Item:
+    """Gets a portal item using the lookup cache of the GIS.
+
+    Args:
+        gis (GIS): An authenticated GIS object.
+        item_id (str): The id of the portal item.
+
+    Returns:
+        The portal item, None if it does not exist.
+    """
+    cache = get_portal_cache(gis)
+    item = cache.get_or_load(("item", item_id), lambda: gis.content.get(item_id))
+    if item is None:
+        # A missing item may be shared later, so it is looked up again next time
+        cache.invalidate(("item", item_id))
+    return item
+
+def get_cached_layer(gis: GIS, item_id: str, layer_index: int = 0):
+    """Gets a layer of a portal item using the lookup cache of the GIS.
+
+    Args:
+        gis (GIS): An authenticated GIS object.
+        item_id (str): The id of the portal item.
+        layer_index (int, optional): The index of the layer. Defaults to 0.
+
+    Returns:
+        The layer of the portal item.
+    """
+    return get_portal_cache(gis).get_or_load(("layer", item_id, layer_index), lambda: get_cached_item(gis, item_id).layers[layer_index])
@@ -0,0 +1,186 @@
+from arcgis.features import FeatureLayer, GeoAccessor
+from arcgis.geometry import Envelope
+from arcgis.geometry.filters import intersects
+from contextlib import contextmanager
+from data_engineering.instrumentation import record_bytes
+from data_engineering.paging import fetch_all_features, query_with_retry
+import hashlib
+import json
+import os
+import pandas as pd
+import threading
+
+
+class ResultCache:
+    """Caches feature layer query results as GeoParquet files in a local directory.
+
+    Every cached result is keyed by the layer url, the where clause, the extent and the
+    out fields. Every read requests the layer metadata again. Warm reads of a layer with an
+    unchanged last edit date are served without any feature query. Otherwise only the features
+    edited since the cached result was written are fetched and merged by object id. Layers
+    without an edit date field are refetched.
+
+    Args:
+        directory (str): The directory containing the cached results.
+        max_workers (int, optional): The maximum number of concurrent page requests. Defaults to 4.
+    """
+
+    def __init__(self, directory: str, max_workers: int = 4):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.hits = 0
+        self.refreshes = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def cache_key(layer_url: str, where: str = "1=1", extent: Envelope = None, out_fields: str = "*", out_sr: int = None) -> str:
+        """Creates the key of a cached query result.
+
+        Args:
+            layer_url (str): The url of the feature layer.
+            where (str, optional): The where clause of the query. Defaults to "1=1".
+            extent (Envelope, optional): An optional spatial extent of the query.
+            out_fields (str, optional): The fields of the query. Defaults to "*".
+            out_sr (int, optional): The wkid of the returned geometries. Defaults to the spatial reference of the layer.
+
+        Returns:
+            A hex digest identifying the query.
+        """
+        if not isinstance(out_fields, str):
+            out_fields = ",".join(sorted(out_fields))
+        query = {
+            "url": layer_url,
+            "where": where,
+            "extent": dict(extent) if extent else None,
+            "out_fields": out_fields,
+        }
+        if out_sr:
+            # Results in the spatial reference of the layer keep their existing keys
+            query["out_sr"] = out_sr
+        return hashlib.sha256(json.dumps(query, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        return os.path.join(self.directory, f"{key}.parquet"), os.path.join(self.directory, f"{key}.json")
+
+    def invalidate(self, feature_layer: FeatureLayer = None, where: str = "1=1", extent: Envelope = None, out_fields: str = "*", out_sr: int = None):
+        """Removes a cached query result or, if no feature layer is given, all cached results.
+
+        Args:
+            feature_layer (FeatureLayer, optional): The feature layer of the cached query.
+            where (str, optional): The where clause of the cached query. Defaults to "1=1".
+            extent (Envelope, optional): The spatial extent of the cached query.
+            out_fields (str, optional): The fields of the cached query. Defaults to "*".
+            out_sr (int, optional): The wkid of the cached geometries.
+        """
+        if feature_layer is None:
+            keys = {os.path.splitext(filename)[0] for filename in os.listdir(self.directory)}
+        else:
+            keys = {self.cache_key(feature_layer.url, where, extent, out_fields, out_sr)}
+        for key in keys:
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def fetch(self, feature_layer: FeatureLayer, where: str = "1=1", extent: Envelope = None, out_fields: str = "*", out_sr: int = None) -> pd.DataFrame:
+        """Fetches all matching features, serving unchanged features from the local cache.
+
+        Args:
+            feature_layer (FeatureLayer): The feature layer to query.
+            where (str, optional): The where clause of the query. Defaults to "1=1".
+            extent (Envelope, optional): An optional spatial extent to filter the features.
+            out_fields (str, optional): The fields to return. Defaults to "*".
+            out_sr (int, optional): The wkid of the returned geometries. Defaults to the spatial reference of the layer.
+
+        Returns:
+            A spatially enabled DataFrame containing all matching features.
+        """
+        key = self.cache_key(feature_layer.url, where, extent, out_fields, out_sr)
+        data_path, metadata_path = self._paths(key)
+        # Layer handles, e.g. of the portal cache, keep the properties they loaded first, so the edit dates are requested again
+        feature_layer._hydrate()
+        object_id_field = feature_layer.properties.get("objectIdField", "OBJECTID") or "OBJECTID"
+        edit_date_field = _edit_date_field(feature_layer)
+        last_edit_date = _last_edit_date(feature_layer)
+
+        if os.path.exists(data_path) and os.path.exists(metadata_path):
+            with open(metadata_path, "r", encoding="utf-8") as file_in:
+                metadata = json.load(file_in)
+            cached = GeoAccessor.from_parquet(data_path)
+            record_bytes(os.path.getsize(data_path))
+
+            # An unchanged last edit date needs no query at all, edited layers are refreshed if possible
+            if last_edit_date is not None and last_edit_date == metadata.get("last_edit_date"):
+                self.hits += 1
+                return cached
+            elif edit_date_field and edit_date_field in cached.columns and not cached.empty:
+                self.refreshes += 1
+                features = self._refresh(feature_layer, cached, where, extent, out_fields, out_sr, object_id_field, edit_date_field)
+            else:
+                self.misses += 1
+                features = fetch_all_features(feature_layer, where=where, out_fields=out_fields, extent=extent, max_workers=self.max_workers, out_sr=out_sr)
+        else:
+            self.misses += 1
+            features = fetch_all_features(feature_layer, where=where, out_fields=out_fields, extent=extent, max_workers=self.max_workers, out_sr=out_sr)
+
+        if features.empty:
+            # Empty results carry no schema worth caching
+            self.invalidate(feature_layer, where, extent, out_fields, out_sr)
+            return features
+
+        # Both files are replaced as a whole and the metadata last, readers never see a partially written result
+        with _replacing(data_path) as temp_path:
+            features.spatial.to_parquet(temp_path)
+        with _replacing(metadata_path) as temp_path:
+            with open(temp_path, "w", encoding="utf-8") as file_out:
+                json.dump({"url": feature_layer.url, "where": where, "out_fields": out_fields, "last_edit_date": last_edit_date}, file_out)
+        return features
+
+    def _refresh(self, feature_layer: FeatureLayer, cached: pd.DataFrame, where: str, extent: Envelope, out_fields: str, out_sr: int,
+                 object_id_field: str, edit_date_field: str) -> pd.DataFrame:
+        # The current object ids reveal the deleted features
+        filter_args = {"geometry_filter": intersects(extent, sr=extent.spatial_reference)} if extent else {}
+        ids_result = query_with_retry(feature_layer, where=where, return_ids_only=True, **filter_args)
+        object_ids = pd.Index(ids_result.get("objectIds") or [])
+
+        # Whole seconds are compared inclusively, the merge by object id makes repeated edits idempotent
+        edited_since = pd.Timestamp(cached[edit_date_field].max()).strftime("%Y-%m-%d %H:%M:%S")
+        edited = fetch_all_features(
+            feature_layer,
+            where=f"({where}) AND ({edit_date_field} >= TIMESTAMP '{edited_since}')",
+            out_fields=out_fields,
+            extent=extent,
+            max_workers=self.max_workers,
+            out_sr=out_sr
+        )
+
+        unchanged = cached[cached[object_id_field].isin(object_ids)]
+        if edited.empty:
+            return unchanged.reset_index(drop=True)
+
+        unchanged = unchanged[~unchanged[object_id_field].isin(edited[object_id_field])]
+        merged = pd.concat([unchanged, edited], ignore_index=True)
+        return merged.sort_values(object_id_field, ignore_index=True)
+
+@contextmanager
+def _replacing(path: str):
+    """Yields a temporary path next to the given path which replaces it once written successfully."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _edit_date_field(feature_layer: FeatureLayer) -> str:
+    edit_fields_info = feature_layer.properties.get("editFieldsInfo")
+    if not edit_fields_info:
+        return None
+    return edit_fields_info.get("editDateField")
+
+def _last_edit_date(feature_layer: FeatureLayer) -> int:
+    editing_info = feature_layer.properties.get("editingInfo")
+    if not editing_info:
+        return None
+    return editing_info.get("lastEditDate")
@@ -0,0 +1,224 @@
+from dataclasses import dataclass, field
+from typing import Any
+import json
+import numpy as np
+import pandas as pd
+
+
+# Marks a value which only exists in one of the compared structures
+MISSING = object()
+
+
+@dataclass
+class SnapshotDiff:
+    """The changes between two snapshots of a feature layer.
+
+    The added and modified rows are taken from the new snapshot, the removed rows from the old one.
+    The changed columns contain one boolean column per compared column for every modified row.
+    """
+    key: str
+    added: pd.DataFrame
+    removed: pd.DataFrame
+    modified: pd.DataFrame
+    changed_columns: pd.DataFrame
+    added_columns: list[str] = field(default_factory=list)
+    removed_columns: list[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.added.empty and self.removed.empty and self.modified.empty and not self.added_columns and not self.removed_columns
+
+    def summary(self) -> dict:
+        """Returns the number of added, removed and modified rows and the number of changes per column."""
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "modified": len(self.modified),
+            "changed_columns": {column: int(count) for column, count in self.changed_columns.sum().items() if count},
+            "added_columns": self.added_columns,
+            "removed_columns": self.removed_columns,
+        }
+
+
+# The kinds of geometries, points and multipart geometries are hashed from coordinate arrays
+NULL_GEOMETRY, POINT_GEOMETRY, PARTS_GEOMETRY, OTHER_GEOMETRY = range(4)
+PARTS_KEYS = ("rings", "paths", "points")
+
+
+def _geometry_kind(geometry) -> int:
+    if geometry is None or (isinstance(geometry, float) and np.isnan(geometry)):
+        return NULL_GEOMETRY
+    if isinstance(geometry, dict):
+        # The spatial reference of every geometry is the one of the snapshot
+        size = len(geometry) - ("spatialReference" in geometry)
+        if 2 == size and "x" in geometry and "y" in geometry:
+            return POINT_GEOMETRY
+        if 1 == size and any(key in geometry for key in PARTS_KEYS):
+            return PARTS_GEOMETRY
+    return OTHER_GEOMETRY
+
+def _geometry_key(geometry) -> str:
+    return json.dumps(geometry, sort_keys=True, default=str)
+
+def _point_hashes(geometries: np.ndarray) -> np.ndarray:
+    x = np.fromiter((geometry["x"] for geometry in geometries), dtype=np.float64, count=len(geometries))
+    y = np.fromiter((geometry["y"] for geometry in geometries), dtype=np.float64, count=len(geometries))
+    return pd.util.hash_pandas_object(pd.DataFrame({"x": x, "y": y}), index=False).to_numpy()
+
+def _parts_hashes(geometries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Collects the vertices of all parts into arrays, positions other than x and y are hashed as JSON
+    kinds, parts, vertex_counts, extractable = [], [], [], np.ones(len(geometries), dtype=bool)
+    for index, geometry in enumerate(geometries):
+        parts_key = next(key for key in PARTS_KEYS if key in geometry)
+        geometry_parts = geometry[parts_key] if "points" != parts_key else [geometry[parts_key]]
+        try:
+            positions = [np.asarray(part, dtype=np.float64).reshape(len(part), 2) for part in geometry_parts]
+        except (TypeError, ValueError):
+            extractable[index] = False
+            positions = []
+        kinds.append(PARTS_KEYS.index(parts_key))
+        parts.extend(positions)
+        vertex_counts.append([len(part_positions) for part_positions in positions])
+
+    part_counts = np.array([len(counts) for counts in vertex_counts], dtype=np.int64)
+    part_sizes = np.fromiter((count for counts in vertex_counts for count in counts), dtype=np.int64, count=int(part_counts.sum()))
+    part_geometries = np.repeat(np.arange(len(geometries)), part_counts)
+    part_numbers = np.arange(len(part_sizes)) - np.repeat(np.cumsum(part_counts) - part_counts, part_counts)
+    vertex_geometries = np.repeat(part_geometries, part_sizes)
+    geometry_vertex_counts = np.bincount(part_geometries, weights=part_sizes, minlength=len(geometries)).astype(np.int64)
+    vertices = np.concatenate(parts) if parts else np.empty((0, 2))
+
+    # Every vertex hash includes its part and position, so the sum per geometry depends on the order
+    vertex_hashes = pd.util.hash_pandas_object(pd.DataFrame({
+        "part": np.repeat(part_numbers, part_sizes),
+        "position": np.arange(len(vertices)) - np.repeat(np.cumsum(geometry_vertex_counts) - geometry_vertex_counts, geometry_vertex_counts),
+        "x": vertices[:, 0],
+        "y": vertices[:, 1],
+    }), index=False).to_numpy()
+    hashes = pd.util.hash_pandas_object(pd.DataFrame({"kind": kinds, "parts": part_counts, "vertices": geometry_vertex_counts}), index=False).to_numpy()
+    np.add.at(hashes, vertex_geometries, vertex_hashes)
+    return hashes, extractable
+
+def _geometry_hashes(column: pd.Series) -> np.ndarray:
+    geometries = column.to_numpy(dtype=object)
+    kinds = np.fromiter((_geometry_kind(geometry) for geometry in geometries), dtype=np.int8, count=len(geometries))
+    hashes = np.zeros(len(geometries), dtype=np.uint64)
+
+    points = np.flatnonzero(POINT_GEOMETRY == kinds)
+    if len(points):
+        try:
+            hashes[points] = _point_hashes(geometries[points])
+        except (TypeError, ValueError):
+            # Empty points may contain null or "NaN" coordinates
+            kinds[points] = OTHER_GEOMETRY
+    parts = np.flatnonzero(PARTS_GEOMETRY == kinds)
+    if len(parts):
+        parts_hashes, extractable = _parts_hashes(geometries[parts])
+        hashes[parts[extractable]] = parts_hashes[extractable]
+        kinds[parts[~extractable]] = OTHER_GEOMETRY
+
+    # Only geometries without coordinate arrays are serialized
+    others = np.flatnonzero(OTHER_GEOMETRY == kinds)
+    if len(others):
+        hashes[others] = pd.util.hash_array(np.array([_geometry_key(geometry) for geometry in geometries[others]], dtype=object))
+    return hashes
+
+def _comparable(old_column: pd.Series, new_column: pd.Series) -> tuple[pd.Series, pd.Series]:
+    if old_column.dtype == new_column.dtype:
+        return old_column, new_column
+    if pd.api.types.is_numeric_dtype(old_column) and pd.api.types.is_numeric_dtype(new_column):
+        # Integer columns become floats once they contain null values
+        return old_column.astype(np.float64), new_column.astype(np.float64)
+    return old_column.astype(object), new_column.astype(object)
+
+def _hash_column(column: pd.Series) -> np.ndarray:
+    return pd.util.hash_pandas_object(column, index=False).to_numpy()
+
+def diff_snapshots(old: pd.DataFrame, new: pd.DataFrame, key: str = "OBJECTID", columns: list[str] = None, geometry_column: str = "SHAPE") -> SnapshotDiff:
+    """Detects the added, removed and modified rows between two snapshots of a feature layer.
+
+    The rows are matched by their key, so the row order of the snapshots does not matter.
+    Every compared column is hashed once in a vectorized way and only the hashes are compared.
+    The coordinates of points, lines and polygons are hashed as arrays, other geometries as JSON.
+
+    Args:
+        old (pd.DataFrame): The previous snapshot.
+        new (pd.DataFrame): The current snapshot.
+        key (str, optional): The column uniquely identifying a row. Defaults to "OBJECTID".
+        columns (list[str], optional): The columns to compare. Defaults to all columns both snapshots share.
+        geometry_column (str, optional): The column containing geometries. Defaults to "SHAPE".
+
+    Returns:
+        SnapshotDiff: The changes between the snapshots.
+    """
+    for name, snapshot in (("old", old), ("new", new)):
+        if key not in snapshot.columns:
+            raise ValueError(f"The {name} snapshot has no {key} column!")
+        if snapshot[key].duplicated().any():
+            raise ValueError(f"The {name} snapshot contains duplicate {key} values!")
+
+    added_columns = [column for column in new.columns if column not in old.columns]
+    removed_columns = [column for column in old.columns if column not in new.columns]
+    if columns is None:
+        columns = [column for column in new.columns if column in old.columns and column != key]
+
+    old_keys = pd.Index(old[key].to_numpy())
+    new_keys = pd.Index(new[key].to_numpy())
+    added_mask = ~new_keys.isin(old_keys)
+    removed_mask = ~old_keys.isin(new_keys)
+    new_positions = np.flatnonzero(~added_mask)
+    old_positions = old_keys.get_indexer(new_keys[new_positions])
+
+    changed = np.zeros((len(new_positions), len(columns)), dtype=bool)
+    for index, column in enumerate(columns):
+        if column == geometry_column:
+            old_hashes, new_hashes = _geometry_hashes(old[column]), _geometry_hashes(new[column])
+        else:
+            old_hashes, new_hashes = (_hash_column(values) for values in _comparable(old[column], new[column]))
+        changed[:, index] = old_hashes[old_positions] != new_hashes[new_positions]
+
+    modified_mask = changed.any(axis=1)
+    modified_positions = new_positions[modified_mask]
+    changed_columns = pd.DataFrame(changed[modified_mask], columns=columns, index=new_keys[modified_positions].rename(key))
+    return SnapshotDiff(
+        key=key,
+        added=new[added_mask],
+        removed=old[removed_mask],
+        modified=new.iloc[modified_positions],
+        changed_columns=changed_columns,
+        added_columns=added_columns,
+        removed_columns=removed_columns,
+    )
+
+def diff_nested(old: Any, new: Any) -> list[tuple[tuple, Any, Any]]:
+    """Compares nested dicts and lists, e.g. renderers, without recursion.
+
+    Dicts are compared by key and lists by position. Values only present on
+    one side are reported with the MISSING marker on the other side.
+
+    Args:
+        old (Any): The previous structure.
+        new (Any): The current structure.
+
+    Returns:
+        A list of (path, old value, new value) tuples, the path contains the dict keys and list indices.
+    """
+    differences = []
+    stack = [((), old, new)]
+    while stack:
+        path, old_value, new_value = stack.pop()
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            # Reversed, so that the stack pops the keys in their original order
+            keys = list(old_value.keys()) + [key for key in new_value.keys() if key not in old_value]
+            for key in reversed(keys):
+                stack.append(((*path, key), old_value.get(key, MISSING), new_value.get(key, MISSING)))
+        elif isinstance(old_value, list) and isinstance(new_value, list):
+            for index in reversed(range(max(len(old_value), len(new_value)))):
+                stack.append((
+                    (*path, index),
+                    old_value[index] if index < len(old_value) else MISSING,
+                    new_value[index] if index < len(new_value) else MISSING
+                ))
+        elif old_value is MISSING or new_value is MISSING or old_value != new_value:
+            differences.append((path, old_value, new_value))
+    return differences
@@ -0,0 +1,133 @@
+from arcgis.features import FeatureLayer, FeatureSet
+from arcgis.geometry import Envelope, SpatialReference
+from arcgis.geometry.filters import intersects
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from data_engineering.geometry import points_in_polygon, polygon_edges
+from data_engineering.paging import query_with_retry
+import numpy as np
+
+
+def cover_tiles(x: np.ndarray, y: np.ndarray, tile_size: float, merge_rows: bool = True) -> list[tuple[float, float, float, float]]:
+    """Covers points with the grid tiles they occupy.
+
+    Args:
+        x (np.ndarray): The x coordinates of the points.
+        y (np.ndarray): The y coordinates of the points.
+        tile_size (float): The edge length of a tile in coordinate units.
+        merge_rows (bool, optional): Merge adjacent occupied tiles of a row into one envelope. Defaults to True.
+
+    Returns:
+        A list of (xmin, ymin, xmax, ymax) envelopes.
+    """
+    if tile_size <= 0:
+        raise ValueError("Tile size must be a positive number!")
+    valid = np.isfinite(x) & np.isfinite(y)
+    if not valid.any():
+        return []
+
+    tiles = np.unique(np.column_stack([
+        np.floor(y[valid] / tile_size).astype(np.int64),
+        np.floor(x[valid] / tile_size).astype(np.int64),
+    ]), axis=0)
+    rows, columns = tiles[:, 0], tiles[:, 1]
+    if merge_rows:
+        # The unique tiles are sorted by row and column, a run breaks at a new row or a gap
+        run_starts = np.flatnonzero(np.r_[True, (np.diff(rows) != 0) | (np.diff(columns) != 1)])
+        run_ends = np.r_[run_starts[1:], len(tiles)] - 1
+    else:
+        run_starts = run_ends = np.arange(len(tiles))
+
+    return [
+        (float(columns[start] * tile_size), float(rows[start] * tile_size), float((columns[end] + 1) * tile_size), float((rows[start] + 1) * tile_size))
+        for start, end in zip(run_starts, run_ends)
+    ]
+
+def query_tiles(
+        feature_layer: FeatureLayer,
+        tiles: list[tuple[float, float, float, float]],
+        spatial_reference: SpatialReference = None,
+        where: str = "1=1",
+        out_fields: str = "*",
+        max_workers: int = 4,
+        max_retries: int = 3,
+        backoff: float = 0.5) -> FeatureSet:
+    """Queries the features intersecting any of the tiles concurrently.
+
+    Features intersecting several tiles are only returned once.
+
+    Args:
+        feature_layer (FeatureLayer): The feature layer to query.
+        tiles (list[tuple]): The (xmin, ymin, xmax, ymax) envelopes to query.
+        spatial_reference (SpatialReference, optional): The spatial reference of the tiles and the returned features. Defaults to WGS84.
+        where (str, optional): The where clause of the query. Defaults to "1=1".
+        out_fields (str, optional): The fields to return. Defaults to "*".
+        max_workers (int, optional): The maximum number of concurrent requests. Defaults to 4.
+        max_retries (int, optional): The number of retries for every tile. Defaults to 3.
+        backoff (float, optional): The initial delay between retries in seconds. Defaults to 0.5.
+
+    Returns:
+        A FeatureSet containing the intersecting features.
+    """
+    spatial_reference = spatial_reference or SpatialReference(4326)
+
+    def query_tile(tile: tuple) -> FeatureSet:
+        xmin, ymin, xmax, ymax = tile
+        extent = Envelope({"xmin": xmin, "ymin": ymin, "xmax": xmax, "ymax": ymax, "spatialReference": spatial_reference})
+        spatial_filter = intersects(extent, sr=spatial_reference)
+        return query_with_retry(feature_layer, max_retries, backoff, where=where, out_fields=out_fields, geometry_filter=spatial_filter, out_sr=spatial_reference)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Every tile runs in its own copy of the current context, so the queries count for the calling span
+        futures = [executor.submit(copy_context().run, query_tile, tile) for tile in tiles]
+        feature_sets = [future.result() for future in futures]
+    if not feature_sets:
+        return FeatureSet([], spatial_reference=spatial_reference)
+
+    object_id_field = feature_sets[0].object_id_field_name or feature_layer.properties.get("objectIdField", "OBJECTID")
+    features = {}
+    for feature_set in feature_sets:
+        for feature in feature_set.features:
+            features.setdefault(feature.attributes[object_id_field], feature)
+
+    return FeatureSet(
+        list(features.values()),
+        fields=feature_sets[0].fields,
+        geometry_type=feature_sets[0].geometry_type,
+        spatial_reference=feature_sets[0].spatial_reference,
+        object_id_field_name=object_id_field
+    )
+
+def filter_features_containing_points(feature_set: FeatureSet, x: np.ndarray, y: np.ndarray) -> FeatureSet:
+    """Keeps the polygons containing at least one of the points.
+
+    Only the points inside the envelope of a polygon are tested against its edges.
+    The points and the polygons must share their spatial reference, e.g. query the polygons using out_sr.
+
+    Args:
+        feature_set (FeatureSet): A FeatureSet of polygons.
+        x (np.ndarray): The x coordinates of the points.
+        y (np.ndarray): The y coordinates of the points.
+
+    Returns:
+        A FeatureSet containing the polygons which contain points.
+    """
+    containing_features = []
+    for feature in feature_set.features:
+        rings = (feature.geometry or {}).get("rings") or []
+        edges = polygon_edges(rings)
+        if 0 == len(edges[0]):
+            continue
+        xs = np.concatenate([edges[0], edges[2]])
+        ys = np.concatenate([edges[1], edges[3]])
+        candidates = (xs.min() <= x) & (x <= xs.max()) & (ys.min() <= y) & (y <= ys.max())
+        if candidates.any() and points_in_polygon(x[candidates], y[candidates], edges).any():
+            containing_features.append(feature)
+
+    return FeatureSet(
+        containing_features,
+        fields=feature_set.fields,
+        geometry_type=feature_set.geometry_type,
+        spatial_reference=feature_set.spatial_reference,
+        object_id_field_name=feature_set.object_id_field_name
+    )
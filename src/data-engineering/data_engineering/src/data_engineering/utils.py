@@ -1,10 +1,18 @@
 from arcgis.gis import GIS, Item, Layer
-from arcgis.features import FeatureLayer
+from arcgis.features import FeatureLayer, FeatureSet
 from arcgis.geometry import Envelope, SpatialReference
 from arcgis.geometry.filters import intersects
+from data_engineering.geometry import point_coordinates
+from data_engineering.instrumentation import instrumented
+from data_engineering.paging import fetch_all_features
+from data_engineering.portal_cache import get_cached_item, get_cached_layer, get_portal_cache
+from data_engineering.result_cache import ResultCache
+from data_engineering.tiling import cover_tiles, filter_features_containing_points, query_tiles
+import copy
 import pandas as pd
 
 
+@instrumented
 def get_charging_stations_layer(gis: GIS) -> FeatureLayer:
     """Gets the charging stations feature layer from ArcGIS Online.
 
@@ -14,21 +22,29 @@ def get_charging_stations_layer(gis: GIS) -> FeatureLayer:
     Returns:
         The charging stations feature layer.
     """
-    portal_item: Item = gis.content.get("bc3c97f73d6b4be4921be8560fbc325a")
-    return portal_item.layers[0]
+    return get_cached_layer(gis, "bc3c97f73d6b4be4921be8560fbc325a")
 
-def fetch_charging_stations(gis: GIS, max_record_count: int = 1000, extent: Envelope = None) -> pd.DataFrame:
-    """Fetches the charging stations from the ArcGIS Online feature service.
+@instrumented
+def query_layer(feature_layer: FeatureLayer, max_record_count: int = 1000, extent: Envelope = None, return_all_records: bool = False, max_workers: int = 4, result_cache: ResultCache = None) -> pd.DataFrame:
+    """Queries all fields of a feature layer, optionally filtered by an extent.
 
     Args:
-        gis (GIS): An authenticated GIS object.
+        feature_layer (FeatureLayer): The feature layer to query.
         max_record_count (int, optional): The maximum number of records to fetch. Defaults to 1000.
-        extent (Envelope, optional): An optional spatial extent to filter the charging stations.
+        extent (Envelope, optional): An optional spatial extent to filter the features.
+        return_all_records (bool, optional): Fetch all records in parallel pages instead of a single capped query. Defaults to False.
+        max_workers (int, optional): The maximum number of concurrent page requests. Defaults to 4.
+        result_cache (ResultCache, optional): A local cache serving all records, only the edited records are fetched.
 
     Returns:
-        A spatially enabled DataFrame containing all charging stations.
+        A spatially enabled DataFrame containing the features.
     """
-    feature_layer: FeatureLayer = get_charging_stations_layer(gis)
+    if result_cache:
+        return result_cache.fetch(feature_layer, extent=extent)
+
+    if return_all_records:
+        return fetch_all_features(feature_layer, extent=extent, max_workers=max_workers)
+
     if extent:
         spatial_filter = intersects(extent, sr=extent.spatial_reference)
 
@@ -37,6 +53,25 @@ def fetch_charging_stations(gis: GIS, max_record_count: int = 1000, extent: Enve
     else:
         return feature_layer.query(where="1=1", out_fields="*", return_all_records=False, result_record_count=max_record_count, as_df=True)
 
+@instrumented
+def fetch_charging_stations(gis: GIS, max_record_count: int = 1000, extent: Envelope = None, return_all_records: bool = False, max_workers: int = 4, result_cache: ResultCache = None) -> pd.DataFrame:
+    """Fetches the charging stations from the ArcGIS Online feature service.
+
+    Args:
+        gis (GIS): An authenticated GIS object.
+        max_record_count (int, optional): The maximum number of records to fetch. Defaults to 1000.
+        extent (Envelope, optional): An optional spatial extent to filter the charging stations.
+        return_all_records (bool, optional): Fetch all charging stations in parallel pages. Defaults to False.
+        max_workers (int, optional): The maximum number of concurrent page requests. Defaults to 4.
+        result_cache (ResultCache, optional): A local cache serving all charging stations, only the edited records are fetched.
+
+    Returns:
+        A spatially enabled DataFrame containing all charging stations.
+    """
+    feature_layer: FeatureLayer = get_charging_stations_layer(gis)
+    return query_layer(feature_layer, max_record_count, extent, return_all_records, max_workers, result_cache)
+
+@instrumented
 def get_live_traffic_item(gis: GIS) -> Item:
     """Gets the live traffic portal item from ArcGIS Online.
 
@@ -46,8 +81,9 @@ def get_live_traffic_item(gis: GIS) -> Item:
     Returns:
         The live traffic portal item.
     """
-    return gis.content.get("ff11eb5b930b4fabba15c47feb130de4")
+    return get_cached_item(gis, "ff11eb5b930b4fabba15c47feb130de4")
 
+@instrumented
 def get_traffic_accidents_layer(gis: GIS) -> FeatureLayer:
     """Gets the traffic accidents feature layer from ArcGIS Online.
 
@@ -57,25 +93,24 @@ def get_traffic_accidents_layer(gis: GIS) -> FeatureLayer:
     Returns:
         The traffic accidents feature layer.
     """
-    portal_item: Item = gis.content.get("027fd014ed184fd78a37b54a68afe892")
-    return portal_item.layers[0]
+    return get_cached_layer(gis, "027fd014ed184fd78a37b54a68afe892")
 
-def fetch_traffic_accidents(gis: GIS, max_record_count: int = 1000, extent: Envelope = None) -> pd.DataFrame:
+@instrumented
+def fetch_traffic_accidents(gis: GIS, max_record_count: int = 1000, extent: Envelope = None, return_all_records: bool = False, max_workers: int = 4, result_cache: ResultCache = None) -> pd.DataFrame:
     """Fetches the traffic accidents from the ArcGIS Online feature service.
 
     Args:
         gis (GIS): An authenticated GIS object.
         max_record_count (int, optional): The maximum number of records to fetch. Defaults to 1000.
         extent (Envelope, optional): An optional spatial extent to filter the traffic incidents.
+        return_all_records (bool, optional): Fetch all traffic accidents in parallel pages. Defaults to False.
+        max_workers (int, optional): The maximum number of concurrent page requests. Defaults to 4.
+        result_cache (ResultCache, optional): A local cache serving all traffic accidents, only the edited records are fetched.
     """
     feature_layer: FeatureLayer = get_traffic_accidents_layer(gis)
-    if extent:
-        spatial_filter = intersects(extent, sr=extent.spatial_reference)
-
-        return feature_layer.query(where="1=1", out_fields="*", return_all_records=False, result_record_count=max_record_count, geometry_filter=spatial_filter, as_df=True)
-    else:
-        return feature_layer.query(where="1=1", out_fields="*", return_all_records=False, result_record_count=max_record_count, as_df=True)
+    return query_layer(feature_layer, max_record_count, extent, return_all_records, max_workers, result_cache)
 
+@instrumented
 def get_hotcold_layer(gis: GIS) -> FeatureLayer:
     """Gets the hotcold feature layer from the portal.
 
@@ -85,10 +120,10 @@ def get_hotcold_layer(gis: GIS) -> FeatureLayer:
     Returns:
         The hotcold feature layer.
     """
-    portal_item: Item = gis.content.get("6ee6272938624808956debfc17fcc958")
-    return portal_item.layers[0]
+    return get_cached_layer(gis, "6ee6272938624808956debfc17fcc958")
 
-def fetch_hotcold_features(gis: GIS, spatial_features: pd.DataFrame):
+@instrumented
+def fetch_hotcold_features(gis: GIS, spatial_features: pd.DataFrame, result_cache: ResultCache = None, tile_size: float = None, exact: bool = False, max_workers: int = 4, max_tiles: int = 64):
     """
     Fetches the hotcold features from a portal feature service
     that intersect with the provided spatial features.
@@ -97,15 +132,36 @@ def fetch_hotcold_features(gis: GIS, spatial_features: pd.DataFrame):
         gis (GIS): An authenticated GIS object.
         spatial_features (pd.DataFrame): A spatially enabled DataFrame
             containing the features to use for spatial filtering.
+        result_cache (ResultCache, optional): A local cache serving the
+            intersecting features, only the edited features are fetched.
+            Cannot be combined with a tile size.
+        tile_size (float, optional): Query only the grid tiles of this size in degrees
+            which contain points, instead of the full extent of the points.
+        exact (bool, optional): Keep only the hotcold features which contain at least one point. Defaults to False.
+        max_workers (int, optional): The maximum number of concurrent tile requests. Defaults to 4.
+        max_tiles (int, optional): The maximum number of tile requests, more scattered points
+            are queried by their full extent instead. Defaults to 64.
 
     Returns:
-        A tuple containing: a FeatureSet of the intersecting hotcold features,
+        A tuple containing: a FeatureSet of the intersecting hotcold features in WGS84,
         and a drawing info of the layer's renderer.
     """
+    if result_cache and tile_size:
+        raise ValueError("The result cache does not support tiled queries!")
+
     feature_layer: FeatureLayer = get_hotcold_layer(gis)
     
     # Using a geometry filter
     wgs84 = SpatialReference(4326)
+    if tile_size:
+        x, y = point_coordinates(spatial_features)
+        tiles = cover_tiles(x, y, tile_size)
+        if len(tiles) <= max_tiles:
+            feature_set = query_tiles(feature_layer, tiles, spatial_reference=wgs84, max_workers=max_workers)
+            if exact:
+                feature_set = filter_features_containing_points(feature_set, x, y)
+            return feature_set, get_drawing_info(gis, feature_layer)
+
     xmin, ymin, xmax, ymax = spatial_features.spatial.full_extent
     extent = Envelope({
         "xmin": xmin,
@@ -114,12 +170,19 @@ def fetch_hotcold_features(gis: GIS, spatial_features: pd.DataFrame):
         "ymax": ymax,
         "spatialReference": wgs84
     })
-    spatial_filter = intersects(extent, sr=wgs84)
+    if result_cache:
+        feature_set = FeatureSet.from_dataframe(result_cache.fetch(feature_layer, extent=extent, out_sr=4326))
+    else:
+        spatial_filter = intersects(extent, sr=wgs84)
 
-    # Query the intersecting features
-    feature_set = feature_layer.query(where="1=1", out_fields="*", geometry_filter=spatial_filter)
-    return feature_set, {"renderer": convert_internal_dict(feature_layer.renderer)}
+        # Query the intersecting features in the spatial reference of the points
+        feature_set = feature_layer.query(where="1=1", out_fields="*", geometry_filter=spatial_filter, out_sr=wgs84)
 
+    if exact:
+        feature_set = filter_features_containing_points(feature_set, *point_coordinates(spatial_features))
+    return feature_set, get_drawing_info(gis, feature_layer)
+
+@instrumented
 def fetch_hottest_features_by_extent(gis: GIS, extent: Envelope):
     """
     Fetches the hot features from a portal feature service
@@ -140,7 +203,25 @@ def fetch_hottest_features_by_extent(gis: GIS, extent: Envelope):
 
     # Query the intersecting features
     feature_set = feature_layer.query(where="Gi_Bin>=3", out_fields="*", geometry_filter=spatial_filter)
-    return feature_set, {"renderer": convert_internal_dict(feature_layer.renderer)}
+    return feature_set, get_drawing_info(gis, feature_layer)
+
+@instrumented
+def get_drawing_info(gis: GIS, feature_layer: FeatureLayer) -> dict:
+    """Gets the drawing info of a feature layer's renderer using the lookup cache of the GIS.
+
+    Args:
+        gis (GIS): An authenticated GIS object.
+        feature_layer (FeatureLayer): The feature layer.
+
+    Returns:
+        A drawing info containing the converted renderer of the layer.
+    """
+    drawing_info = get_portal_cache(gis).get_or_load(
+        ("drawing_info", feature_layer.url),
+        lambda: {"renderer": convert_internal_dict(feature_layer.renderer)}
+    )
+    # Callers may modify the drawing info, e.g. when adding it to a map
+    return copy.deepcopy(drawing_info)
 
 def convert_internal_dict(obj):
     """
@@ -170,6 +251,9 @@ def deep_compare(val1, val2):
     Returns:
         - differences as a dict or tuple
         - None if values are equal
+
+    Use snapshot_diff.diff_snapshots for feature sets and
+    snapshot_diff.diff_nested for deeply nested structures.
     """
     if isinstance(val1, dict) and isinstance(val2, dict):
         added, removed, modified, same = dict_compare(val1, val2)
@@ -0,0 +1,131 @@
+from contextlib import closing
+from sqlite3 import connect
+from typing import Iterable, Iterator
+from urban_traffic.reader import TRAFFIC_TIME_FORMAT, build_traffic_query, read_traffic_columns
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+ID_COLUMNS = ["trip", "person"]
+COORDINATE_COLUMNS = ["longitude", "latitude"]
+COORDINATE_TYPES = {"float32": pa.float32(), "float64": pa.float64()}
+
+
+def traffic_field(column: str, coordinate_type: str = "float32") -> pa.Field:
+    """Gets the compact Arrow field of a known agent_pos column, None for any other column.
+
+    Args:
+        column (str): The column name.
+        coordinate_type (str, optional): Either "float32" or "float64". Defaults to "float32".
+
+    Returns:
+        pa.Field: The field using a timestamp, a dictionary encoded string, a float or an int32 type.
+    """
+    if coordinate_type not in COORDINATE_TYPES:
+        raise ValueError(f"Unsupported coordinate type: {coordinate_type}!")
+
+    if "trip_time" == column:
+        return pa.field(column, pa.timestamp("s"))
+    if "vehicle_type" == column:
+        return pa.field(column, pa.dictionary(pa.int16(), pa.string()))
+    if column in COORDINATE_COLUMNS:
+        return pa.field(column, COORDINATE_TYPES[coordinate_type])
+    if column in ID_COLUMNS:
+        return pa.field(column, pa.int32())
+    return None
+
+def _to_arrow(values: tuple, field: pa.Field, column: str) -> pa.Array:
+    if field is None:
+        return pa.array(values)
+    if pa.types.is_timestamp(field.type):
+        return pc.strptime(pa.array(values, pa.string()), format=TRAFFIC_TIME_FORMAT, unit="s")
+    if pa.types.is_dictionary(field.type):
+        return pa.array(values, pa.string()).dictionary_encode().cast(field.type)
+    if pa.types.is_integer(field.type):
+        try:
+            # The cast is checked, ids exceeding the compact type are never truncated
+            return pa.array(values, pa.int64()).cast(field.type)
+        except pa.ArrowInvalid:
+            raise ValueError(f"The values of {column} exceed the range of {field.type}!") from None
+    return pa.array(values, pa.float64()).cast(field.type, safe=False)
+
+def iter_traffic_batches(
+        filepath: str,
+        chunk_size: int = 100_000,
+        columns: list[str] = None,
+        bbox: tuple[float, float, float, float] = None,
+        time_window: tuple = None,
+        vehicle_types: Iterable[str] = None,
+        limit: int = 0,
+        coordinate_type: str = "float32",
+        rowid_range: tuple[int, int] = None) -> Iterator[pa.RecordBatch]:
+    """Reads the agent positions into Arrow record batches using a compact schema.
+
+    The trip time becomes a timestamp, the vehicle type is dictionary encoded, the coordinates
+    are stored as floats of the coordinate type and the trip and person ids as int32.
+    The filters are evaluated by SQLite, see build_traffic_query.
+
+    Args:
+        filepath (str): The filepath to the SQLite database.
+        chunk_size (int, optional): The maximum number of rows per batch. Defaults to 100000.
+        columns (list[str], optional): The columns to select. Defaults to all columns.
+        bbox (tuple, optional): A (xmin, ymin, xmax, ymax) bounding box in longitude and latitude.
+        time_window (tuple, optional): A (start, end) trip_time window, the end is exclusive.
+        vehicle_types (Iterable[str], optional): The vehicle types to select.
+        limit (int, optional): The maximum number of rows, values below 1 select all rows. Defaults to 0.
+        coordinate_type (str, optional): Either "float32" or "float64". Defaults to "float32".
+        rowid_range (tuple, optional): A (start, end) rowid range, the end is exclusive.
+
+    Returns:
+        A generator of record batches containing at most chunk_size rows.
+    """
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be a positive number!")
+
+    with closing(connect(filepath)) as connection:
+        sql, params = build_traffic_query(read_traffic_columns(connection), columns, bbox, time_window, vehicle_types, limit, rowid_range)
+        with closing(connection.execute(sql, params)) as cursor:
+            names = [description[0] for description in cursor.description]
+            fields = [traffic_field(name, coordinate_type) for name in names]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                arrays = [_to_arrow(values, field, name) for values, field, name in zip(zip(*rows), fields, names)]
+                del rows
+                yield pa.RecordBatch.from_arrays(arrays, names=names)
+
+def read_traffic_table(filepath: str, chunk_size: int = 100_000, coordinate_type: str = "float32", **filters) -> pa.Table:
+    """Reads the agent positions into an Arrow table, see iter_traffic_batches for the filters."""
+    batches = list(iter_traffic_batches(filepath, chunk_size, coordinate_type=coordinate_type, **filters))
+    if not batches:
+        with closing(connect(filepath)) as connection:
+            names = filters.get("columns") or read_traffic_columns(connection)
+        return pa.schema([traffic_field(name, coordinate_type) or pa.field(name, pa.null()) for name in names]).empty_table()
+    return pa.Table.from_batches(batches)
+
+def traffic_table_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """Converts an Arrow table of agent positions into a compact DataFrame.
+
+    Numeric columns without nulls share the Arrow buffers where possible, the dictionary encoded
+    vehicle types become a categorical column and the timestamps keep their second resolution.
+    The table must not be used afterwards, its buffers are released while converting.
+
+    Args:
+        table (pa.Table): The agent positions, e.g. the result of read_traffic_table.
+
+    Returns:
+        pd.DataFrame: The agent positions without geometry, see spatially_enable.
+    """
+    return table.to_pandas(split_blocks=True, self_destruct=True, coerce_temporal_nanoseconds=False)
+
+def read_traffic_compact(filepath: str, limit: int = 0, chunk_size: int = 100_000, coordinate_type: str = "float32", **filters) -> pd.DataFrame:
+    """Reads the agent positions into a compact DataFrame, see iter_traffic_batches for the filters."""
+    return traffic_table_to_pandas(read_traffic_table(filepath, chunk_size, coordinate_type, limit=limit, **filters))
+
+def spatially_enable(traffic_df: pd.DataFrame) -> pd.DataFrame:
+    """Builds the point geometries of compact agent positions on demand, e.g. before plotting them."""
+    from arcgis.features import GeoAccessor
+
+    return GeoAccessor.from_xy(traffic_df, x_column="longitude", y_column="latitude", sr=4326)
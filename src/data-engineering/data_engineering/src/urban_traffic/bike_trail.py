@@ -0,0 +1,139 @@
+from arcgis.features import FeatureSet, GeoAccessor
+from data_engineering.instrumentation import record_bytes
+from dataclasses import dataclass, field
+import json
+import numpy as np
+import pandas as pd
+import re
+
+
+# The nesting depth of the coordinates of every GeoJSON geometry type
+_COORDINATE_DEPTHS = {
+    "Point": 0,
+    "MultiPoint": 1,
+    "LineString": 1,
+    "MultiLineString": 2,
+    "Polygon": 2,
+    "MultiPolygon": 3,
+}
+
+
+@dataclass
+class TrailVertices:
+    """The vertices of a bike trail stored as contiguous arrays.
+
+    Every vertex refers to its feature in the attributes table and to the
+    line or ring of that feature it belongs to. The feature records hold the
+    attributes of every feature as read, without the missing values of the table.
+    """
+    x: np.ndarray
+    y: np.ndarray
+    feature_index: np.ndarray
+    part_index: np.ndarray
+    attributes: pd.DataFrame
+    geojson: dict = field(repr=False, default=None)
+    feature_records: list = field(repr=False, default=None)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def to_sdf(self) -> pd.DataFrame:
+        """Converts the vertices into a spatially enabled DataFrame of points with their feature attributes."""
+        vertices_df = self.attributes.take(self.feature_index).reset_index(drop=True)
+        vertices_df["part"] = self.part_index
+        vertices_df["x"] = self.x
+        vertices_df["y"] = self.y
+        return GeoAccessor.from_xy(vertices_df, x_column="x", y_column="y", sr=4326)
+
+    def trail_sdf(self) -> pd.DataFrame:
+        """Converts the already parsed GeoJSON into a spatially enabled DataFrame of the trail features."""
+        return FeatureSet.from_geojson(self.geojson).sdf
+
+
+def _geometry_parts(geometry: dict) -> list:
+    """Returns the lists of positions of a GeoJSON geometry, one for every line or ring."""
+    if not geometry:
+        return []
+
+    geometry_type = geometry.get("type")
+    if geometry_type not in _COORDINATE_DEPTHS:
+        raise ValueError(f"Unsupported geometry type: {geometry_type}!")
+
+    parts = [geometry["coordinates"]]
+    depth = _COORDINATE_DEPTHS[geometry_type]
+    if 0 == depth:
+        return [parts]
+    for _ in range(depth - 1):
+        parts = [part for nested_parts in parts for part in nested_parts]
+    return parts
+
+def _feature_records(features: list) -> list:
+    """Returns the attributes of every GeoJSON feature like FeatureSet.from_geojson.
+
+    A 1-based OBJECTID is appended unless the first feature has an OBJECTID or FID property.
+    """
+    records = [dict(feature.get("properties") or {}) for feature in features]
+    if records and any(re.fullmatch("OBJECTID|FID", name, re.IGNORECASE) for name in records[0]):
+        return records
+
+    for object_id, record in enumerate(records, start=1):
+        record["OBJECTID"] = object_id
+    return records
+
+def explode_bike_trail_arrays(filepath: str) -> TrailVertices:
+    """Reads a bike trail GeoJSON file once and explodes it into vertex arrays.
+
+    Lines, multi lines, polygon rings and points are supported, z and m values are dropped.
+
+    Args:
+        filepath (str): The filepath to the GeoJSON file.
+
+    Returns:
+        TrailVertices: The vertex coordinates, their feature and part indices and the attributes table.
+    """
+    with open(filepath, 'rb') as file_in:
+        content = file_in.read()
+    record_bytes(len(content))
+    bike_trail_data = json.loads(content)
+
+    if "Feature" == bike_trail_data.get("type"):
+        features = [bike_trail_data]
+    else:
+        features = bike_trail_data.get("features", [])
+
+    coordinate_arrays = []
+    feature_indices = []
+    part_indices = []
+    for feature_index, feature in enumerate(features):
+        for part_index, positions in enumerate(_geometry_parts(feature.get("geometry"))):
+            if not positions:
+                continue
+            try:
+                coordinates = np.asarray(positions, dtype=np.float64)[:, :2]
+            except ValueError:
+                # Mixed positions with and without z values
+                coordinates = np.asarray([position[:2] for position in positions], dtype=np.float64)
+            coordinate_arrays.append(coordinates)
+            feature_indices.append(np.full(len(coordinates), feature_index, dtype=np.int64))
+            part_indices.append(np.full(len(coordinates), part_index, dtype=np.int32))
+
+    if coordinate_arrays:
+        coordinates = np.concatenate(coordinate_arrays)
+        feature_index = np.concatenate(feature_indices)
+        part_index = np.concatenate(part_indices)
+    else:
+        coordinates = np.empty((0, 2), dtype=np.float64)
+        feature_index = np.empty(0, dtype=np.int64)
+        part_index = np.empty(0, dtype=np.int32)
+
+    feature_records = _feature_records(features)
+    attributes = pd.DataFrame.from_records(feature_records, index=pd.RangeIndex(len(features)))
+    return TrailVertices(
+        x=np.ascontiguousarray(coordinates[:, 0]),
+        y=np.ascontiguousarray(coordinates[:, 1]),
+        feature_index=feature_index,
+        part_index=part_index,
+        attributes=attributes,
+        geojson=bike_trail_data,
+        feature_records=feature_records,
+    )
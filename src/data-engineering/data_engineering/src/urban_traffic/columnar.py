@@ -0,0 +1,103 @@
+from typing import Iterable, Iterator
+import numpy as np
+import pandas as pd
+
+
+class ColumnBuffer:
+    """Collects the values of a single column in a NumPy array which grows geometrically.
+
+    Args:
+        dtype (optional): The NumPy dtype of the values. Defaults to object.
+        capacity (int, optional): The initial number of values. Defaults to 1024.
+    """
+
+    def __init__(self, dtype=object, capacity: int = 1024):
+        self._values = np.empty(max(1, capacity), dtype=dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, value):
+        """Appends a value and doubles the capacity when the buffer is full.
+
+        Args:
+            value: The value to append.
+        """
+        if self._size == len(self._values):
+            grown = np.empty(2 * len(self._values), dtype=self._values.dtype)
+            grown[:self._size] = self._values
+            self._values = grown
+        self._values[self._size] = value
+        self._size += 1
+
+    def to_numpy(self) -> np.ndarray:
+        """Returns a copy of the collected values trimmed to their length."""
+        return self._values[:self._size].copy()
+
+    def clear(self):
+        """Removes all values but keeps the allocated capacity."""
+        if self._values.dtype == object:
+            # Release the references to the collected objects
+            self._values[:self._size] = None
+        self._size = 0
+
+
+def accumulate_rows(rows: Iterable[tuple], fields: list[str], dtypes: dict = None, chunk_size: int = None) -> Iterator[pd.DataFrame]:
+    """Collects row tuples, e.g. from a search cursor, into typed column buffers.
+
+    Every DataFrame is created once from the column buffers, no intermediate
+    DataFrames are concatenated.
+
+    Args:
+        rows (Iterable[tuple]): The rows containing one value for every field.
+        fields (list[str]): The names of the fields.
+        dtypes (dict, optional): The NumPy dtypes by field name, other fields are collected as objects.
+        chunk_size (int, optional): Yield a DataFrame after every chunk_size rows instead of a single DataFrame.
+
+    Returns:
+        A generator of DataFrames. Without a chunk size exactly one, possibly empty, DataFrame is yielded.
+    """
+    dtypes = dtypes or {}
+    capacity = chunk_size or 1024
+    buffers = [ColumnBuffer(dtypes.get(field, object), capacity) for field in fields]
+
+    def create_data_frame() -> pd.DataFrame:
+        data_frame = pd.DataFrame({field: buffer.to_numpy() for field, buffer in zip(fields, buffers)})
+        for buffer in buffers:
+            buffer.clear()
+        return data_frame.infer_objects()
+
+    row_count = 0
+    for row in rows:
+        for buffer, value in zip(buffers, row):
+            buffer.append(value)
+        row_count += 1
+        if chunk_size and chunk_size == row_count:
+            yield create_data_frame()
+            row_count = 0
+
+    if row_count or not chunk_size:
+        yield create_data_frame()
+
+def normalize_vehicle_types(vehicle_types: pd.Series) -> tuple[np.ndarray, list[str]]:
+    """Normalizes the vehicle types like prepare_traffic, empty values become pedestrians.
+
+    Args:
+        vehicle_types (pd.Series): The raw vehicle types.
+
+    Returns:
+        A tuple containing: the code of every row, and the lower case vehicle types in order of appearance.
+    """
+    raw_codes, raw_types = pd.factorize(vehicle_types, use_na_sentinel=False)
+    lower_types = ["pedestrian" if pd.isna(raw_type) else str(raw_type).lower() for raw_type in raw_types]
+    type_codes, unique_types = pd.factorize(pd.Index(lower_types, dtype=object))
+    return type_codes[raw_codes], list(unique_types)
+
+def expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenates the integer ranges [start, start + count) without a Python loop."""
+    total = int(counts.sum())
+    if 0 == total:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(total, dtype=np.int64)
@@ -0,0 +1,285 @@
+from urban_traffic.columnar import normalize_vehicle_types
+from urban_traffic.reader import TRAFFIC_TIME_FORMAT
+import numpy as np
+import pandas as pd
+
+
+MINUTES_PER_DAY = 24 * 60
+DISTINCT_COLUMNS = ("trip", "person")
+# The pending chunk pairs of a column are merged once they hold more keys, 4M keys take 32 MiB
+PAIR_MERGE_THRESHOLD = 1 << 22
+
+
+class SpaceTimeCube:
+    """Aggregates agent positions into grid cells by time slice by vehicle type.
+
+    The counts are stored in one array with the axes vehicle type, time slice, row and column.
+    Distinct trips and persons are exact, every cube keeps the distinct pairs of cube cell and id,
+    so chunk results can be added or merged in any order.
+
+    Args:
+        extent (tuple): The extent of the grid as (xmin, ymin, xmax, ymax) in degrees.
+        cell_size (float): The edge length of a grid cell in degrees.
+        slice_minutes (int, optional): The length of a time slice within the day. Defaults to 60.
+        vehicle_types (list[str], optional): The vehicle types in order. Defaults to the types in order of appearance.
+    """
+
+    def __init__(self, extent: tuple, cell_size: float, slice_minutes: int = 60, vehicle_types: list[str] = None):
+        if cell_size <= 0:
+            raise ValueError("The cell size must be positive!")
+        if slice_minutes <= 0 or MINUTES_PER_DAY % slice_minutes:
+            raise ValueError("The slice minutes must divide a day!")
+
+        self.extent = tuple(float(value) for value in extent)
+        self.cell_size = float(cell_size)
+        self.slice_minutes = int(slice_minutes)
+        xmin, ymin, xmax, ymax = self.extent
+        # Rounding avoids an additional row or column caused by floating point noise
+        self.shape = (
+            MINUTES_PER_DAY // self.slice_minutes,
+            max(1, int(np.ceil(round((ymax - ymin) / self.cell_size, 9)))),
+            max(1, int(np.ceil(round((xmax - xmin) / self.cell_size, 9)))),
+        )
+        self.vehicle_types = [str(vehicle_type).lower() for vehicle_type in vehicle_types or []]
+        self.counts = np.zeros((len(self.vehicle_types),) + self.shape, dtype=np.uint32)
+        self.dropped = 0
+        self._pairs = {column: [] for column in DISTINCT_COLUMNS}
+
+    @property
+    def cells_per_type(self) -> int:
+        return self.shape[0] * self.shape[1] * self.shape[2]
+
+    def _type_codes(self, traffic_df: pd.DataFrame) -> np.ndarray:
+        if "vehicle_type" in traffic_df.columns:
+            row_codes, unique_types = normalize_vehicle_types(traffic_df["vehicle_type"])
+            return self._map_types(unique_types)[row_codes]
+
+        # Prepared frames contain one binary column for every vehicle type
+        indicator_columns = [vehicle_type for vehicle_type in self.vehicle_types if vehicle_type in traffic_df.columns]
+        if not indicator_columns:
+            raise ValueError("The traffic DataFrame has neither a vehicle type column nor binary vehicle type columns!")
+        indicators = traffic_df[indicator_columns].to_numpy()
+        codes = np.array([self.vehicle_types.index(column) for column in indicator_columns])[indicators.argmax(axis=1)]
+        return np.where(indicators.any(axis=1), codes, -1)
+
+    def _map_types(self, vehicle_types: list[str]) -> np.ndarray:
+        new_types = [vehicle_type for vehicle_type in vehicle_types if vehicle_type not in self.vehicle_types]
+        if new_types:
+            # The vehicle type is the leading axis, so existing cells keep their flat index
+            self.vehicle_types.extend(new_types)
+            self.counts = np.concatenate([self.counts, np.zeros((len(new_types),) + self.shape, dtype=np.uint32)])
+        return np.array([self.vehicle_types.index(vehicle_type) for vehicle_type in vehicle_types], dtype=np.int64)
+
+    def _slices(self, traffic_df: pd.DataFrame) -> np.ndarray:
+        if {"hour", "minute"}.issubset(traffic_df.columns):
+            minutes = traffic_df["hour"].to_numpy(dtype=np.int64) * 60 + traffic_df["minute"].to_numpy(dtype=np.int64)
+            return minutes // self.slice_minutes
+
+        trip_time = traffic_df["trip_time"]
+        if not pd.api.types.is_datetime64_any_dtype(trip_time):
+            trip_time = pd.to_datetime(trip_time, format=TRAFFIC_TIME_FORMAT, errors="coerce")
+        minutes = (trip_time.dt.hour * 60 + trip_time.dt.minute).to_numpy(dtype=np.float64, na_value=np.nan)
+        return np.where(np.isnan(minutes), -1, minutes // self.slice_minutes).astype(np.int64)
+
+    def add(self, traffic_df: pd.DataFrame) -> "SpaceTimeCube":
+        """Adds the agent positions of a chunk to the cube.
+
+        Args:
+            traffic_df (pd.DataFrame): Agent positions with longitude and latitude columns and either
+                trip_time and vehicle_type columns or the hour, minute and vehicle type columns of prepare_traffic.
+
+        Returns:
+            SpaceTimeCube: The cube itself.
+        """
+        xmin, ymin, _, _ = self.extent
+        x = traffic_df["longitude"].to_numpy(dtype=np.float64)
+        y = traffic_df["latitude"].to_numpy(dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            columns = np.floor((x - xmin) / self.cell_size)
+            rows = np.floor((y - ymin) / self.cell_size)
+        slices = self._slices(traffic_df)
+        types = self._type_codes(traffic_df)
+
+        valid = (
+            (0 <= columns) & (columns < self.shape[2]) & (0 <= rows) & (rows < self.shape[1])
+            & (0 <= slices) & (slices < self.shape[0]) & (0 <= types)
+        )
+        self.dropped += int(len(valid) - np.count_nonzero(valid))
+        cells = np.ravel_multi_index(
+            (types[valid], slices[valid], rows[valid].astype(np.int64), columns[valid].astype(np.int64)),
+            self.counts.shape
+        ).astype(np.int64)
+        # Only the occupied cells are scattered, the counts are contiguous so the flat view writes through
+        occupied_cells, cell_counts = np.unique(cells, return_counts=True)
+        self.counts.reshape(-1)[occupied_cells] += cell_counts.astype(np.uint32)
+
+        for column in DISTINCT_COLUMNS:
+            if column in traffic_df.columns:
+                ids = traffic_df[column].to_numpy()[valid]
+                self._append_pairs(column, np.unique(_pair_keys(cells, ids, column)))
+        return self
+
+    def merge(self, other: "SpaceTimeCube") -> "SpaceTimeCube":
+        """Merges the result of another cube using the same grid, e.g. of a parallel worker.
+
+        Args:
+            other (SpaceTimeCube): The cube to merge.
+
+        Returns:
+            SpaceTimeCube: The cube itself.
+        """
+        if (self.extent, self.cell_size, self.slice_minutes) != (other.extent, other.cell_size, other.slice_minutes):
+            raise ValueError("Only cubes with the same grid can be merged!")
+
+        type_map = self._map_types(other.vehicle_types)
+        self.counts[type_map] += other.counts
+        self.dropped += other.dropped
+        for column in DISTINCT_COLUMNS:
+            for keys in other._pairs[column]:
+                cells = keys >> 32
+                cells = type_map[cells // other.cells_per_type] * self.cells_per_type + cells % other.cells_per_type
+                self._append_pairs(column, np.unique(_shift_cells(cells) | (keys & 0xFFFFFFFF)))
+        return self
+
+    def _append_pairs(self, column: str, keys: np.ndarray):
+        pairs = self._pairs[column]
+        pairs.append(keys)
+        # The first array holds the merged pairs, the pending chunks are merged past the threshold
+        if PAIR_MERGE_THRESHOLD < sum(len(pending_keys) for pending_keys in pairs[1:]):
+            self.distinct_pairs(column)
+
+    def distinct_pairs(self, column: str) -> np.ndarray:
+        """Gets the sorted distinct pairs of cube cell and id, the cell is stored in the upper 32 bits."""
+        pairs = self._pairs[column]
+        if 1 != len(pairs):
+            # Chunk results are only combined when they are needed or exceed the merge threshold
+            pairs[:] = [np.union1d(pairs[0], np.concatenate(pairs[1:])) if pairs else np.empty(0, dtype=np.int64)]
+        return pairs[0]
+
+    def distinct(self, column: str) -> np.ndarray:
+        """Counts the distinct ids, e.g. trips, of every cube cell.
+
+        Args:
+            column (str): The id column, either "trip" or "person".
+
+        Returns:
+            An array with the same shape as the counts.
+        """
+        cells = self.distinct_pairs(column) >> 32
+        return np.bincount(cells, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def _selection(self, bbox: tuple, hours: tuple, vehicle_types: list[str]) -> tuple:
+        if vehicle_types is None:
+            types = np.arange(len(self.vehicle_types))
+        else:
+            types = np.array([self.vehicle_types.index(str(vehicle_type).lower()) for vehicle_type in vehicle_types if str(vehicle_type).lower() in self.vehicle_types], dtype=np.int64)
+
+        slices = np.arange(self.shape[0])
+        if hours is not None:
+            start, end = hours
+            slice_starts = slices * self.slice_minutes
+            slices = slices[(start * 60 <= slice_starts) & (slice_starts < end * 60)]
+
+        rows = np.arange(self.shape[1])
+        columns = np.arange(self.shape[2])
+        if bbox is not None:
+            # Cells overlapping the bounding box are selected
+            xmin, ymin, _, _ = self.extent
+            column_min, row_min, column_max, row_max = (
+                int(np.floor((value - origin) / self.cell_size))
+                for value, origin in zip(bbox, (xmin, ymin, xmin, ymin))
+            )
+            rows = rows[(row_min <= rows) & (rows <= row_max)]
+            columns = columns[(column_min <= columns) & (columns <= column_max)]
+        return types, slices, rows, columns
+
+    def query(self, bbox: tuple = None, hours: tuple = None, vehicle_types: list[str] = None) -> dict:
+        """Answers how many positions, trips and persons fall into a region, time window and vehicle types.
+
+        Args:
+            bbox (tuple, optional): The region as (xmin, ymin, xmax, ymax) in degrees, e.g. a radius_bbox.
+                All cells overlapping the region are selected. Defaults to the full extent.
+            hours (tuple, optional): The time window as (start, end) in hours, slices starting
+                within [start, end) are selected. Defaults to the full day.
+            vehicle_types (list[str], optional): The vehicle types to select. Defaults to all types.
+
+        Returns:
+            A dict containing the count of positions and the number of distinct trips and persons.
+        """
+        selection = np.ix_(*self._selection(bbox, hours, vehicle_types))
+        result = {"count": int(self.counts[selection].sum(dtype=np.int64))}
+        selected_cells = np.zeros(self.counts.shape, dtype=bool)
+        selected_cells[selection] = True
+        for column in DISTINCT_COLUMNS:
+            keys = self.distinct_pairs(column)
+            selected = selected_cells.ravel()[keys >> 32]
+            result[f"{column}s"] = int(len(np.unique(keys[selected] & 0xFFFFFFFF)))
+        return result
+
+    def count_grid(self, hours: tuple = None, vehicle_types: list[str] = None) -> np.ndarray:
+        """Sums the counts of the selected time slices and vehicle types into a grid of rows by columns.
+
+        Args:
+            hours (tuple, optional): The time window as (start, end) in hours. Defaults to the full day.
+            vehicle_types (list[str], optional): The vehicle types to select. Defaults to all types.
+
+        Returns:
+            An array of rows by columns, the first row is at the minimum latitude.
+        """
+        types, slices, _, _ = self._selection(None, hours, vehicle_types)
+        return self.counts[np.ix_(types, slices)].sum(axis=(0, 1), dtype=np.int64)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Converts all non-empty cube cells into a DataFrame with the cell centers as longitude and latitude."""
+        cells = np.flatnonzero(self.counts)
+        types, slices, rows, columns = np.unravel_index(cells, self.counts.shape)
+        xmin, ymin, _, _ = self.extent
+        cube_df = pd.DataFrame({
+            "vehicle_type": pd.Categorical.from_codes(types, categories=self.vehicle_types) if self.vehicle_types else pd.Categorical([]),
+            "slice_start": pd.to_timedelta(slices * self.slice_minutes, unit="min"),
+            "row": rows,
+            "column": columns,
+            "longitude": xmin + (columns + 0.5) * self.cell_size,
+            "latitude": ymin + (rows + 0.5) * self.cell_size,
+            "count": self.counts.ravel()[cells],
+        })
+        for column in DISTINCT_COLUMNS:
+            cube_df[f"{column}s"] = self.distinct(column).ravel()[cells]
+        return cube_df
+
+
+def _pair_keys(cells: np.ndarray, ids: np.ndarray, column: str) -> np.ndarray:
+    if not (pd.api.types.is_integer_dtype(ids) or 0 == len(ids)):
+        raise ValueError(f"The {column} ids must be integers!")
+    ids = ids.astype(np.int64)
+    if len(ids) and (ids.min() < 0 or 0xFFFFFFFF < ids.max()):
+        raise ValueError(f"The {column} ids must be between 0 and 2**32!")
+    return _shift_cells(cells) | ids
+
+def _shift_cells(cells: np.ndarray) -> np.ndarray:
+    # Cells from 2**31 on would overflow into the sign bit of the int64 keys
+    if len(cells) and 0x7FFFFFFF < cells.max():
+        raise ValueError("The cube must have less than 2**31 cells to track distinct ids!")
+    return cells.astype(np.int64) << 32
+
+
+def build_cube(frames, extent: tuple, cell_size: float, slice_minutes: int = 60, vehicle_types: list[str] = None) -> SpaceTimeCube:
+    """Builds a space time cube from agent positions, e.g. the chunks of iter_traffic_sql.
+
+    Args:
+        frames (pd.DataFrame | Iterable[pd.DataFrame]): A DataFrame or a stream of DataFrames to aggregate.
+        extent (tuple): The extent of the grid as (xmin, ymin, xmax, ymax) in degrees.
+        cell_size (float): The edge length of a grid cell in degrees.
+        slice_minutes (int, optional): The length of a time slice within the day. Defaults to 60.
+        vehicle_types (list[str], optional): The vehicle types in order. Defaults to the types in order of appearance.
+
+    Returns:
+        SpaceTimeCube: The cube containing all positions.
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+
+    cube = SpaceTimeCube(extent, cell_size, slice_minutes, vehicle_types)
+    for traffic_df in frames:
+        cube.add(traffic_df)
+    return cube
@@ -0,0 +1,107 @@
+from data_engineering.geometry import point_coordinates
+import numpy as np
+import pandas as pd
+
+
+EARTH_RADIUS_METERS = 6_371_008.8
+WEB_MERCATOR_RADIUS_METERS = 6_378_137.0
+WEB_MERCATOR_WKIDS = {3857, 102100, 102113, 900913}
+WEB_MERCATOR_MAX_LATITUDE = 85.0511287798066
+
+
+def haversine_meters(lon1, lat1, lon2, lat2) -> np.ndarray:
+    """Calculates the great-circle distances between WGS84 coordinates.
+
+    All arguments are broadcast against each other, so a single location
+    can be compared with arrays of locations.
+
+    Args:
+        lon1: The longitudes of the first locations in degrees.
+        lat1: The latitudes of the first locations in degrees.
+        lon2: The longitudes of the second locations in degrees.
+        lat2: The latitudes of the second locations in degrees.
+
+    Returns:
+        The distances in meters.
+    """
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lon1, lat1, lon2, lat2))
+    sin_dlat = np.sin((lat2 - lat1) / 2.0)
+    sin_dlon = np.sin((lon2 - lon1) / 2.0)
+    a = sin_dlat * sin_dlat + np.cos(lat1) * np.cos(lat2) * sin_dlon * sin_dlon
+    return 2.0 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def radius_bbox(lon: float, lat: float, meters: float) -> tuple[float, float, float, float]:
+    """Calculates a bounding box in degrees which contains a geodesic circle.
+
+    Args:
+        lon (float): The longitude of the center in degrees.
+        lat (float): The latitude of the center in degrees.
+        meters (float): The radius of the circle in meters.
+
+    Returns:
+        A (xmin, ymin, xmax, ymax) tuple in degrees.
+    """
+    delta_lat = np.degrees(meters / EARTH_RADIUS_METERS)
+    ymin, ymax = max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0)
+
+    # The circle is widest at the latitude closest to a pole
+    max_abs_lat = max(abs(ymin), abs(ymax))
+    if 90.0 <= max_abs_lat:
+        return -180.0, ymin, 180.0, ymax
+    delta_lon = np.degrees(np.arcsin(min(1.0, np.sin(meters / EARTH_RADIUS_METERS) / np.cos(np.radians(max_abs_lat)))))
+    return float(lon - delta_lon), float(ymin), float(lon + delta_lon), float(ymax)
+
+def web_mercator_to_wgs84(x, y) -> tuple[np.ndarray, np.ndarray]:
+    """Converts Web Mercator coordinates, e.g. of portal features, into WGS84 coordinates.
+
+    Args:
+        x: The x coordinates in meters.
+        y: The y coordinates in meters.
+
+    Returns:
+        A tuple containing the longitudes and latitudes in degrees.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lon = np.degrees(x / WEB_MERCATOR_RADIUS_METERS)
+    lat = np.degrees(2.0 * np.arctan(np.exp(y / WEB_MERCATOR_RADIUS_METERS)) - np.pi / 2.0)
+    return lon, lat
+
+def wgs84_to_web_mercator(lon, lat) -> tuple[np.ndarray, np.ndarray]:
+    """Converts WGS84 coordinates into Web Mercator coordinates, latitudes are clipped to the Web Mercator bounds.
+
+    Args:
+        lon: The longitudes in degrees.
+        lat: The latitudes in degrees.
+
+    Returns:
+        A tuple containing the x and y coordinates in meters.
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -WEB_MERCATOR_MAX_LATITUDE, WEB_MERCATOR_MAX_LATITUDE)
+    x = np.radians(lon) * WEB_MERCATOR_RADIUS_METERS
+    y = np.log(np.tan(np.pi / 4.0 + np.radians(lat) / 2.0)) * WEB_MERCATOR_RADIUS_METERS
+    return x, y
+
+def wgs84_coordinates(spatial_features: pd.DataFrame, x_column: str = None, y_column: str = None) -> tuple[np.ndarray, np.ndarray]:
+    """Extracts the longitudes and latitudes of points, Web Mercator geometries are converted.
+
+    Args:
+        spatial_features (pd.DataFrame): A DataFrame containing points, e.g. charging stations or car positions.
+        x_column (str, optional): The column containing the longitudes. Defaults to longitude or the geometry.
+        y_column (str, optional): The column containing the latitudes. Defaults to latitude or the geometry.
+
+    Returns:
+        A tuple containing the longitudes and latitudes in degrees.
+    """
+    if not (x_column and y_column) and {"longitude", "latitude"}.issubset(spatial_features.columns):
+        x_column, y_column = "longitude", "latitude"
+    x, y = point_coordinates(spatial_features, x_column, y_column)
+    if x_column and y_column:
+        return x, y
+
+    spatial_reference = spatial_features.spatial.sr or {}
+    wkid = spatial_reference.get("latestWkid") or spatial_reference.get("wkid")
+    if wkid in WEB_MERCATOR_WKIDS:
+        return web_mercator_to_wgs84(x, y)
+    return x, y
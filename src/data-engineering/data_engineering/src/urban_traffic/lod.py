@@ -0,0 +1,166 @@
+from dataclasses import dataclass
+from urban_traffic.geodesy import WEB_MERCATOR_RADIUS_METERS, WEB_MERCATOR_WKIDS, web_mercator_to_wgs84, wgs84_coordinates, wgs84_to_web_mercator
+import numpy as np
+import pandas as pd
+
+
+# The meters per pixel of 256 pixel Web Mercator tiles at zoom level 0
+ZOOM_0_RESOLUTION = 156543.03392804097
+WEB_MERCATOR_HALF_WIDTH = np.pi * WEB_MERCATOR_RADIUS_METERS
+
+
+def zoom_resolution(zoom: float) -> float:
+    """Calculates the meters per pixel of a Web Mercator zoom level."""
+    return ZOOM_0_RESOLUTION / 2.0 ** zoom
+
+def _mercator_extent(extent) -> tuple[float, float, float, float]:
+    # Map extents are dicts including their spatial reference, tuples are WGS84 bounding boxes
+    if isinstance(extent, dict):
+        spatial_reference = extent.get("spatialReference") or {}
+        wkid = spatial_reference.get("latestWkid") or spatial_reference.get("wkid")
+        xmin, ymin, xmax, ymax = extent["xmin"], extent["ymin"], extent["xmax"], extent["ymax"]
+        if wkid in WEB_MERCATOR_WKIDS:
+            return xmin, ymin, xmax, ymax
+        if wkid not in (None, 4326):
+            raise ValueError(f"Unsupported extent spatial reference: {wkid}!")
+    else:
+        xmin, ymin, xmax, ymax = extent
+
+    (xmin, xmax), (ymin, ymax) = wgs84_to_web_mercator([xmin, xmax], [ymin, ymax])
+    return float(xmin), float(ymin), float(xmax), float(ymax)
+
+
+@dataclass
+class Level:
+    """The occupied screen-space cells of a zoom level, sorted by row and column.
+
+    Every cell contains the number of its points, their centroid in Web Mercator
+    and the position of the point closest to the centroid as its representative.
+    """
+    zoom: float
+    cell_size: float
+    rows: np.ndarray
+    columns: np.ndarray
+    counts: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    representatives: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def select(self, extent=None) -> np.ndarray:
+        """Selects the cells intersecting an extent.
+
+        Args:
+            extent (optional): A (xmin, ymin, xmax, ymax) bounding box in WGS84 or a map extent dict. Defaults to all cells.
+
+        Returns:
+            np.ndarray: The positions of the selected cells.
+        """
+        if extent is None:
+            return np.arange(len(self.counts))
+
+        xmin, ymin, xmax, ymax = _mercator_extent(extent)
+        column_min, column_max = np.floor((np.array([xmin, xmax]) + WEB_MERCATOR_HALF_WIDTH) / self.cell_size)
+        row_min, row_max = np.floor((WEB_MERCATOR_HALF_WIDTH - np.array([ymax, ymin])) / self.cell_size)
+        inside = (column_min <= self.columns) & (self.columns <= column_max) & (row_min <= self.rows) & (self.rows <= row_max)
+        return np.flatnonzero(inside)
+
+
+class PointLevelOfDetail:
+    """Bins points into screen-space cells of Web Mercator zoom levels, e.g. before plotting them on a map.
+
+    The points are projected once, the cells of every zoom level are computed on first use and cached.
+
+    Args:
+        lon (np.ndarray): The longitudes of the points in degrees.
+        lat (np.ndarray): The latitudes of the points in degrees.
+        cell_pixels (int, optional): The edge length of a cell in screen pixels. Defaults to 32.
+    """
+
+    def __init__(self, lon: np.ndarray, lat: np.ndarray, cell_pixels: int = 32):
+        if cell_pixels < 1:
+            raise ValueError("The cell size must be at least one pixel!")
+        self.cell_pixels = cell_pixels
+        self.x, self.y = wgs84_to_web_mercator(lon, lat)
+        self._levels: dict[float, Level] = {}
+
+    @classmethod
+    def from_frame(cls, spatial_features: pd.DataFrame, cell_pixels: int = 32) -> "PointLevelOfDetail":
+        """Creates the bins of a DataFrame of points, e.g. commute cars, car positions or charging stations."""
+        return cls(*wgs84_coordinates(spatial_features), cell_pixels=cell_pixels)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def level(self, zoom: float) -> Level:
+        """Gets the cached cells of a zoom level.
+
+        Args:
+            zoom (float): The Web Mercator zoom level, e.g. the zoom of create_map.
+
+        Returns:
+            Level: The occupied cells.
+        """
+        level = self._levels.get(zoom)
+        if level is None:
+            level = self._levels[zoom] = self._bin(zoom)
+        return level
+
+    def _bin(self, zoom: float) -> Level:
+        cell_size = self.cell_pixels * zoom_resolution(zoom)
+        columns = np.floor((self.x + WEB_MERCATOR_HALF_WIDTH) / cell_size).astype(np.int64)
+        rows = np.floor((WEB_MERCATOR_HALF_WIDTH - self.y) / cell_size).astype(np.int64)
+        column_count = int(np.ceil(2.0 * WEB_MERCATOR_HALF_WIDTH / cell_size)) + 1
+
+        cells, inverse, counts = np.unique(rows * column_count + columns, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        x = np.bincount(inverse, weights=self.x, minlength=len(cells)) / counts
+        y = np.bincount(inverse, weights=self.y, minlength=len(cells)) / counts
+
+        # The first point of every cell after sorting by cell and distance to the centroid
+        distances = np.hypot(self.x - x[inverse], self.y - y[inverse])
+        order = np.lexsort((distances, inverse))
+        representatives = order[np.cumsum(counts) - counts]
+        return Level(zoom, cell_size, cells // column_count, cells % column_count, counts, x, y, representatives)
+
+    def decimate(self, zoom: float, extent=None) -> np.ndarray:
+        """Selects one representative point per screen-space cell.
+
+        Args:
+            zoom (float): The Web Mercator zoom level.
+            extent (optional): A (xmin, ymin, xmax, ymax) bounding box in WGS84 or a map extent dict. Defaults to all points.
+
+        Returns:
+            np.ndarray: The sorted positions of the representative points, e.g. for DataFrame.iloc.
+        """
+        level = self.level(zoom)
+        return np.sort(level.representatives[level.select(extent)])
+
+    def clusters(self, zoom: float, extent=None) -> pd.DataFrame:
+        """Aggregates the points of every screen-space cell into a cluster.
+
+        Args:
+            zoom (float): The Web Mercator zoom level.
+            extent (optional): A (xmin, ymin, xmax, ymax) bounding box in WGS84 or a map extent dict. Defaults to all points.
+
+        Returns:
+            pd.DataFrame: One row per cluster containing the longitude and latitude of its centroid,
+                the number of points and the position of its representative point.
+        """
+        level = self.level(zoom)
+        cells = level.select(extent)
+        lon, lat = web_mercator_to_wgs84(level.x[cells], level.y[cells])
+        return pd.DataFrame({
+            "longitude": lon,
+            "latitude": lat,
+            "point_count": level.counts[cells],
+            "representative": level.representatives[cells],
+        })
+
+    def cluster_sdf(self, zoom: float, extent=None) -> pd.DataFrame:
+        """Creates the clusters as a spatially enabled DataFrame, e.g. for generate_cluster_renderer."""
+        from arcgis.features import GeoAccessor
+
+        return GeoAccessor.from_xy(self.clusters(zoom, extent), x_column="longitude", y_column="latitude", sr=4326)
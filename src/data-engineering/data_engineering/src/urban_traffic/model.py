@@ -0,0 +1,135 @@
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GridSearchCV
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from typing import Iterator
+import joblib
+import pandas as pd
+import tempfile
+
+
+DEFAULT_PARAM_GRID = {
+    "classifier__n_estimators": [100, 200],
+    "classifier__max_depth": [None, 20],
+}
+
+
+def build_model_pipeline(categorical_cols: list[str], numeric_cols: list[str], n_jobs: int = -1, memory: str = None) -> Pipeline:
+    """Builds the preprocessing and RandomForest pipeline.
+
+    The one-hot encoded output stays sparse, so the matrix does not grow with every category.
+
+    Args:
+        categorical_cols (list[str]): The categorical feature columns.
+        numeric_cols (list[str]): The numeric feature columns.
+        n_jobs (int, optional): The number of cores used by the classifier, -1 uses all cores. Defaults to -1.
+        memory (str, optional): A directory caching the fitted preprocessor.
+
+    Returns:
+        Pipeline: The unfitted pipeline.
+    """
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_cols),
+            ("num", StandardScaler(), numeric_cols)
+        ],
+        sparse_threshold=1.0
+    )
+    return Pipeline(steps=[
+        ("preprocessor", preprocessor),
+        ("classifier", RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs))
+    ], memory=memory)
+
+def train_model(
+        df: pd.DataFrame,
+        categorical_cols: list[str],
+        numeric_cols: list[str],
+        target_col: str,
+        param_grid: dict = None,
+        cv: int = 5,
+        n_jobs: int = -1,
+        cache_dir: str = None,
+        scoring: str = "accuracy") -> GridSearchCV:
+    """Trains the model using a cross-validated grid search on all cores.
+
+    The fitted preprocessor of every fold is cached, so parameter combinations
+    which only differ in the classifier reuse it.
+
+    Args:
+        df (pd.DataFrame): The training data.
+        categorical_cols (list[str]): The categorical feature columns.
+        numeric_cols (list[str]): The numeric feature columns.
+        target_col (str): The target column.
+        param_grid (dict, optional): The parameters to search. Defaults to DEFAULT_PARAM_GRID.
+        cv (int, optional): The number of folds. Defaults to 5.
+        n_jobs (int, optional): The number of parallel fits, -1 uses all cores. Defaults to -1.
+        cache_dir (str, optional): A directory caching the fitted preprocessors. Defaults to a temporary directory.
+        scoring (str, optional): The score used to select the parameters. Defaults to "accuracy".
+
+    Returns:
+        GridSearchCV: The fitted search, its best_estimator_ is refitted on all data.
+    """
+    X = df[categorical_cols + numeric_cols]
+    y = df[target_col]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # The folds run in parallel, so every classifier uses a single core
+        model = build_model_pipeline(categorical_cols, numeric_cols, n_jobs=1, memory=cache_dir or temp_dir)
+        search = GridSearchCV(model, param_grid or DEFAULT_PARAM_GRID, cv=cv, n_jobs=n_jobs, scoring=scoring)
+        search.fit(X, y)
+
+    # Detach the cache and let predictions use all cores
+    search.best_estimator_.set_params(memory=None, classifier__n_jobs=n_jobs)
+    return search
+
+def save_model(model: Pipeline, filepath: str) -> str:
+    """Saves a fitted model.
+
+    Args:
+        model (Pipeline): The fitted model.
+        filepath (str): The target filepath.
+
+    Returns:
+        The filepath of the saved model.
+    """
+    joblib.dump(model, filepath, compress=3)
+    return filepath
+
+def load_model(filepath: str) -> Pipeline:
+    """Loads a model saved by save_model.
+
+    Args:
+        filepath (str): The filepath of the saved model.
+
+    Returns:
+        Pipeline: The fitted model.
+    """
+    return joblib.load(filepath)
+
+def predict_batches(model: Pipeline, frames, batch_size: int = 50_000, probabilities: bool = False) -> Iterator[pd.DataFrame]:
+    """Scores DataFrames in batches of bounded size without refitting the model.
+
+    Args:
+        model (Pipeline): The fitted model.
+        frames (pd.DataFrame | Iterable[pd.DataFrame]): A DataFrame or a stream of DataFrames to score.
+        batch_size (int, optional): The maximum number of rows per batch. Defaults to 50000.
+        probabilities (bool, optional): Add one probability column for every class. Defaults to False.
+
+    Returns:
+        A generator of DataFrames containing the prediction column, indexed like the input rows.
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+
+    feature_cols = list(model.feature_names_in_) if hasattr(model, "feature_names_in_") else None
+    for frame in frames:
+        for start in range(0, len(frame), batch_size):
+            batch = frame.iloc[start:start + batch_size]
+            X = batch[feature_cols] if feature_cols else batch
+            scores = pd.DataFrame({"prediction": model.predict(X)}, index=batch.index)
+            if probabilities:
+                class_probabilities = model.predict_proba(X)
+                for index, class_name in enumerate(model.classes_):
+                    scores[f"probability_{class_name}"] = class_probabilities[:, index]
+            yield scores
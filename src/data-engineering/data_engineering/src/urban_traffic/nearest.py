@@ -0,0 +1,126 @@
+from sklearn.neighbors import BallTree
+from typing import Iterator
+from urban_traffic.geodesy import EARTH_RADIUS_METERS, wgs84_coordinates
+import numpy as np
+import pandas as pd
+
+
+class StationIndex:
+    """A ball tree over station locations answering k nearest queries by great-circle distance.
+
+    Args:
+        lon (np.ndarray): The longitudes of the stations in degrees.
+        lat (np.ndarray): The latitudes of the stations in degrees.
+        leaf_size (int, optional): The leaf size of the ball tree. Defaults to 40.
+    """
+
+    def __init__(self, lon: np.ndarray, lat: np.ndarray, leaf_size: int = 40):
+        if 0 == len(lon):
+            raise ValueError("At least one station is required!")
+        self.station_count = len(lon)
+        self.tree = BallTree(np.radians(np.column_stack([lat, lon])), leaf_size=leaf_size, metric="haversine")
+
+    @classmethod
+    def from_frame(cls, stations: pd.DataFrame, x_column: str = None, y_column: str = None) -> "StationIndex":
+        """Creates the index from a DataFrame of stations, e.g. the result of fetch_charging_stations."""
+        return cls(*wgs84_coordinates(stations, x_column, y_column))
+
+    def query(self, lon: np.ndarray, lat: np.ndarray, k: int = 3, batch_size: int = 100_000) -> tuple[np.ndarray, np.ndarray]:
+        """Finds the k nearest stations of every location.
+
+        Args:
+            lon (np.ndarray): The longitudes of the locations in degrees.
+            lat (np.ndarray): The latitudes of the locations in degrees.
+            k (int, optional): The number of stations per location, at most the number of stations. Defaults to 3.
+            batch_size (int, optional): The number of locations queried at once. Defaults to 100000.
+
+        Returns:
+            A tuple containing: the distances in meters, and the station positions, both sorted by distance with one row per location.
+        """
+        k = min(k, self.station_count)
+        if k < 1:
+            raise ValueError("k must be a positive number!")
+
+        locations = np.radians(np.column_stack([np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)]))
+        distances = np.empty((len(locations), k), dtype=np.float64)
+        indices = np.empty((len(locations), k), dtype=np.int64)
+        for start in range(0, len(locations), batch_size):
+            batch_distances, batch_indices = self.tree.query(locations[start:start + batch_size], k=k)
+            distances[start:start + batch_size] = batch_distances * EARTH_RADIUS_METERS
+            indices[start:start + batch_size] = batch_indices
+        return distances, indices
+
+
+def nearest_charging_stations(charging_stations: pd.DataFrame, car_positions: pd.DataFrame, k: int = 3) -> pd.DataFrame:
+    """Finds the k nearest charging stations of every car as a routing free approximation.
+
+    Args:
+        charging_stations (pd.DataFrame): The charging stations, e.g. the result of fetch_charging_stations.
+        car_positions (pd.DataFrame): The car positions.
+        k (int, optional): The number of charging stations per car. Defaults to 3.
+
+    Returns:
+        pd.DataFrame: One row per car and candidate containing the car and station index labels,
+            the rank starting at 0 and the great-circle distance in meters.
+    """
+    distances, indices = StationIndex.from_frame(charging_stations).query(*wgs84_coordinates(car_positions), k=k)
+    car_count, candidate_count = indices.shape
+    return pd.DataFrame({
+        "car_index": np.repeat(car_positions.index.to_numpy(), candidate_count),
+        "station_index": charging_stations.index.to_numpy()[indices.ravel()],
+        "rank": np.tile(np.arange(candidate_count, dtype=np.int8), car_count),
+        "distance_meters": distances.ravel(),
+    })
+
+def group_by_candidates(indices: np.ndarray) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Groups the locations sharing the same candidate stations, regardless of their order.
+
+    Args:
+        indices (np.ndarray): The station positions of every location, e.g. of StationIndex.query.
+
+    Returns:
+        A list of tuples containing: the sorted station positions, and the positions of the locations, ordered by station positions.
+    """
+    if 0 == len(indices):
+        return []
+
+    candidate_sets, inverse, counts = np.unique(np.sort(indices, axis=1), axis=0, return_inverse=True, return_counts=True)
+    locations = np.split(np.argsort(inverse.ravel(), kind="stable"), np.cumsum(counts)[:-1])
+    return list(zip(candidate_sets, locations))
+
+def iter_routing_batches(
+        charging_stations: pd.DataFrame,
+        car_positions: pd.DataFrame,
+        k: int = 3,
+        max_facilities: int = None) -> Iterator[tuple[pd.DataFrame, pd.DataFrame]]:
+    """Prunes the closest facility problem to the k nearest charging stations of every car.
+
+    Every batch can be solved on its own, e.g. using create_analysis_layer and solve_routing_problem,
+    so the network solve grows with the number of candidates instead of cars times stations.
+
+    Args:
+        charging_stations (pd.DataFrame): The charging stations, e.g. the result of fetch_charging_stations.
+        car_positions (pd.DataFrame): The car positions.
+        k (int, optional): The number of candidate charging stations per car. Defaults to 3.
+        max_facilities (int, optional): Merge consecutive candidate groups while their charging stations
+            do not exceed this number. Defaults to one batch per distinct candidate set.
+
+    Returns:
+        A generator of tuples containing: the candidate charging stations, and the car positions using them.
+    """
+    _, indices = StationIndex.from_frame(charging_stations).query(*wgs84_coordinates(car_positions), k=k)
+    groups = group_by_candidates(indices)
+
+    batch_stations = np.empty(0, dtype=np.int64)
+    batch_cars = []
+    for stations, cars in groups:
+        merged_stations = np.union1d(batch_stations, stations)
+        if batch_cars and (not max_facilities or max_facilities < len(merged_stations)):
+            yield charging_stations.iloc[batch_stations], car_positions.iloc[np.concatenate(batch_cars)]
+            merged_stations = stations
+            batch_cars = []
+        batch_stations = merged_stations
+        batch_cars.append(cars)
+
+    if batch_cars:
+        yield charging_stations.iloc[batch_stations], car_positions.iloc[np.concatenate(batch_cars)]
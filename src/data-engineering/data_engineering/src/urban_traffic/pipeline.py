@@ -0,0 +1,133 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from sqlite3 import connect
+from tempfile import TemporaryDirectory
+from urban_traffic.reader import TRAFFIC_TABLE, build_traffic_query, read_traffic_columns
+import numpy as np
+import os
+import pandas as pd
+import pyarrow as pa
+
+
+def rowid_partitions(filepath: str, partition_count: int) -> list[tuple[int, int]]:
+    """Splits the rowids of the agent_pos table into contiguous ranges of similar size.
+
+    Args:
+        filepath (str): The filepath to the SQLite database.
+        partition_count (int): The maximum number of partitions.
+
+    Returns:
+        A list of (start, end) rowid ranges in rowid order, the end is exclusive.
+    """
+    if partition_count < 1:
+        raise ValueError("The partition count must be a positive number!")
+
+    with closing(connect(filepath)) as connection:
+        min_rowid, max_rowid = connection.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {TRAFFIC_TABLE};").fetchone()
+    if min_rowid is None:
+        return []
+
+    bounds = np.unique(np.linspace(min_rowid, max_rowid + 1, partition_count + 1).round().astype(np.int64))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+def prepare_partition(filepath: str, rowid_range: tuple[int, int], output_path: str, commute: bool = True, compact: bool = False) -> str:
+    """Loads, prepares and optionally filters one partition and writes the result as an Arrow IPC file.
+
+    Args:
+        filepath (str): The filepath to the SQLite database.
+        rowid_range (tuple[int, int]): The (start, end) rowid range of the partition.
+        output_path (str): The filepath of the Arrow IPC file.
+        commute (bool, optional): Keep only the commuting cars using filter_commute_cars. Defaults to True.
+        compact (bool, optional): Load the rows using compact Arrow backed types. Defaults to False.
+
+    Returns:
+        str: The output path.
+    """
+    from urban_traffic.utils import filter_commute_cars, prepare_traffic
+
+    if compact:
+        from urban_traffic.arrow import read_traffic_compact
+        traffic_df = read_traffic_compact(filepath, rowid_range=rowid_range)
+    else:
+        with closing(connect(filepath)) as connection:
+            sql, params = build_traffic_query(read_traffic_columns(connection), rowid_range=rowid_range)
+            traffic_df = pd.read_sql(sql, connection, params=params)
+
+    traffic_df = prepare_traffic(traffic_df, inplace=True)
+    if commute:
+        # A partition without any car has no car column
+        traffic_df = filter_commute_cars(traffic_df) if "car" in traffic_df.columns else traffic_df.iloc[:0]
+
+    table = pa.Table.from_pandas(traffic_df, preserve_index=False)
+    with pa.OSFile(output_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return output_path
+
+def merge_partitions(tables: list[pa.Table]) -> pd.DataFrame:
+    """Concatenates the prepared partitions in order.
+
+    The vehicle type columns of prepare_traffic depend on the rows of a partition,
+    missing vehicle type columns are filled with zeros in order of their first appearance.
+
+    Args:
+        tables (list[pa.Table]): The prepared partitions.
+
+    Returns:
+        pd.DataFrame: The merged partitions using a new range index.
+    """
+    if not tables:
+        return pd.DataFrame()
+
+    column_types = {}
+    for table in tables:
+        for field in table.schema:
+            column_types.setdefault(field.name, field.type)
+
+    aligned_tables = []
+    for table in tables:
+        columns = [
+            table.column(name).cast(column_type) if name in table.column_names else pa.nulls(table.num_rows, column_type).fill_null(0)
+            for name, column_type in column_types.items()
+        ]
+        aligned_tables.append(pa.Table.from_arrays(columns, names=list(column_types)))
+    return pa.concat_tables(aligned_tables).to_pandas(split_blocks=True, self_destruct=True)
+
+def run_traffic_pipeline(
+        filepath: str,
+        commute: bool = True,
+        compact: bool = False,
+        max_workers: int = None,
+        partition_count: int = None,
+        spill_dir: str = None) -> pd.DataFrame:
+    """Runs read_traffic_sql, prepare_traffic and filter_commute_cars over rowid partitions in a process pool.
+
+    Every worker writes its partition as an Arrow IPC file, so no DataFrame is pickled between processes.
+    The partitions are merged in rowid order, the result equals the single process pipeline except for its index.
+    On platforms spawning processes, call this function from within an if __name__ == "__main__" block.
+
+    Args:
+        filepath (str): The filepath to the SQLite database.
+        commute (bool, optional): Keep only the commuting cars. Defaults to True.
+        compact (bool, optional): Load the rows using compact Arrow backed types. Defaults to False.
+        max_workers (int, optional): The number of worker processes. Defaults to the number of cores.
+        partition_count (int, optional): The number of rowid partitions. Defaults to four per worker.
+        spill_dir (str, optional): The directory of the temporary Arrow IPC files. Defaults to the system temporary directory.
+
+    Returns:
+        pd.DataFrame: The prepared traffic.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    partitions = rowid_partitions(filepath, partition_count or 4 * max_workers)
+    with TemporaryDirectory(prefix="traffic_pipeline_", dir=spill_dir) as temp_dir:
+        output_paths = [os.path.join(temp_dir, f"partition_{index:05d}.arrow") for index in range(len(partitions))]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(prepare_partition, filepath, rowid_range, output_path, commute, compact)
+                for rowid_range, output_path in zip(partitions, output_paths)
+            ]
+            # Reading the finished partitions in order overlaps with the remaining workers
+            tables = []
+            for future in futures:
+                with pa.OSFile(future.result(), "rb") as source:
+                    tables.append(pa.ipc.open_file(source).read_all())
+    return merge_partitions(tables)
@@ -0,0 +1,134 @@
+from contextlib import closing
+from datetime import datetime
+from sqlite3 import Connection, connect
+from typing import Iterable, Iterator
+import pandas as pd
+
+
+TRAFFIC_TABLE = "agent_pos"
+TRAFFIC_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def read_traffic_columns(connection: Connection) -> list[str]:
+    """Reads the column names of the agent_pos table.
+
+    Args:
+        connection (Connection): An open SQLite connection.
+
+    Returns:
+        The column names in table order.
+    """
+    return [row[1] for row in connection.execute(f"PRAGMA table_info({TRAFFIC_TABLE});")]
+
+def _format_trip_time(value) -> str:
+    if isinstance(value, datetime):
+        return value.strftime(TRAFFIC_TIME_FORMAT)
+    return str(value)
+
+def build_traffic_query(
+        available_columns: list[str],
+        columns: list[str] = None,
+        bbox: tuple[float, float, float, float] = None,
+        time_window: tuple = None,
+        vehicle_types: Iterable[str] = None,
+        limit: int = 0,
+        rowid_range: tuple[int, int] = None) -> tuple[str, list]:
+    """Builds a parameterized SELECT statement for the agent_pos table.
+
+    Column names are validated against the table, all filter values are bound parameters.
+
+    Args:
+        available_columns (list[str]): The columns of the agent_pos table.
+        columns (list[str], optional): The columns to select. Defaults to all columns.
+        bbox (tuple, optional): A (xmin, ymin, xmax, ymax) bounding box in longitude and latitude.
+        time_window (tuple, optional): A (start, end) trip_time window, the end is exclusive.
+            Either bound may be None, datetimes are formatted like the stored trip_time values.
+        vehicle_types (Iterable[str], optional): The vehicle types to select. Missing vehicle types
+            match "pedestrian" and the comparison ignores the case, just like prepare_traffic.
+        limit (int, optional): The maximum number of rows, values below 1 select all rows. Defaults to 0.
+        rowid_range (tuple, optional): A (start, end) rowid range, the end is exclusive, e.g. a partition of rowid_partitions.
+
+    Returns:
+        A tuple containing the SQL statement and its parameters.
+    """
+    if columns:
+        unknown_columns = [column for column in columns if column not in available_columns]
+        if unknown_columns:
+            raise ValueError(f"Unknown columns: {', '.join(unknown_columns)}!")
+        projection = ", ".join(f'"{column}"' for column in columns)
+    else:
+        projection = "*"
+
+    conditions = []
+    params = []
+    if bbox:
+        xmin, ymin, xmax, ymax = bbox
+        conditions.append("longitude BETWEEN ? AND ? AND latitude BETWEEN ? AND ?")
+        params.extend([xmin, xmax, ymin, ymax])
+    if time_window:
+        start, end = time_window
+        if start is not None:
+            conditions.append("trip_time >= ?")
+            params.append(_format_trip_time(start))
+        if end is not None:
+            conditions.append("trip_time < ?")
+            params.append(_format_trip_time(end))
+    if rowid_range:
+        conditions.append("rowid >= ? AND rowid < ?")
+        params.extend(rowid_range)
+    if vehicle_types is not None:
+        vehicle_types = [vehicle_type.lower() for vehicle_type in vehicle_types]
+        if not vehicle_types:
+            raise ValueError("At least one vehicle type must be selected!")
+        placeholders = ", ".join("?" for _ in vehicle_types)
+        conditions.append(f"LOWER(COALESCE(vehicle_type, 'pedestrian')) IN ({placeholders})")
+        params.extend(vehicle_types)
+
+    sql = f"SELECT {projection} FROM {TRAFFIC_TABLE}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if 0 < limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql + ";", params
+
+def iter_traffic_sql(
+        filepath: str,
+        chunk_size: int = 100_000,
+        columns: list[str] = None,
+        bbox: tuple[float, float, float, float] = None,
+        time_window: tuple = None,
+        vehicle_types: Iterable[str] = None,
+        limit: int = 0,
+        with_geometry: bool = False,
+        rowid_range: tuple[int, int] = None) -> Iterator[pd.DataFrame]:
+    """Reads the agent positions in chunks of bounded size.
+
+    All filters are evaluated by SQLite, only matching rows and selected columns are loaded.
+
+    Args:
+        filepath (str): The filepath to the SQLite database.
+        chunk_size (int, optional): The maximum number of rows per chunk. Defaults to 100000.
+        columns (list[str], optional): The columns to select. Defaults to all columns.
+        bbox (tuple, optional): A (xmin, ymin, xmax, ymax) bounding box in longitude and latitude.
+        time_window (tuple, optional): A (start, end) trip_time window, the end is exclusive.
+        vehicle_types (Iterable[str], optional): The vehicle types to select.
+        limit (int, optional): The maximum number of rows, values below 1 select all rows. Defaults to 0.
+        with_geometry (bool, optional): Spatially enable every chunk using the longitude and latitude columns. Defaults to False.
+        rowid_range (tuple, optional): A (start, end) rowid range, the end is exclusive.
+
+    Returns:
+        A generator of DataFrames containing at most chunk_size rows.
+    """
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be a positive number!")
+
+    with closing(connect(filepath)) as connection:
+        sql, params = build_traffic_query(read_traffic_columns(connection), columns, bbox, time_window, vehicle_types, limit, rowid_range)
+        for chunk in pd.read_sql(sql, connection, params=params, chunksize=chunk_size):
+            if with_geometry:
+                # ArcGIS is only imported for spatially enabled chunks
+                from arcgis.features import GeoAccessor
+                yield GeoAccessor.from_xy(chunk, x_column="longitude", y_column="latitude", sr=4326)
+            else:
+                yield chunk
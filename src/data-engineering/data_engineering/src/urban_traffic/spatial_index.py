@@ -0,0 +1,95 @@
+from contextlib import closing
+from sqlite3 import Connection, connect
+from urban_traffic.geodesy import haversine_meters, radius_bbox
+from urban_traffic.reader import TRAFFIC_TABLE, read_traffic_columns
+import pandas as pd
+
+
+TRAFFIC_INDEX_TABLE = "agent_pos_rtree"
+
+
+def has_traffic_index(connection: Connection) -> bool:
+    """Checks whether the SQLite database contains the R*Tree index of the agent positions.
+
+    Args:
+        connection (Connection): An open SQLite connection.
+
+    Returns:
+        True if the index table exists.
+    """
+    row = connection.execute("SELECT 1 FROM sqlite_master WHERE name = ?;", [TRAFFIC_INDEX_TABLE]).fetchone()
+    return row is not None
+
+def build_traffic_index(filepath: str, rebuild: bool = False) -> int:
+    """Builds an R*Tree index over the agent positions inside the SQLite database.
+
+    The index maps the rowid of every agent position to its longitude and latitude.
+    An existing index is kept unless a rebuild is requested.
+
+    Args:
+        filepath (str): The filepath to the SQLite database.
+        rebuild (bool, optional): Drop and recreate an existing index. Defaults to False.
+
+    Returns:
+        The number of indexed agent positions.
+    """
+    with closing(connect(filepath)) as connection:
+        if has_traffic_index(connection):
+            if not rebuild:
+                return connection.execute(f"SELECT COUNT(*) FROM {TRAFFIC_INDEX_TABLE};").fetchone()[0]
+            connection.execute(f"DROP TABLE {TRAFFIC_INDEX_TABLE};")
+
+        connection.execute(f"CREATE VIRTUAL TABLE {TRAFFIC_INDEX_TABLE} USING rtree(id, min_lon, max_lon, min_lat, max_lat);")
+        cursor = connection.execute(f"""
+            INSERT INTO {TRAFFIC_INDEX_TABLE}
+            SELECT rowid, longitude, longitude, latitude, latitude
+            FROM {TRAFFIC_TABLE}
+            WHERE longitude IS NOT NULL AND latitude IS NOT NULL;
+        """)
+        connection.commit()
+        return cursor.rowcount
+
+def query_traffic_radius(filepath: str, lon: float, lat: float, meters: float, columns: list[str] = None, with_geometry: bool = True) -> pd.DataFrame:
+    """Reads the agent positions within a geodesic radius using the local R*Tree index.
+
+    The index selects the candidates inside the bounding box of the circle,
+    a vectorized haversine distance check removes the corners.
+
+    Args:
+        filepath (str): The filepath to the SQLite database containing the index.
+        lon (float): The longitude of the center in degrees.
+        lat (float): The latitude of the center in degrees.
+        meters (float): The radius in meters.
+        columns (list[str], optional): The columns to select. Defaults to all columns.
+        with_geometry (bool, optional): Spatially enable the result. Defaults to True.
+
+    Returns:
+        pd.DataFrame: The agent positions within the radius.
+    """
+    with closing(connect(filepath)) as connection:
+        if not has_traffic_index(connection):
+            raise ValueError(f"The database does not contain the {TRAFFIC_INDEX_TABLE} index, call build_traffic_index first!")
+
+        available_columns = read_traffic_columns(connection)
+        selected_columns = columns or available_columns
+        unknown_columns = [column for column in selected_columns if column not in available_columns]
+        if unknown_columns:
+            raise ValueError(f"Unknown columns: {', '.join(unknown_columns)}!")
+
+        # The coordinates are always needed for the distance check
+        query_columns = list(dict.fromkeys([*selected_columns, "longitude", "latitude"]))
+        projection = ", ".join(f'{TRAFFIC_TABLE}."{column}"' for column in query_columns)
+        xmin, ymin, xmax, ymax = radius_bbox(lon, lat, meters)
+        candidates = pd.read_sql(f"""
+            SELECT {projection}
+            FROM {TRAFFIC_TABLE}
+            JOIN {TRAFFIC_INDEX_TABLE} ON {TRAFFIC_TABLE}.rowid = {TRAFFIC_INDEX_TABLE}.id
+            WHERE max_lon >= ? AND min_lon <= ? AND max_lat >= ? AND min_lat <= ?;
+        """, connection, params=[xmin, xmax, ymin, ymax])
+
+    distances = haversine_meters(lon, lat, candidates["longitude"].to_numpy(), candidates["latitude"].to_numpy())
+    traffic_df = candidates[distances <= meters].reset_index(drop=True)
+    if with_geometry:
+        from arcgis.features import GeoAccessor
+        traffic_df = GeoAccessor.from_xy(traffic_df, x_column="longitude", y_column="latitude", sr=4326)
+    return traffic_df.drop(columns=[column for column in query_columns if column not in selected_columns])
@@ -0,0 +1,215 @@
+from arcgis.features import FeatureSet
+from data_engineering.geometry import polygon_edges
+from urban_traffic.columnar import expand_ranges
+from urban_traffic.geodesy import WEB_MERCATOR_WKIDS, web_mercator_to_wgs84, wgs84_coordinates
+import numpy as np
+import pandas as pd
+
+
+def wgs84_rings(feature_set: FeatureSet) -> list:
+    """Extracts the rings of every polygon in WGS84, Web Mercator polygons are converted.
+
+    Args:
+        feature_set (FeatureSet): The polygons, e.g. the hotcold features.
+
+    Returns:
+        list: The rings of every polygon.
+    """
+    rings = [(feature.geometry or {}).get("rings") or [] for feature in feature_set.features]
+    spatial_reference = feature_set.spatial_reference or {}
+    wkid = spatial_reference.get("latestWkid") or spatial_reference.get("wkid")
+    if wkid in (None, 4326):
+        return rings
+    if wkid not in WEB_MERCATOR_WKIDS:
+        raise ValueError(f"Unsupported polygon spatial reference: {wkid}!")
+
+    converted_rings = []
+    for polygon_rings in rings:
+        converted_polygon_rings = []
+        for ring in polygon_rings:
+            vertices = np.asarray(ring, dtype=np.float64).reshape(len(ring), -1)
+            lon, lat = web_mercator_to_wgs84(vertices[:, 0], vertices[:, 1])
+            converted_polygon_rings.append(np.column_stack([lon, lat, vertices[:, 2:]]).tolist())
+        converted_rings.append(converted_polygon_rings)
+    return converted_rings
+
+
+class PolygonIndex:
+    """A packed grid index over polygon envelopes for vectorized point in polygon lookups.
+
+    The edges of all polygons are stored in contiguous arrays. Every grid cell refers
+    to the polygons whose envelope overlaps it, packed into one array with cell offsets.
+
+    Args:
+        rings (list): The rings of every polygon.
+        values (np.ndarray): The value of every polygon, e.g. its Gi_Bin.
+        cell_size (float, optional): The edge length of a grid cell. Defaults to the median polygon envelope size.
+    """
+
+    def __init__(self, rings: list, values: np.ndarray, cell_size: float = None):
+        if len(rings) != len(values):
+            raise ValueError("Every polygon needs exactly one value!")
+
+        self.values = np.asarray(values)
+        edge_arrays = [polygon_edges(polygon_rings) for polygon_rings in rings]
+        self.edge_counts = np.array([len(edges[0]) for edges in edge_arrays], dtype=np.int64)
+        self.edge_offsets = np.cumsum(self.edge_counts) - self.edge_counts
+        self.x1, self.y1, self.x2, self.y2 = (
+            np.concatenate([edges[index] for edges in edge_arrays]) if edge_arrays else np.empty(0)
+            for index in range(4)
+        )
+
+        # Polygons without edges get an empty envelope and are never indexed
+        self.xmin = np.full(len(rings), np.inf)
+        self.ymin = np.full(len(rings), np.inf)
+        self.xmax = np.full(len(rings), -np.inf)
+        self.ymax = np.full(len(rings), -np.inf)
+        valid = 0 < self.edge_counts
+        if valid.any():
+            polygon_ids = np.repeat(np.arange(len(rings)), self.edge_counts)
+            np.minimum.at(self.xmin, polygon_ids, np.minimum(self.x1, self.x2))
+            np.minimum.at(self.ymin, polygon_ids, np.minimum(self.y1, self.y2))
+            np.maximum.at(self.xmax, polygon_ids, np.maximum(self.x1, self.x2))
+            np.maximum.at(self.ymax, polygon_ids, np.maximum(self.y1, self.y2))
+        self._build_grid(valid, cell_size)
+
+    @classmethod
+    def from_feature_set(cls, feature_set: FeatureSet, value_field: str = "Gi_Bin", cell_size: float = None) -> "PolygonIndex":
+        """Creates the index from a FeatureSet of polygons in WGS84 or Web Mercator.
+
+        Args:
+            feature_set (FeatureSet): The polygons, e.g. the hotcold features.
+            value_field (str, optional): The attribute to look up. Defaults to "Gi_Bin".
+            cell_size (float, optional): The edge length of a grid cell. Defaults to the median polygon envelope size.
+
+        Returns:
+            PolygonIndex: The index over the polygons in WGS84.
+        """
+        rings = wgs84_rings(feature_set)
+        values = [feature.attributes.get(value_field) for feature in feature_set.features]
+        return cls(rings, np.asarray(values), cell_size)
+
+    def _build_grid(self, valid: np.ndarray, cell_size: float):
+        polygon_ids = np.flatnonzero(valid)
+        if 0 == len(polygon_ids):
+            self.origin = (0.0, 0.0)
+            self.cell_size = 1.0
+            self.shape = (0, 0)
+            self.cell_offsets = np.zeros(1, dtype=np.int64)
+            self.cell_polygons = np.empty(0, dtype=np.int64)
+            return
+
+        if not cell_size:
+            sizes = np.maximum(self.xmax[polygon_ids] - self.xmin[polygon_ids], self.ymax[polygon_ids] - self.ymin[polygon_ids])
+            cell_size = float(np.median(sizes)) or 1.0
+        self.cell_size = cell_size
+        self.origin = (float(self.xmin[polygon_ids].min()), float(self.ymin[polygon_ids].min()))
+        columns_min = self._cells(self.xmin[polygon_ids], self.origin[0])
+        columns_max = self._cells(self.xmax[polygon_ids], self.origin[0])
+        rows_min = self._cells(self.ymin[polygon_ids], self.origin[1])
+        rows_max = self._cells(self.ymax[polygon_ids], self.origin[1])
+        self.shape = (int(rows_max.max()) + 1, int(columns_max.max()) + 1)
+
+        # Expand every polygon into the rows and columns its envelope overlaps
+        column_counts = columns_max - columns_min + 1
+        row_counts = rows_max - rows_min + 1
+        row_polygons = np.repeat(np.arange(len(polygon_ids)), row_counts)
+        rows = expand_ranges(rows_min, row_counts)
+        cell_polygons = np.repeat(row_polygons, column_counts[row_polygons])
+        columns = expand_ranges(columns_min[row_polygons], column_counts[row_polygons])
+        cells = np.repeat(rows, column_counts[row_polygons]) * self.shape[1] + columns
+
+        order = np.argsort(cells, kind="stable")
+        self.cell_polygons = polygon_ids[cell_polygons[order]]
+        self.cell_offsets = np.searchsorted(cells[order], np.arange(self.shape[0] * self.shape[1] + 1))
+
+    def _cells(self, coordinates: np.ndarray, origin: float) -> np.ndarray:
+        return np.floor((coordinates - origin) / self.cell_size).astype(np.int64)
+
+    def lookup_polygons(self, x: np.ndarray, y: np.ndarray, batch_size: int = 100_000) -> np.ndarray:
+        """Finds the polygon containing every point.
+
+        Args:
+            x (np.ndarray): The x coordinates of the points.
+            y (np.ndarray): The y coordinates of the points.
+            batch_size (int, optional): The number of points tested at once. Defaults to 100000.
+
+        Returns:
+            The index of the containing polygon for every point, -1 for points outside of all polygons.
+            Points inside overlapping polygons get the first polygon.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        polygons = np.full(len(x), -1, dtype=np.int64)
+        if 0 == len(self.cell_polygons):
+            return polygons
+
+        for start in range(0, len(x), batch_size):
+            polygons[start:start + batch_size] = self._lookup_batch(x[start:start + batch_size], y[start:start + batch_size])
+        return polygons
+
+    def _lookup_batch(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        polygons = np.full(len(x), len(self.values), dtype=np.int64)
+        rows = self._cells(y, self.origin[1])
+        columns = self._cells(x, self.origin[0])
+        inside_grid = (0 <= rows) & (rows < self.shape[0]) & (0 <= columns) & (columns < self.shape[1])
+        points = np.flatnonzero(inside_grid)
+        cells = rows[points] * self.shape[1] + columns[points]
+
+        # Candidate pairs of points and polygons sharing a grid cell
+        candidate_counts = self.cell_offsets[cells + 1] - self.cell_offsets[cells]
+        pair_points = np.repeat(points, candidate_counts)
+        pair_polygons = self.cell_polygons[expand_ranges(self.cell_offsets[cells], candidate_counts)]
+        in_envelope = (
+            (self.xmin[pair_polygons] <= x[pair_points]) & (x[pair_points] <= self.xmax[pair_polygons])
+            & (self.ymin[pair_polygons] <= y[pair_points]) & (y[pair_points] <= self.ymax[pair_polygons])
+        )
+        pair_points = pair_points[in_envelope]
+        pair_polygons = pair_polygons[in_envelope]
+
+        # Crossing number test of every candidate pair against all edges of its polygon
+        edge_counts = self.edge_counts[pair_polygons]
+        edges = expand_ranges(self.edge_offsets[pair_polygons], edge_counts)
+        edge_pairs = np.repeat(np.arange(len(pair_points)), edge_counts)
+        px = x[pair_points][edge_pairs]
+        py = y[pair_points][edge_pairs]
+        x1, y1, x2, y2 = self.x1[edges], self.y1[edges], self.x2[edges], self.y2[edges]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crosses = ((y1 > py) != (y2 > py)) & (px < (x2 - x1) * (py - y1) / (y2 - y1) + x1)
+        crossings = np.bincount(edge_pairs, weights=crosses, minlength=len(pair_points))
+        inside = crossings.astype(np.int64) % 2 == 1
+
+        np.minimum.at(polygons, pair_points[inside], pair_polygons[inside])
+        polygons[polygons == len(self.values)] = -1
+        return polygons
+
+
+def join_polygon_values(
+        feature_set: FeatureSet,
+        points_df: pd.DataFrame,
+        value_field: str = "Gi_Bin",
+        x_column: str = None,
+        y_column: str = None,
+        batch_size: int = 100_000) -> pd.Series:
+    """Joins an attribute of the polygons containing the points, e.g. the Gi_Bin of hot and cold spots.
+
+    Args:
+        feature_set (FeatureSet): The polygons in WGS84 or Web Mercator, e.g. the result of fetch_hotcold_features.
+        points_df (pd.DataFrame): The points, e.g. the commute cars.
+        value_field (str, optional): The polygon attribute to join. Defaults to "Gi_Bin".
+        x_column (str, optional): The column containing the longitudes. Defaults to longitude or the geometry.
+        y_column (str, optional): The column containing the latitudes. Defaults to latitude or the geometry.
+        batch_size (int, optional): The number of points tested at once. Defaults to 100000.
+
+    Returns:
+        pd.Series: The joined values aligned with the points, missing for points outside of all polygons.
+    """
+    x, y = wgs84_coordinates(points_df, x_column, y_column)
+
+    polygon_index = PolygonIndex.from_feature_set(feature_set, value_field)
+    polygons = polygon_index.lookup_polygons(x, y, batch_size)
+    found = 0 <= polygons
+    values = pd.Series(polygon_index.values[np.where(found, polygons, 0)] if len(polygon_index.values) else np.empty(len(x)), index=points_df.index, name=value_field)
+    if pd.api.types.is_integer_dtype(values):
+        values = values.astype("Int64")
+    return values.where(found)
@@ -0,0 +1,199 @@
+from dataclasses import dataclass
+from urban_traffic.columnar import expand_ranges
+from urban_traffic.geodesy import EARTH_RADIUS_METERS, wgs84_coordinates
+from urban_traffic.reader import TRAFFIC_TIME_FORMAT
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class Trajectories:
+    """The vertices of trip trajectories stored as contiguous arrays.
+
+    The vertices of trajectory i are x[offsets[i]:offsets[i + 1]] and y[offsets[i]:offsets[i + 1]]
+    ordered by trip time, the attributes table contains one row per trajectory.
+    """
+    x: np.ndarray
+    y: np.ndarray
+    offsets: np.ndarray
+    attributes: pd.DataFrame
+
+    def __len__(self) -> int:
+        return len(self.attributes)
+
+    @property
+    def vertex_counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def simplify(self, tolerance_meters: float) -> "Trajectories":
+        """Simplifies every trajectory using simplify_paths, the attributes are shared."""
+        keep = simplify_paths(self.x, self.y, self.offsets, tolerance_meters)
+        offsets = np.concatenate([[0], np.cumsum(keep)]).astype(np.int64)[self.offsets]
+        return Trajectories(self.x[keep], self.y[keep], offsets, self.attributes)
+
+    def to_sdf(self) -> pd.DataFrame:
+        """Converts the trajectories into a spatially enabled DataFrame of polylines, e.g. for generate_routes_renderer."""
+        from arcgis.features import Feature, FeatureSet
+
+        coordinates = np.column_stack([self.x, self.y])
+        features = [
+            Feature(
+                geometry={"paths": [coordinates[start:end].tolist()], "spatialReference": {"wkid": 4326}},
+                attributes=attributes
+            )
+            for start, end, attributes in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist(), self.attributes.to_dict("records"))
+        ]
+        return FeatureSet(features, geometry_type="esriGeometryPolyline", spatial_reference={"wkid": 4326}).sdf
+
+
+def order_positions(traffic_df: pd.DataFrame, keys: tuple[str, ...] = ("trip", "person"), time_column: str = "trip_time") -> tuple[np.ndarray, np.ndarray]:
+    """Orders the positions by trajectory and time using a single lexicographic sort.
+
+    Args:
+        traffic_df (pd.DataFrame): The agent positions, e.g. the result of fetch_traffic_data.
+        keys (tuple[str, ...], optional): The columns identifying a trajectory. Defaults to ("trip", "person").
+        time_column (str, optional): The column containing the trip time. Defaults to "trip_time".
+
+    Returns:
+        A tuple containing: the row positions in trajectory and time order, and the start offsets
+            of every trajectory within the order followed by the number of rows.
+    """
+    if 0 == len(traffic_df):
+        return np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64)
+
+    trip_time = traffic_df[time_column]
+    if not pd.api.types.is_datetime64_any_dtype(trip_time):
+        trip_time = pd.to_datetime(trip_time, format=TRAFFIC_TIME_FORMAT)
+    key_codes = [pd.factorize(traffic_df[key], sort=True)[0] for key in keys]
+
+    # The last key of lexsort is the primary one
+    order = np.lexsort([trip_time.to_numpy(dtype="datetime64[ns]").view(np.int64), *reversed(key_codes)])
+    group_codes = np.column_stack(key_codes)[order]
+    changes = np.flatnonzero(np.any(group_codes[1:] != group_codes[:-1], axis=1)) + 1
+    return order, np.concatenate([[0], changes, [len(order)]]).astype(np.int64)
+
+def _segment_distances(px, py, ax, ay, bx, by) -> np.ndarray:
+    # The distance of every point to its segment, degenerate segments measure the distance to their start
+    dx = bx - ax
+    dy = by - ay
+    length_squared = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(0.0 < length_squared, ((px - ax) * dx + (py - ay) * dy) / length_squared, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+def simplify_paths(lon: np.ndarray, lat: np.ndarray, offsets: np.ndarray, tolerance_meters: float) -> np.ndarray:
+    """Simplifies many paths at once using the Douglas-Peucker algorithm.
+
+    Every round splits all open segments of all paths at their farthest vertex, so the number
+    of Python iterations grows with the depth of the recursion instead of the number of vertices.
+    The distances are measured in meters using a local equirectangular projection.
+
+    Args:
+        lon (np.ndarray): The longitudes of the vertices of all paths in degrees.
+        lat (np.ndarray): The latitudes of the vertices of all paths in degrees.
+        offsets (np.ndarray): The start offsets of every path followed by the number of vertices.
+        tolerance_meters (float): The maximum distance of a dropped vertex to the simplified path.
+
+    Returns:
+        np.ndarray: A boolean mask of the vertices to keep, the first and last vertex of every path are kept.
+    """
+    if tolerance_meters < 0:
+        raise ValueError("The tolerance must not be negative!")
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    keep = np.zeros(len(lon), dtype=bool)
+    if 0 == len(lon):
+        return keep
+
+    # Project into meters around the mean latitude
+    lat = np.asarray(lat, dtype=np.float64)
+    scale = np.radians(1.0) * EARTH_RADIUS_METERS
+    x = np.asarray(lon, dtype=np.float64) * scale * np.cos(np.radians(lat.mean()))
+    y = lat * scale
+
+    starts = offsets[:-1]
+    ends = offsets[1:] - 1
+    non_empty = starts <= ends
+    keep[starts[non_empty]] = True
+    keep[ends[non_empty]] = True
+
+    starts, ends = starts[non_empty], ends[non_empty]
+    while True:
+        open_segments = 1 < ends - starts
+        starts, ends = starts[open_segments], ends[open_segments]
+        if 0 == len(starts):
+            return keep
+
+        counts = ends - starts - 1
+        points = expand_ranges(starts + 1, counts)
+        segments = np.repeat(np.arange(len(starts)), counts)
+        distances = _segment_distances(x[points], y[points], x[starts][segments], y[starts][segments], x[ends][segments], y[ends][segments])
+
+        # The first vertex reaching the maximum of its segment
+        segment_offsets = np.cumsum(counts) - counts
+        max_distances = np.maximum.reduceat(distances, segment_offsets)
+        candidates = np.flatnonzero(distances == max_distances[segments])
+        _, first_candidates = np.unique(segments[candidates], return_index=True)
+        farthest = points[candidates[first_candidates]]
+
+        split = tolerance_meters < max_distances
+        farthest = farthest[split]
+        keep[farthest] = True
+        starts, ends = np.concatenate([starts[split], farthest]), np.concatenate([farthest, ends[split]])
+
+def collect_trajectories(
+        traffic_df: pd.DataFrame,
+        keys: tuple[str, ...] = ("trip", "person"),
+        time_column: str = "trip_time",
+        min_points: int = 2) -> Trajectories:
+    """Groups the agent positions into trajectories ordered by trip time.
+
+    Args:
+        traffic_df (pd.DataFrame): The agent positions containing longitude and latitude columns or point geometries.
+        keys (tuple[str, ...], optional): The columns identifying a trajectory. Defaults to ("trip", "person").
+        time_column (str, optional): The column containing the trip time. Defaults to "trip_time".
+        min_points (int, optional): Trajectories with fewer positions are dropped. Defaults to 2.
+
+    Returns:
+        Trajectories: The vertices and one attribute row per trajectory containing the keys, the vehicle type,
+            the start and end time and the number of positions.
+    """
+    order, offsets = order_positions(traffic_df, keys, time_column)
+    counts = np.diff(offsets)
+    valid = min_points <= counts
+    positions = expand_ranges(offsets[:-1][valid], counts[valid])
+    rows = order[positions]
+    offsets = np.concatenate([[0], np.cumsum(counts[valid])]).astype(np.int64)
+
+    lon, lat = wgs84_coordinates(traffic_df)
+    firsts = rows[offsets[:-1]]
+    lasts = rows[offsets[1:] - 1]
+    attributes = {key: traffic_df[key].to_numpy()[firsts] for key in keys}
+    if "vehicle_type" in traffic_df.columns:
+        attributes["vehicle_type"] = traffic_df["vehicle_type"].to_numpy()[firsts]
+    attributes["start_time"] = traffic_df[time_column].to_numpy()[firsts]
+    attributes["end_time"] = traffic_df[time_column].to_numpy()[lasts]
+    attributes["point_count"] = counts[valid]
+    return Trajectories(lon[rows], lat[rows], offsets, pd.DataFrame(attributes))
+
+def build_trajectories(
+        traffic_df: pd.DataFrame,
+        tolerance_meters: float = 5.0,
+        keys: tuple[str, ...] = ("trip", "person"),
+        time_column: str = "trip_time") -> pd.DataFrame:
+    """Builds one simplified polyline per trip from the agent positions.
+
+    Args:
+        traffic_df (pd.DataFrame): The agent positions, e.g. the result of fetch_traffic_data or read_traffic_features.
+        tolerance_meters (float, optional): The maximum distance of a dropped position to the simplified polyline. Defaults to 5.0.
+        keys (tuple[str, ...], optional): The columns identifying a trip. Defaults to ("trip", "person").
+        time_column (str, optional): The column containing the trip time. Defaults to "trip_time".
+
+    Returns:
+        pd.DataFrame: A spatially enabled DataFrame of polylines in WGS84 including the number of positions
+            and the number of vertices after simplification.
+    """
+    trajectories = collect_trajectories(traffic_df, keys, time_column).simplify(tolerance_meters)
+    trajectories.attributes = trajectories.attributes.assign(vertex_count=trajectories.vertex_counts)
+    return trajectories.to_sdf()
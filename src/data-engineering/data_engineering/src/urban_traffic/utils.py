@@ -1,22 +1,26 @@
-from arcgis.gis import GIS, Item
-from arcgis.features import FeatureLayer, FeatureSet
-from arcgis.geometry import buffer, Envelope, Geometry, LengthUnits, SpatialReference
-from arcgis.geometry.filters import intersects
-from arcgis.features import GeoAccessor
-from arcgis.map.renderers import SimpleRenderer
-from arcgis.map.symbols import SimpleMarkerSymbolEsriSMS, SimpleMarkerSymbolStyle, SimpleLineSymbolEsriSLS, SimpleLineSymbolStyle
-from data_engineering.utils import get_hotcold_layer, get_live_traffic_item
+from __future__ import annotations
+from data_engineering.instrumentation import active_run, instrumented, record_bytes
+from typing import TYPE_CHECKING
+from urban_traffic.columnar import accumulate_rows, normalize_vehicle_types
 import json
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report
-from sqlite3 import connect
 
+# ArcGIS, scikit-learn and SQLite are imported by the functions using them, so reading traffic starts fast
+if TYPE_CHECKING:
+    from arcgis.features import FeatureLayer
+    from arcgis.geometry import Envelope
+    from arcgis.gis import GIS, Item
+    from sklearn.pipeline import Pipeline
 
+
+@instrumented(category="portal")
+def geodesic_buffer(*args, **kwargs):
+    """Buffers geometries using the geometry service of the portal, see arcgis.geometry.buffer."""
+    from arcgis.geometry import buffer
+    return buffer(*args, **kwargs)
+
+@instrumented
 def create_map(gis: GIS, location: str = "Ludwig-Erhard-Anlage 1, 60327 Frankfurt am Main, Germany"):
     """Creates a map centered on the provided location.
     Args:
@@ -31,6 +35,7 @@ def create_map(gis: GIS, location: str = "Ludwig-Erhard-Anlage 1, 60327 Frankfur
     map_view.zoom = 17
     return map_view
 
+@instrumented
 def create_traffic_map(gis: GIS):
     """Creates a map centered on Frankfurt am Main.
 
@@ -40,6 +45,8 @@ def create_traffic_map(gis: GIS):
     Returns:
         A map centered on Frankfurt am Main.
     """ 
+    from data_engineering.utils import get_hotcold_layer, get_live_traffic_item
+
     traffic_map = create_map(gis, location="Ludwig-Erhard-Anlage 1, 60327 Frankfurt am Main, Germany")
     hotcold_layer: FeatureLayer = get_hotcold_layer(gis)
     live_traffic_item: Item = get_live_traffic_item(gis)
@@ -49,64 +56,173 @@ def create_traffic_map(gis: GIS):
     traffic_map.zoom = 12
     return traffic_map
 
-def prepare_traffic(traffic_df: pd.DataFrame) -> pd.DataFrame:
+@instrumented
+def prepare_traffic(traffic_df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
     """
     Prepares the traffic DataFrame for analysis by converting data types.
 
+    The trip time is split into int64 hour, minute and second columns, so arithmetic
+    on them cannot wrap around, and every vehicle type becomes a binary uint8 column,
+    in order of appearance.
+
     Args:
         traffic_df (pd.DataFrame): The traffic DataFrame to prepare.
+        inplace (bool, optional): Modify the DataFrame itself instead of a shallow copy. Defaults to False.
 
     Returns:
         pd.DataFrame: The prepared traffic DataFrame.
     """
-    # Extract hours, minutes, and seconds
-    traffic_df["trip_time"] = pd.to_datetime(traffic_df["trip_time"], format="%Y-%m-%dT%H:%M:%S")
-    traffic_df["hour"] = traffic_df["trip_time"].dt.strftime("%H").astype(int)
-    traffic_df["minute"] = traffic_df["trip_time"].dt.strftime("%M").astype(int)
-    traffic_df["second"] = traffic_df["trip_time"].dt.strftime("%S").astype(int)
-    traffic_df = traffic_df.drop(columns=["trip_time"], axis=1)
+    if not inplace:
+        # Only the column index is copied, the new columns never touch the caller's data
+        traffic_df = traffic_df.copy(deep=False)
 
-    # Fill empty values for vehicle_type
-    traffic_df = traffic_df.fillna({"vehicle_type": "pedestrian"})
+    # Extract hours, minutes, and seconds
+    trip_time = pd.to_datetime(traffic_df["trip_time"], format="%Y-%m-%dT%H:%M:%S")
+    traffic_df["hour"] = trip_time.dt.hour.to_numpy(dtype=np.int64)
+    traffic_df["minute"] = trip_time.dt.minute.to_numpy(dtype=np.int64)
+    traffic_df["second"] = trip_time.dt.second.to_numpy(dtype=np.int64)
+    del trip_time
+
+    # Factorize the raw values, fill empty values and lower case only the distinct vehicle types
+    row_codes, vehicle_types = normalize_vehicle_types(traffic_df["vehicle_type"])
+
+    # Create binary columns using a single indicator matrix
+    indicators = np.zeros((len(row_codes), len(vehicle_types)), dtype=np.uint8, order="F")
+    indicators[np.arange(len(row_codes)), row_codes] = 1
+    traffic_df.drop(columns=["trip_time", "vehicle_type"], inplace=True)
+    for index, vehicle_type in enumerate(vehicle_types):
+        traffic_df[vehicle_type] = indicators[:, index]
+    
+    return traffic_df
 
-    # Convert all vehicle types to lower case
-    traffic_df["vehicle_type"] = traffic_df["vehicle_type"].str.lower()
+def _search_feature_class(filepath: str, field_names: list[str], spatial_filter, wkid: int, chunk_size: int = None):
+    from arcgis.features import GeoAccessor
+    from arcgis.geometry import SpatialReference
+    # See: https://pro.arcgis.com/de/pro-app/latest/arcpy/data-access/searchcursor-class.htm
+    # Raises an ImportError right away when arcpy is not available
+    from arcpy.da import SearchCursor
 
-    # Unique vehicle types
-    vehicle_types = traffic_df["vehicle_type"].unique()
+    def search_features():
+        # The rows are streamed from the cursor into column buffers, at most one chunk is held in memory
+        with SearchCursor(
+            filepath,
+            field_names=["OID@", "SHAPE@JSON", *field_names],
+            spatial_reference=SpatialReference(wkid).as_arcpy,
+            spatial_filter=spatial_filter.as_arcpy,
+            spatial_relationship="INTERSECTS") as search_cursor:
+            for data_frame in accumulate_rows(search_cursor, search_cursor.fields, dtypes={"OID@": np.int64}, chunk_size=chunk_size):
+                data_frame.rename(columns={"OID@": "OBJECTID", "SHAPE@JSON": "SHAPE"}, inplace=True)
+                yield GeoAccessor.from_df(data_frame, geometry_column="SHAPE", sr=wkid)
 
-    # Create binary columns
-    for vehicle_type in vehicle_types:
-        traffic_df[vehicle_type] = traffic_df["vehicle_type"].apply(lambda vt: 1 if vt == vehicle_type else 0).astype(int)
-    traffic_df = traffic_df.drop(columns=["vehicle_type"], axis=1)
-    
-    return traffic_df
+    return search_features()
 
-def read_traffic_accidents_features_by_extent(filepath: str, extent: Envelope) -> pd.DataFrame:
+@instrumented
+def read_traffic_accidents_features_by_extent(filepath: str, extent: Envelope, chunks: bool = False, chunk_size: int = 50_000):
     """
     Reads traffic accidents from a local feature class.
 
     Args:
         filepath (str): The filepath to the local feature class.
         extent (Envelope): A spatial extent to filter the traffic accidents.
+        chunks (bool, optional): Return a generator of DataFrames with at most chunk_size rows streamed from an arcpy search cursor.
+            Without arcpy the feature class is read at once and yielded as a single DataFrame. Defaults to False.
+        chunk_size (int, optional): The number of rows per chunk. Defaults to 50000.
 
     Returns:
-        pd.DataFrame: The traffic accidents DataFrame.
+        pd.DataFrame: The traffic accidents DataFrame, or a generator of them if chunks is set.
     """
-    spatial_filter = intersects(extent, sr=extent.spatial_reference)
+    from arcgis.features import GeoAccessor
+    from arcgis.geometry.filters import intersects
+
     fields = ["uwochentag", "ustunde", "ukategorie", "uart", "utyp1", "ulichtverh", "ist_strasse"]
-    return GeoAccessor.from_featureclass(filepath, fields=fields, spatial_filter=spatial_filter)
+    if chunks:
+        try:
+            # Extents without a spatial reference are taken as WGS84
+            spatial_reference = extent.spatial_reference or {}
+            wkid = spatial_reference.get("latestWkid") or spatial_reference.get("wkid") or 4326
+            return _search_feature_class(filepath, fields, extent, wkid, chunk_size)
+        except ImportError:
+            pass
+
+    spatial_filter = intersects(extent, sr=extent.spatial_reference)
+    data_frame = GeoAccessor.from_featureclass(filepath, fields=fields, spatial_filter=spatial_filter)
+    if chunks:
+        return iter([data_frame])
+    return data_frame
+
+@instrumented
+def score_traffic_accidents_by_extent(model: Pipeline, filepath: str, extent: Envelope, chunk_size: int = 50_000, probabilities: bool = False):
+    """
+    Scores the traffic accidents of a local feature class in chunks using a fitted model.
 
-def read_traffic_sql(filepath: str, limit: int) -> pd.DataFrame:
-    with connect(filepath) as connection:
-        if limit < 1:
-            return pd.read_sql('SELECT * FROM agent_pos;', connection)
+    Args:
+        model (Pipeline): A fitted model, e.g. loaded by model.load_model.
+        filepath (str): The filepath to the local feature class.
+        extent (Envelope): A spatial extent to filter the traffic accidents.
+        chunk_size (int, optional): The number of accidents scored at once. Defaults to 50000.
+        probabilities (bool, optional): Add one probability column for every class. Defaults to False.
+
+    Returns:
+        A generator of DataFrames containing the prediction of every traffic accident.
+    """
+    from urban_traffic.model import predict_batches
+
+    accident_frames = read_traffic_accidents_features_by_extent(filepath, extent, chunks=True, chunk_size=chunk_size)
+    return predict_batches(model, accident_frames, batch_size=chunk_size, probabilities=probabilities)
+
+def _value_bytes(data_frame: pd.DataFrame) -> int:
+    # Text values count their UTF-8 length, all other values their fixed size
+    byte_count = 0
+    for _, column in data_frame.items():
+        if pd.api.types.is_object_dtype(column):
+            byte_count += int(column.dropna().astype(str).str.encode("utf-8").str.len().sum())
         else:
-            return pd.read_sql(f'SELECT * FROM agent_pos LIMIT {limit};', connection)
-        
-def read_traffic_features(filepath: str, lon: float, lat: float, meters: float) -> pd.DataFrame:
+            byte_count += int(column.memory_usage(index=False))
+    return byte_count
+
+@instrumented
+def read_traffic_sql(filepath: str, limit: int, compact: bool = False) -> pd.DataFrame:
+    if compact:
+        # Arrow record batches using timestamps, categorical vehicle types, float32 coordinates and int32 ids
+        from urban_traffic.arrow import read_traffic_compact
+        traffic_df = read_traffic_compact(filepath, limit)
+    else:
+        from sqlite3 import connect
+
+        with connect(filepath) as connection:
+            if limit < 1:
+                traffic_df = pd.read_sql('SELECT * FROM agent_pos;', connection)
+            else:
+                traffic_df = pd.read_sql('SELECT * FROM agent_pos LIMIT ?;', connection, params=[limit])
+
+    if active_run() is not None:
+        # The bytes parsed from the SQLite rows are only counted while profiling
+        record_bytes(_value_bytes(traffic_df))
+    return traffic_df
+
+@instrumented
+def read_traffic_features(filepath: str, lon: float, lat: float, meters: float, chunks: bool = False, chunk_size: int = 100_000):
+    """
+    Reads the traffic features within a geodesic radius from a local feature class.
+
+    Args:
+        filepath (str): The filepath to the local feature class.
+        lon (float): The longitude of the center in degrees.
+        lat (float): The latitude of the center in degrees.
+        meters (float): The radius in meters.
+        chunks (bool, optional): Return a generator of DataFrames with at most chunk_size rows streamed from an arcpy search cursor.
+            Without arcpy the feature class is read at once and yielded as a single DataFrame. Defaults to False.
+        chunk_size (int, optional): The number of rows per chunk. Defaults to 100000.
+
+    Returns:
+        A spatially enabled DataFrame, or a generator of them if chunks is set.
+    """
+    from arcgis.features import GeoAccessor
+    from arcgis.geometry import Geometry, LengthUnits, SpatialReference
+    from arcgis.geometry.filters import intersects
+
     wgs84 = SpatialReference(4326)
-    buffer_result = buffer([
+    buffer_result = geodesic_buffer([
         Geometry({"x": lon, "y": lat, "spatialReference": wgs84})
         ], 
         in_sr=wgs84, 
@@ -122,66 +238,64 @@ def read_traffic_features(filepath: str, lon: float, lat: float, meters: float)
 
     buffered_geometry = buffer_result[0]
     try:
-        # See: https://pro.arcgis.com/de/pro-app/latest/arcpy/data-access/searchcursor-class.htm
-        from arcpy.da import SearchCursor
-
-        new_records = []
-        chunk_size = 1000
-        data_frame = None
-        with SearchCursor(
-            filepath, 
-            field_names=["OID@", "SHAPE@JSON", "trip", "person", "vehicle_type", "trip_time"], 
-            spatial_reference=wgs84.as_arcpy, 
-            spatial_filter=buffered_geometry.as_arcpy,
-            spatial_relationship="INTERSECTS") as search_cursor:
-            for feature in search_cursor:
-                new_record = {field: value for field, value in zip(search_cursor.fields, feature)}
-                new_records.append(new_record)
-                if 0 == len(new_records) % chunk_size:
-                    if data_frame is None:
-                        data_frame = pd.DataFrame.from_records(new_records)
-                    else:
-                        data_frame = pd.concat([data_frame, pd.DataFrame.from_records(new_records)], ignore_index=True)
-                    new_records = []
-
-        if new_records:
-            if data_frame is None:
-                data_frame = pd.DataFrame.from_records(new_records)
-            else:
-                data_frame = pd.concat([data_frame, pd.DataFrame.from_records(new_records)], ignore_index=True)
-        
-        data_frame.rename(columns={"OID@": "OBJECTID", "SHAPE@JSON": "SHAPE"}, inplace=True)
-        return GeoAccessor.from_df(data_frame, geometry_column="SHAPE", sr=4326)
-
+        traffic_features = _search_feature_class(
+            filepath,
+            ["trip", "person", "vehicle_type", "trip_time"],
+            buffered_geometry,
+            4326,
+            chunk_size if chunks else None)
     except ImportError:
+        # Without arcpy the feature class can only be read at once
         spatial_filter = intersects(buffered_geometry, sr=wgs84)
-        return GeoAccessor.from_featureclass(filepath, spatial_filter=spatial_filter)
+        data_frame = GeoAccessor.from_featureclass(filepath, spatial_filter=spatial_filter)
+        if chunks:
+            return iter([data_frame])
+        return data_frame
 
+    if chunks:
+        return traffic_features
+    return next(traffic_features)
+
+@instrumented
 def fetch_traffic_data(filepath: str, max_record_count: int = 1000) -> pd.DataFrame:
+    from arcgis.features import GeoAccessor
+
     traffic_df = read_traffic_sql(filepath, max_record_count)
     return GeoAccessor.from_xy(traffic_df, x_column='longitude', y_column='latitude', sr=4326)
 
+@instrumented
 def read_bike_trail(filepath: str) -> pd.DataFrame:
-    with open(filepath, 'r', encoding='utf-8') as file_in:
-        bike_trail_data = json.load(file_in)
-        return FeatureSet.from_geojson(bike_trail_data).sdf
+    from arcgis.features import FeatureSet
+
+    with open(filepath, 'rb') as file_in:
+        content = file_in.read()
+    record_bytes(len(content))
+    return FeatureSet.from_geojson(json.loads(content)).sdf
     
+@instrumented
 def explode_bike_trail(filepath: str):
-    with open(filepath, 'r', encoding='utf-8') as file_in:
-        bike_trail_data = json.load(file_in)
-        feature_set = FeatureSet.from_geojson(bike_trail_data)
-        for feature in feature_set.features:
-            geometry = feature.geometry
-            for x, y in geometry.coordinates:
-                yield {
-                    **feature.attributes,
-                    "geometry": Geometry({"x": x, "y": y, "spatialReference": feature_set.spatial_reference})
-                }
+    from arcgis.geometry import Geometry, SpatialReference
+    from urban_traffic.bike_trail import explode_bike_trail_arrays
 
+    # Use explode_bike_trail_arrays directly to avoid one geometry object per vertex
+    vertices = explode_bike_trail_arrays(filepath)
+    wgs84 = SpatialReference(4326)
+    feature_records = vertices.feature_records
+    for feature_index, x, y in zip(vertices.feature_index.tolist(), vertices.x.tolist(), vertices.y.tolist()):
+        yield {
+            **feature_records[feature_index],
+            "geometry": Geometry({"x": x, "y": y, "spatialReference": wgs84})
+        }
+
+@instrumented
 def filter_commute_cars(traffic_df: pd.DataFrame) -> pd.DataFrame:
     return traffic_df.query("car == 1 and 7 < hour and hour < 10")
 
+@instrumented
 def generate_car_renderer():
+    from arcgis.map.renderers import SimpleRenderer
+    from arcgis.map.symbols import SimpleLineSymbolEsriSLS, SimpleLineSymbolStyle, SimpleMarkerSymbolEsriSMS, SimpleMarkerSymbolStyle
+
     return SimpleRenderer(
         symbol=SimpleMarkerSymbolEsriSMS(
             style=SimpleMarkerSymbolStyle.esri_sms_circle.value,
@@ -195,7 +309,48 @@ def generate_car_renderer():
         )
     )
 
+@instrumented
+def generate_cluster_renderer(max_count: int, min_size: float = 6, max_size: float = 40):
+    """Generates a renderer sizing the clusters of PointLevelOfDetail.cluster_sdf by their number of points.
+
+    Args:
+        max_count (int): The number of points of the largest cluster.
+        min_size (float, optional): The symbol size of single points in pixels. Defaults to 6.
+        max_size (float, optional): The symbol size of the largest cluster in pixels. Defaults to 40.
+
+    Returns:
+        A renderer using the style of generate_car_renderer and a size visual variable.
+    """
+    from arcgis.map.renderers import SimpleRenderer, SizeInfoVisualVariable
+    from arcgis.map.symbols import SimpleLineSymbolEsriSLS, SimpleLineSymbolStyle, SimpleMarkerSymbolEsriSMS, SimpleMarkerSymbolStyle
+
+    return SimpleRenderer(
+        symbol=SimpleMarkerSymbolEsriSMS(
+            style=SimpleMarkerSymbolStyle.esri_sms_circle.value,
+            size=min_size,
+            outline=SimpleLineSymbolEsriSLS(
+                color=[155, 155, 155, 55],
+                width=0.7,
+                style=SimpleLineSymbolStyle.esri_sls_solid.value,
+            ),
+            color=[255, 0, 0, 55]
+        ),
+        visual_variables=[
+            SizeInfoVisualVariable(
+                field="point_count",
+                min_data_value=1,
+                max_data_value=max(2, int(max_count)),
+                min_size=min_size,
+                max_size=max_size,
+            )
+        ]
+    )
+
+@instrumented
 def generate_routes_renderer():
+    from arcgis.map.renderers import SimpleRenderer
+    from arcgis.map.symbols import SimpleLineSymbolEsriSLS, SimpleLineSymbolStyle
+
     return SimpleRenderer(
         symbol=SimpleLineSymbolEsriSLS(
             color=[0, 204, 102, 155],
@@ -204,24 +359,18 @@ def generate_routes_renderer():
         )
     )
 
+@instrumented
 def evaluate_model(df: pd.DataFrame, categorical_cols: list[str], numeric_cols: list[str], target_col: str) -> Pipeline:
+    from sklearn.metrics import accuracy_score, classification_report
+    from sklearn.model_selection import train_test_split
+    from urban_traffic.model import build_model_pipeline
+
     # Features and target
     X = df[categorical_cols + numeric_cols]
     y = df[target_col]
 
-    # Preprocessing
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_cols),
-            ("num", StandardScaler(), numeric_cols)
-        ]
-    )
-
-    # Pipeline with RandomForest
-    model = Pipeline(steps=[
-        ("preprocessor", preprocessor),
-        ("classifier", RandomForestClassifier(n_estimators=100, random_state=42))
-    ])
+    # Pipeline with sparse preprocessing and a RandomForest using all cores
+    model = build_model_pipeline(categorical_cols, numeric_cols)
 
     # Train/test split
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
@@ -238,6 +387,7 @@ def evaluate_model(df: pd.DataFrame, categorical_cols: list[str], numeric_cols:
     
     return model
 
+@instrumented
 def prepare_traffic_accidents(traffic_accidents: pd.DataFrame) -> pd.DataFrame:
     # Define mapping for grouping
     group_mapping = {
@@ -0,0 +1,256 @@
+"""Benchmarks the hot paths of the samples using synthetic data and an in-memory GIS.
+
+No API key, network access or local feature class is needed, all inputs are generated
+deterministically. Every benchmark records the fastest wall time of several runs and the
+peak memory of one additional traced run. The results are written as JSON, so runs can be compared:
+
+    python tests/benchmark.py --scales 10k 100k 1M --output baseline.json
+    python tests/benchmark.py --scales 10k 100k 1M --output current.json --compare baseline.json
+"""
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from data_engineering.utils import deep_compare, fetch_charging_stations
+from fakes import FakeFeatureLayer, FakeGIS, FakeItem
+from synthetic import create_agent_pos_database, create_agent_positions, create_bike_trail_file, create_charging_stations, create_traffic_accidents
+from typing import Callable
+from urban_traffic.utils import evaluate_model, explode_bike_trail, fetch_traffic_data, filter_commute_cars, prepare_traffic, read_traffic_sql
+import argparse
+import datetime
+import gc
+import io
+import json
+import numpy as np
+import os
+import pandas as pd
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+CHARGING_STATIONS_ITEM_ID = "bc3c97f73d6b4be4921be8560fbc325a"
+SCALE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+class Workspace:
+    """Creates the synthetic inputs of every scale once and reuses them across benchmarks."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._files = {}
+
+    def _file(self, name: str, rows: int, create: Callable[[str], object]) -> str:
+        key = (name, rows)
+        if key not in self._files:
+            filepath = os.path.join(self.directory, f"{rows}_{name}")
+            create(filepath)
+            self._files[key] = filepath
+        return self._files[key]
+
+    def traffic_database(self, rows: int) -> str:
+        return self._file("traffic.db", rows, lambda filepath: create_agent_pos_database(filepath, rows))
+
+    def bike_trail_file(self, rows: int) -> str:
+        return self._file("bike_trail.geojson", rows, lambda filepath: create_bike_trail_file(filepath, rows, feature_count=max(1, rows // 1000)))
+
+
+@dataclass
+class Benchmark:
+    """A benchmark whose setup prepares the inputs and returns the function to measure."""
+    name: str
+    setup: Callable[[Workspace, int], Callable[[], object]]
+    max_rows: int = None
+
+
+def _setup_read_traffic_sql(workspace: Workspace, rows: int):
+    filepath = workspace.traffic_database(rows)
+    return lambda: read_traffic_sql(filepath, 0)
+
+def _setup_fetch_traffic_data(workspace: Workspace, rows: int):
+    filepath = workspace.traffic_database(rows)
+    return lambda: fetch_traffic_data(filepath, rows)
+
+def _setup_prepare_traffic(workspace: Workspace, rows: int):
+    traffic_df = create_agent_positions(rows)
+    return lambda: prepare_traffic(traffic_df)
+
+def _setup_filter_commute_cars(workspace: Workspace, rows: int):
+    traffic_df = prepare_traffic(create_agent_positions(rows))
+    return lambda: filter_commute_cars(traffic_df)
+
+def _setup_explode_bike_trail(workspace: Workspace, rows: int):
+    filepath = workspace.bike_trail_file(rows)
+    return lambda: sum(1 for _ in explode_bike_trail(filepath))
+
+def _setup_deep_compare(workspace: Workspace, rows: int):
+    records = create_agent_positions(rows).to_dict("records")
+    old_features = {"features": [{"attributes": record} for record in records]}
+    new_features = {"features": [{"attributes": dict(record)} for record in records]}
+    for feature in new_features["features"][::100]:
+        feature["attributes"]["vehicle_type"] = "scooter"
+    return lambda: deep_compare(old_features, new_features)
+
+def _setup_evaluate_model(workspace: Workspace, rows: int):
+    traffic_accidents = create_traffic_accidents(rows)
+    categorical_cols = ["uwochentag", "uart", "ukategorie", "ulichtverh", "ist_strasse"]
+    numeric_cols = ["ustunde"]
+
+    def run():
+        # The accuracy and classification report are not part of the results
+        with redirect_stdout(io.StringIO()):
+            return evaluate_model(traffic_accidents, categorical_cols, numeric_cols, "utyp1_grouped")
+    return run
+
+def _setup_fetch_charging_stations(workspace: Workspace, rows: int):
+    feature_layer = FakeFeatureLayer(create_charging_stations(rows), max_record_count=2000)
+
+    def run():
+        # A new GIS every run, so the portal lookups are measured as well
+        gis = FakeGIS({CHARGING_STATIONS_ITEM_ID: FakeItem(CHARGING_STATIONS_ITEM_ID, [feature_layer])})
+        return fetch_charging_stations(gis, return_all_records=True)
+    return run
+
+
+BENCHMARKS = [
+    Benchmark("read_traffic_sql", _setup_read_traffic_sql),
+    Benchmark("fetch_traffic_data", _setup_fetch_traffic_data),
+    Benchmark("prepare_traffic", _setup_prepare_traffic),
+    Benchmark("filter_commute_cars", _setup_filter_commute_cars),
+    Benchmark("explode_bike_trail", _setup_explode_bike_trail, max_rows=1_000_000),
+    Benchmark("deep_compare", _setup_deep_compare, max_rows=1_000_000),
+    Benchmark("evaluate_model", _setup_evaluate_model, max_rows=1_000_000),
+    Benchmark("fetch_charging_stations", _setup_fetch_charging_stations, max_rows=100_000),
+]
+
+
+def parse_scale(scale: str) -> int:
+    """Parses a scale like 10k or 1M into a row count."""
+    scale = scale.strip().lower().replace("_", "")
+    multiplier = SCALE_SUFFIXES.get(scale[-1:], 1)
+    value = scale[:-1] if scale[-1:] in SCALE_SUFFIXES else scale
+    return int(float(value) * multiplier)
+
+def measure(run: Callable[[], object], repeat: int = 3) -> dict:
+    """Measures the fastest wall time of several runs and the peak memory of one traced run.
+
+    Args:
+        run (Callable): The function to measure.
+        repeat (int, optional): The number of timed runs. Defaults to 3.
+
+    Returns:
+        A dict containing the timings in seconds and the peak memory in bytes.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+        del result
+
+    # Tracing slows down allocations, so the memory is measured separately
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": min(timings),
+        "mean_seconds": sum(timings) / len(timings),
+        "peak_memory_bytes": peak_memory,
+    }
+
+def run_benchmarks(scales: list[int], names: list[str] = None, repeat: int = 3, directory: str = None) -> dict:
+    """Runs the benchmarks at every scale.
+
+    Args:
+        scales (list[int]): The row counts of the synthetic inputs.
+        names (list[str], optional): The benchmarks to run. Defaults to all benchmarks.
+        repeat (int, optional): The number of timed runs. Defaults to 3.
+        directory (str, optional): The directory of the synthetic files. Defaults to a temporary directory.
+
+    Returns:
+        A dict containing the environment and one result for every benchmark and scale.
+    """
+    benchmarks = [benchmark for benchmark in BENCHMARKS if not names or benchmark.name in names]
+    results = []
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        workspace = Workspace(temp_dir)
+        for rows in scales:
+            for benchmark in benchmarks:
+                result = {"benchmark": benchmark.name, "rows": rows}
+                if benchmark.max_rows and benchmark.max_rows < rows:
+                    result["skipped"] = f"More than {benchmark.max_rows} rows"
+                else:
+                    result.update(measure(benchmark.setup(workspace, rows), repeat))
+                results.append(result)
+                print(_format_result(result), file=sys.stderr)
+
+    return {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "repeat": repeat,
+        "results": results,
+    }
+
+def compare_results(current: dict, baseline: dict) -> list[dict]:
+    """Compares the wall times and peak memory of two runs.
+
+    Args:
+        current (dict): The results of the current run.
+        baseline (dict): The results of the baseline run.
+
+    Returns:
+        A list containing the ratios of current to baseline for every benchmark measured in both runs.
+    """
+    baseline_results = {(result["benchmark"], result["rows"]): result for result in baseline["results"] if "seconds" in result}
+    comparison = []
+    for result in current["results"]:
+        baseline_result = baseline_results.get((result["benchmark"], result["rows"]))
+        if baseline_result and "seconds" in result:
+            comparison.append({
+                "benchmark": result["benchmark"],
+                "rows": result["rows"],
+                "time_ratio": result["seconds"] / baseline_result["seconds"] if baseline_result["seconds"] else None,
+                "memory_ratio": result["peak_memory_bytes"] / baseline_result["peak_memory_bytes"] if baseline_result["peak_memory_bytes"] else None,
+            })
+    return comparison
+
+def _format_result(result: dict) -> str:
+    if "skipped" in result:
+        return f"{result['benchmark']:<24} {result['rows']:>10} skipped: {result['skipped']}"
+    return f"{result['benchmark']:<24} {result['rows']:>10} {result['seconds']:>10.4f}s {result['peak_memory_bytes'] / 2**20:>10.1f} MiB"
+
+def main(arguments: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmarks the samples using synthetic data.")
+    parser.add_argument("--scales", nargs="+", default=["10k", "100k"], help="The row counts, e.g. 10k 100k 1M 10M.")
+    parser.add_argument("--benchmarks", nargs="+", choices=[benchmark.name for benchmark in BENCHMARKS], help="The benchmarks to run.")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of timed runs.")
+    parser.add_argument("--output", default="benchmark.json", help="The JSON file of the results.")
+    parser.add_argument("--compare", help="A JSON file of a previous run to compare with.")
+    parser.add_argument("--directory", help="The directory of the synthetic files.")
+    args = parser.parse_args(arguments)
+
+    results = run_benchmarks([parse_scale(scale) for scale in args.scales], args.benchmarks, args.repeat, args.directory)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file_in:
+            results["comparison"] = compare_results(results, json.load(file_in))
+        for entry in results["comparison"]:
+            print(f"{entry['benchmark']:<24} {entry['rows']:>10} time x{entry['time_ratio'] or 0:.2f} memory x{entry['memory_ratio'] or 0:.2f}", file=sys.stderr)
+
+    with open(args.output, "w", encoding="utf-8") as file_out:
+        json.dump(results, file_out, indent=2)
+    return results
+
+if __name__ == '__main__':
+    main()
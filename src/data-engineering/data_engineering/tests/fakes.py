@@ -0,0 +1,188 @@
+from arcgis._impl.common._mixins import PropertyMap
+from arcgis.features import FeatureSet
+from arcgis.geometry import Geometry
+from urban_traffic.geodesy import WEB_MERCATOR_WKIDS, web_mercator_to_wgs84, wgs84_to_web_mercator
+import json
+import numpy as np
+import pandas as pd
+import re
+import threading
+
+
+def _to_pandas_query(where: str) -> str:
+    """Translates the simple SQL where clauses used by the samples into a pandas query."""
+    expression = re.sub(r"(\w+) BETWEEN (\S+) AND (\S+)", r"(\1 >= \2 and \1 <= \3)", where)
+    expression = re.sub(r"TIMESTAMP '([^']*)'", r"'\1'", expression, flags=re.IGNORECASE)
+    expression = expression.replace("1=1", "(index == index)")
+    expression = re.sub(r"\bAND\b", "and", expression)
+    expression = re.sub(r"\bOR\b", "or", expression)
+    expression = expression.replace("<>", "!=")
+    return re.sub(r"(?<![<>!=])=(?!=)", "==", expression)
+
+
+def _envelope(geometry: dict) -> tuple[float, float, float, float]:
+    if "rings" in geometry or "paths" in geometry:
+        positions = [position for part in geometry.get("rings", geometry.get("paths")) for position in part]
+        xs = [position[0] for position in positions]
+        ys = [position[1] for position in positions]
+        return min(xs), min(ys), max(xs), max(ys)
+    return geometry["x"], geometry["y"], geometry["x"], geometry["y"]
+
+def _wkid(spatial_reference) -> int:
+    # Web Mercator is reported by its latest wkid, so the variants compare equal
+    if spatial_reference is None or isinstance(spatial_reference, int):
+        wkid = spatial_reference
+    else:
+        wkid = spatial_reference.get("latestWkid") or spatial_reference.get("wkid")
+    return 3857 if wkid in WEB_MERCATOR_WKIDS else wkid
+
+def _project_positions(positions: list, from_wkid: int, to_wkid: int) -> list:
+    if from_wkid == to_wkid or not positions:
+        return positions
+    if (from_wkid, to_wkid) not in ((4326, 3857), (3857, 4326)):
+        raise ValueError(f"Unsupported projection from {from_wkid} to {to_wkid}!")
+    project = wgs84_to_web_mercator if 4326 == from_wkid else web_mercator_to_wgs84
+    xs, ys = project([position[0] for position in positions], [position[1] for position in positions])
+    return np.column_stack([xs, ys]).tolist()
+
+def _project_geometry(geometry: dict, from_wkid: int, to_wkid: int) -> Geometry:
+    projected = {"spatialReference": {"wkid": to_wkid}}
+    for key in ("rings", "paths"):
+        if key in geometry:
+            projected[key] = [_project_positions(list(part), from_wkid, to_wkid) for part in geometry[key]]
+    if "x" in geometry:
+        [[projected["x"], projected["y"]]] = _project_positions([[geometry["x"], geometry["y"]]], from_wkid, to_wkid)
+    return Geometry(projected)
+
+def _project_envelope(envelope: dict, from_wkid: int, to_wkid: int) -> dict:
+    [[xmin, ymin], [xmax, ymax]] = _project_positions([[envelope["xmin"], envelope["ymin"]], [envelope["xmax"], envelope["ymax"]]], from_wkid, to_wkid)
+    return {"xmin": xmin, "ymin": ymin, "xmax": xmax, "ymax": ymax}
+
+def _intersects_envelope(geometry: dict, envelope: dict) -> bool:
+    xmin, ymin, xmax, ymax = _envelope(geometry)
+    return xmin <= envelope["xmax"] and envelope["xmin"] <= xmax and ymin <= envelope["ymax"] and envelope["ymin"] <= ymax
+
+
+class FakeFeatureLayer:
+    """An in-memory stand-in for a FeatureLayer which serves a DataFrame.
+
+    The spatial reference of the DataFrame is the native spatial reference of the layer,
+    envelope filters and out_sr are projected between WGS84 and Web Mercator.
+    """
+
+    def __init__(self, features: pd.DataFrame, max_record_count: int = 1000, object_id_field: str = "OBJECTID", failures: int = 0,
+                 url: str = "https://services.example.com/FeatureServer/0", renderer: dict = None, properties: dict = None):
+        self.features = features
+        self.url = url
+        self.renderer = renderer or {"type": "simple", "symbol": {"type": "esriSMS"}}
+        self.properties = PropertyMap({
+            "objectIdField": object_id_field,
+            "maxRecordCount": max_record_count,
+            **(properties or {}),
+        })
+        # The metadata of the service, the properties of a layer handle are only updated by _hydrate
+        self.service_properties = self.properties
+        self.hydrations = 0
+        self.failures = failures
+        self.queries = []
+        self.active_queries = 0
+        self.max_active_queries = 0
+        self._lock = threading.Lock()
+
+    def _hydrate(self):
+        self.hydrations += 1
+        self.properties = self.service_properties
+
+    def query(self, where: str = "1=1", out_fields="*", return_ids_only: bool = False, return_count_only: bool = False,
+              result_offset: int = None, result_record_count: int = None, order_by_fields: str = None,
+              as_df: bool = False, **kwargs):
+        with self._lock:
+            self.queries.append({"where": where, "result_offset": result_offset, "result_record_count": result_record_count, **kwargs})
+            self.active_queries += 1
+            self.max_active_queries = max(self.max_active_queries, self.active_queries)
+            failing = 0 < self.failures
+            if failing:
+                self.failures -= 1
+        try:
+            if failing:
+                raise ConnectionError("Simulated portal failure!")
+
+            object_id_field = self.properties.objectIdField
+            result = self.features.query(_to_pandas_query(where))
+            native_wkid = _wkid(self.features.spatial.sr)
+            geometry_filter = kwargs.get("geometry_filter")
+            if geometry_filter:
+                # Only envelope filters are supported, features are compared by their envelopes
+                envelope = geometry_filter["geometry"]
+                filter_wkid = _wkid(geometry_filter.get("inSR") or envelope.get("spatialReference")) or native_wkid
+                envelope = _project_envelope(envelope, filter_wkid, native_wkid)
+                result = result[[_intersects_envelope(geometry, envelope) for geometry in result["SHAPE"]]]
+            if return_ids_only:
+                return {"objectIdFieldName": object_id_field, "objectIds": result[object_id_field].tolist()}
+            if return_count_only:
+                return len(result)
+            if order_by_fields:
+                result = result.sort_values(object_id_field)
+            if result_offset:
+                result = result.iloc[result_offset:]
+            if result_record_count:
+                result = result.iloc[:result_record_count]
+            result = result.reset_index(drop=True)
+            out_wkid = _wkid(kwargs.get("out_sr")) or native_wkid
+            if out_wkid != native_wkid:
+                result = result.copy()
+                result["SHAPE"] = [_project_geometry(geometry, native_wkid, out_wkid) for geometry in result["SHAPE"]]
+                result.spatial.set_geometry("SHAPE", sr=out_wkid)
+            return result if as_df else FeatureSet.from_dataframe(result)
+        finally:
+            with self._lock:
+                self.active_queries -= 1
+
+
+class FakeItem:
+    """An in-memory stand-in for a portal item holding layers."""
+
+    def __init__(self, item_id: str, layers: list = None):
+        self.id = item_id
+        self.layers = layers or []
+
+
+class FakeContentManager:
+    """An in-memory stand-in for the content manager of a GIS which counts lookups."""
+
+    def __init__(self, items: dict[str, FakeItem]):
+        self.items = items
+        self.get_calls = 0
+
+    def get(self, item_id: str) -> FakeItem:
+        self.get_calls += 1
+        return self.items.get(item_id)
+
+
+class FakeGIS:
+    """An in-memory stand-in for an authenticated GIS."""
+
+    def __init__(self, items: dict[str, FakeItem] = None):
+        self.content = FakeContentManager(items or {})
+
+
+class FakeSearchCursor:
+    """An in-memory stand-in for arcpy.da.SearchCursor over point features which counts the rows read."""
+
+    def __init__(self, features_df: pd.DataFrame, filepath: str, field_names: list[str], **kwargs):
+        self.fields = list(field_names)
+        self.rows_read = 0
+        self._features_df = features_df
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __iter__(self):
+        for position, row in enumerate(self._features_df.itertuples(index=False)):
+            values = row._asdict()
+            special_values = {"OID@": position + 1, "SHAPE@JSON": json.dumps({"x": values.get("longitude", 0.0), "y": values.get("latitude", 0.0)})}
+            self.rows_read += 1
+            yield tuple(special_values[field] if field in special_values else values[field] for field in self.fields)
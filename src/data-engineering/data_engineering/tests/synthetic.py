@@ -0,0 +1,138 @@
+from contextlib import closing
+from sqlite3 import connect
+import json
+import numpy as np
+import pandas as pd
+
+
+FRANKFURT_EXTENT = (8.55, 50.05, 8.75, 50.20)
+VEHICLE_TYPES = ["car", "Car", "bike", "bus", None]
+
+
+def create_agent_positions(row_count: int, seed: int = 42) -> pd.DataFrame:
+    """Creates deterministic agent positions spread over Frankfurt am Main on a single day."""
+    generator = np.random.default_rng(seed)
+    xmin, ymin, xmax, ymax = FRANKFURT_EXTENT
+    seconds = np.sort(generator.integers(0, 24 * 3600, row_count))
+    trip_times = pd.Timestamp("2024-05-01") + pd.to_timedelta(seconds, unit="s")
+    return pd.DataFrame({
+        "trip": generator.integers(1, max(2, row_count // 50), row_count),
+        "person": generator.integers(1, max(2, row_count // 100), row_count),
+        "vehicle_type": generator.choice(np.array(VEHICLE_TYPES, dtype=object), row_count),
+        "trip_time": trip_times.strftime("%Y-%m-%dT%H:%M:%S"),
+        "longitude": generator.uniform(xmin, xmax, row_count),
+        "latitude": generator.uniform(ymin, ymax, row_count),
+    })
+
+def create_agent_pos_database(filepath: str, row_count: int, seed: int = 42, chunk_size: int = 1_000_000) -> pd.DataFrame:
+    """Writes deterministic agent positions into the agent_pos table of a SQLite database.
+
+    Large databases are written in chunks using consecutive seeds, only the last chunk is returned.
+    """
+    with closing(connect(filepath)) as connection:
+        for chunk_index, start in enumerate(range(0, max(row_count, 1), chunk_size)):
+            agent_positions = create_agent_positions(min(chunk_size, row_count - start), seed + chunk_index)
+            agent_positions.to_sql("agent_pos", connection, index=False, if_exists="append")
+        connection.commit()
+    return agent_positions
+
+def create_trips(trip_count: int, points_per_trip: int, seed: int = 42) -> pd.DataFrame:
+    """Creates deterministic agent positions of trips driving along a few straight legs, in shuffled order."""
+    generator = np.random.default_rng(seed)
+    xmin, ymin, xmax, ymax = FRANKFURT_EXTENT
+    frames = []
+    for trip in range(1, trip_count + 1):
+        corners = np.cumsum(np.vstack([
+            [generator.uniform(xmin, xmax), generator.uniform(ymin, ymax)],
+            generator.normal(0.0, 0.01, (4, 2)),
+        ]), axis=0)
+        steps = np.linspace(0.0, len(corners) - 1, points_per_trip)
+        legs = np.minimum(steps.astype(np.int64), len(corners) - 2)
+        fractions = (steps - legs)[:, None]
+        positions = corners[legs] * (1.0 - fractions) + corners[legs + 1] * fractions
+        # Less than a meter of GPS noise
+        positions += generator.normal(0.0, 0.000002, positions.shape)
+        trip_times = pd.Timestamp("2024-05-01 07:00") + pd.to_timedelta(trip * 60 + np.arange(points_per_trip), unit="s")
+        frames.append(pd.DataFrame({
+            "trip": trip,
+            "person": trip % 7 + 1,
+            "vehicle_type": generator.choice(np.array(["car", "bike", "bus"], dtype=object)),
+            "trip_time": trip_times.strftime("%Y-%m-%dT%H:%M:%S"),
+            "longitude": positions[:, 0],
+            "latitude": positions[:, 1],
+        }))
+    trips = pd.concat(frames, ignore_index=True)
+    return trips.iloc[generator.permutation(len(trips))].reset_index(drop=True)
+
+def create_bike_trail(vertex_count: int, feature_count: int = 10, seed: int = 42) -> dict:
+    """Creates a deterministic GeoJSON feature collection of bike trail lines near Frankfurt am Main."""
+    generator = np.random.default_rng(seed)
+    xmin, ymin, xmax, ymax = FRANKFURT_EXTENT
+    features = []
+    for feature_index, vertices in enumerate(np.array_split(np.arange(vertex_count), feature_count)):
+        steps = generator.normal(0.0, 0.0002, (len(vertices), 2)).cumsum(axis=0)
+        start = [generator.uniform(xmin, xmax), generator.uniform(ymin, ymax)]
+        features.append({
+            "type": "Feature",
+            "properties": {"name": f"trail {feature_index}", "segment": feature_index},
+            "geometry": {"type": "LineString", "coordinates": (steps + start).round(7).tolist()},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+def create_bike_trail_file(filepath: str, vertex_count: int, feature_count: int = 10, seed: int = 42) -> dict:
+    """Writes a deterministic bike trail GeoJSON file."""
+    bike_trail = create_bike_trail(vertex_count, feature_count, seed)
+    with open(filepath, "w", encoding="utf-8") as file_out:
+        json.dump(bike_trail, file_out)
+    return bike_trail
+
+def create_hotcold_features(cell_size: float = 0.01, seed: int = 42, wkid: int = 4326) -> pd.DataFrame:
+    """Creates deterministic square hot and cold spot polygons covering Frankfurt am Main, optionally in Web Mercator."""
+    from arcgis.features import Feature, FeatureSet
+    from urban_traffic.geodesy import wgs84_to_web_mercator
+
+    generator = np.random.default_rng(seed)
+    xmin, ymin, xmax, ymax = FRANKFURT_EXTENT
+    features = []
+    for row, y in enumerate(np.arange(ymin, ymax, cell_size)):
+        for column, x in enumerate(np.arange(xmin, xmax, cell_size)):
+            ring = np.array([[x, y], [x, y + cell_size], [x + cell_size, y + cell_size], [x + cell_size, y], [x, y]], dtype=np.float64)
+            if 4326 != wkid:
+                ring = np.column_stack(wgs84_to_web_mercator(ring[:, 0], ring[:, 1]))
+            features.append(Feature(
+                geometry={"rings": [ring.tolist()], "spatialReference": {"wkid": wkid}},
+                attributes={"OBJECTID": len(features) + 1, "Gi_Bin": int(generator.integers(-3, 4))}
+            ))
+    return FeatureSet(features, geometry_type="esriGeometryPolygon", spatial_reference={"wkid": wkid}).sdf
+
+def create_traffic_accidents(row_count: int, seed: int = 42) -> pd.DataFrame:
+    """Creates deterministic traffic accidents whose grouped accident type depends on the light condition and hour."""
+    generator = np.random.default_rng(seed)
+    light_conditions = generator.integers(0, 3, row_count)
+    hours = generator.integers(0, 24, row_count)
+    accident_types = np.array(["Längsverkehr", "Kreuzung/Abbiegen", "Sonstige"], dtype=object)
+    noise = generator.random(row_count) < 0.1
+    return pd.DataFrame({
+        "uwochentag": generator.integers(1, 8, row_count).astype(str),
+        "uart": generator.integers(0, 10, row_count).astype(str),
+        "ukategorie": generator.integers(1, 4, row_count).astype(str),
+        "ulichtverh": light_conditions.astype(str),
+        "ist_strasse": generator.integers(0, 2, row_count).astype(str),
+        "ustunde": hours,
+        "utyp1_grouped": accident_types[np.where(noise, generator.integers(0, 3, row_count), (light_conditions + (hours > 12)) % 3)],
+    })
+
+def create_charging_stations(row_count: int, seed: int = 42) -> pd.DataFrame:
+    """Creates deterministic charging station points spread over Frankfurt am Main."""
+    from arcgis.features import GeoAccessor
+
+    generator = np.random.default_rng(seed)
+    xmin, ymin, xmax, ymax = FRANKFURT_EXTENT
+    charging_stations = pd.DataFrame({
+        "OBJECTID": np.arange(1, row_count + 1),
+        "operator": generator.choice(np.array(["Mainova", "EnBW", "Tesla", "Ionity"], dtype=object), row_count),
+        "power_kw": generator.choice(np.array([11.0, 22.0, 50.0, 150.0]), row_count),
+        "x": generator.uniform(xmin, xmax, row_count),
+        "y": generator.uniform(ymin, ymax, row_count),
+    })
+    return GeoAccessor.from_xy(charging_stations, x_column="x", y_column="y", sr=4326)
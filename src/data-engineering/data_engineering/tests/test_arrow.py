@@ -0,0 +1,83 @@
+from contextlib import closing
+from sqlite3 import connect
+from synthetic import FRANKFURT_EXTENT, create_agent_pos_database
+from urban_traffic.arrow import iter_traffic_batches, read_traffic_compact, read_traffic_table, spatially_enable
+from urban_traffic.utils import prepare_traffic, read_traffic_sql
+import numpy as np
+import os
+import pandas as pd
+import pyarrow as pa
+import tempfile
+import unittest
+
+
+class TestArrow(unittest.TestCase):
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._database = os.path.join(self._temp_dir.name, "traffic.db")
+        create_agent_pos_database(self._database, 20_000)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_compact_schema(self):
+        batches = list(iter_traffic_batches(self._database, chunk_size=6_000))
+        self.assertListEqual([batch.num_rows for batch in batches], [6_000, 6_000, 6_000, 2_000])
+        schema = batches[0].schema
+        self.assertEqual(schema.field("trip_time").type, pa.timestamp("s"))
+        self.assertTrue(pa.types.is_dictionary(schema.field("vehicle_type").type))
+        self.assertEqual(schema.field("longitude").type, pa.float32())
+        self.assertEqual(schema.field("trip").type, pa.int32())
+
+    def test_matches_read_traffic_sql(self):
+        expected = read_traffic_sql(self._database, 0)
+        compact = read_traffic_compact(self._database, chunk_size=7_000)
+        self.assertListEqual(list(compact.columns), list(expected.columns))
+        np.testing.assert_array_equal(compact["trip"], expected["trip"])
+        np.testing.assert_array_equal(compact["trip_time"], pd.to_datetime(expected["trip_time"]))
+        np.testing.assert_allclose(compact["longitude"], expected["longitude"], atol=1e-5)
+        self.assertTrue(compact["vehicle_type"].astype(object).equals(expected["vehicle_type"]))
+        self.assertLess(3 * compact.memory_usage(deep=True).sum(), expected.memory_usage(deep=True).sum())
+
+        # Preparing the compact frame yields the same indicator columns
+        prepared = prepare_traffic(compact)
+        pd.testing.assert_frame_equal(
+            prepared.drop(columns=["longitude", "latitude"]),
+            prepare_traffic(expected).drop(columns=["longitude", "latitude"]),
+            check_dtype=False
+        )
+
+    def test_filters_and_float64(self):
+        xmin, ymin, xmax, ymax = FRANKFURT_EXTENT
+        bbox = (xmin, ymin, (xmin + xmax) / 2, (ymin + ymax) / 2)
+        table = read_traffic_table(self._database, coordinate_type="float64", bbox=bbox, columns=["trip", "longitude", "latitude"])
+        self.assertListEqual(table.column_names, ["trip", "longitude", "latitude"])
+        self.assertEqual(table.schema.field("longitude").type, pa.float64())
+        self.assertTrue(pa.compute.all(pa.compute.less_equal(table["longitude"], bbox[2])).as_py())
+
+        empty = read_traffic_compact(self._database, bbox=(0.0, 0.0, 1.0, 1.0))
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty["trip_time"].dtype, np.dtype("datetime64[s]"))
+        self.assertEqual(len(read_traffic_compact(self._database, limit=10)), 10)
+
+        with self.assertRaises(ValueError):
+            read_traffic_table(self._database, coordinate_type="float16")
+
+    def test_checked_id_cast(self):
+        with closing(connect(self._database)) as connection:
+            connection.execute("UPDATE agent_pos SET person = ? WHERE rowid = 1;", [2**40])
+            connection.commit()
+        with self.assertRaises(ValueError):
+            read_traffic_compact(self._database)
+
+    def test_geometry_on_demand(self):
+        compact = read_traffic_sql(self._database, 5, compact=True)
+        self.assertNotIn("SHAPE", compact.columns)
+        traffic_sdf = spatially_enable(compact)
+        self.assertEqual(traffic_sdf.spatial.geometry_type, ["point"])
+        self.assertEqual(len(traffic_sdf), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+from benchmark import BENCHMARKS, compare_results, main, parse_scale
+import json
+import os
+import tempfile
+import unittest
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_parse_scale(self):
+        self.assertListEqual([parse_scale(scale) for scale in ["10k", "1M", "2.5k", "500", "10_000"]], [10_000, 1_000_000, 2_500, 500, 10_000])
+
+    def test_all_benchmarks_run_offline(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = os.path.join(temp_dir, "benchmark.json")
+            main(["--scales", "2k", "--repeat", "1", "--output", output, "--directory", temp_dir])
+            with open(output, "r", encoding="utf-8") as file_in:
+                results = json.load(file_in)
+
+        self.assertListEqual([result["benchmark"] for result in results["results"]], [benchmark.name for benchmark in BENCHMARKS])
+        for result in results["results"]:
+            self.assertEqual(result["rows"], 2000)
+            self.assertGreater(result["seconds"], 0.0)
+            self.assertGreater(result["peak_memory_bytes"], 0)
+
+        comparison = compare_results(results, results)
+        self.assertEqual(len(comparison), len(BENCHMARKS))
+        self.assertTrue(all(1.0 == entry["time_ratio"] for entry in comparison))
+
+if __name__ == '__main__':
+    unittest.main()
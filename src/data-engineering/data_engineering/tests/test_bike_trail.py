@@ -0,0 +1,96 @@
+from arcgis.features import FeatureSet
+from synthetic import create_bike_trail_file
+from urban_traffic.bike_trail import explode_bike_trail_arrays
+from urban_traffic.utils import explode_bike_trail
+import json
+import os
+import tempfile
+import unittest
+
+
+def explode_bike_trail_baseline(filepath: str):
+    """The object based explode of the bike trail features, one vertex after another."""
+    with open(filepath, 'r', encoding='utf-8') as file_in:
+        feature_set = FeatureSet.from_geojson(json.load(file_in))
+    for feature in feature_set.features:
+        for path in feature.geometry["paths"]:
+            for x, y in path:
+                yield {**feature.attributes, "x": x, "y": y}
+
+
+class TestBikeTrail(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _write(self, geojson: dict) -> str:
+        filepath = os.path.join(self._directory.name, "trail.geojson")
+        with open(filepath, "w", encoding="utf-8") as file_out:
+            json.dump(geojson, file_out)
+        return filepath
+
+    def test_explode_line_strings(self):
+        filepath = os.path.join(self._directory.name, "trail.geojson")
+        create_bike_trail_file(filepath, vertex_count=1000, feature_count=4)
+        vertices = explode_bike_trail_arrays(filepath)
+
+        self.assertEqual(len(vertices), 1000)
+        self.assertEqual(len(vertices.attributes), 4)
+        self.assertListEqual(sorted(set(vertices.feature_index.tolist())), [0, 1, 2, 3])
+
+        # Same vertices and attributes as the object based explode
+        exploded = list(explode_bike_trail(filepath))
+        self.assertEqual(len(exploded), len(vertices))
+        self.assertAlmostEqual(exploded[300]["geometry"]["x"], vertices.x[300])
+        self.assertEqual(exploded[300]["name"], vertices.attributes["name"].iloc[vertices.feature_index[300]])
+
+    def test_explode_matches_baseline(self):
+        filepath = self._write({"type": "FeatureCollection", "features": [
+            {"type": "Feature", "properties": {"name": "main", "lanes": 2}, "geometry": {"type": "LineString", "coordinates": [
+                [8.6, 50.1], [8.61, 50.11], [8.62, 50.12],
+            ]}},
+            {"type": "Feature", "properties": {"name": "side"}, "geometry": {"type": "LineString", "coordinates": [
+                [8.7, 50.2], [8.71, 50.21],
+            ]}},
+        ]})
+        vertices = explode_bike_trail_arrays(filepath)
+        self.assertListEqual(vertices.attributes["OBJECTID"].tolist(), [1, 2])
+
+        exploded = [
+            {**{key: value for key, value in vertex.items() if "geometry" != key}, "x": vertex["geometry"]["x"], "y": vertex["geometry"]["y"]}
+            for vertex in explode_bike_trail(filepath)
+        ]
+        baseline = list(explode_bike_trail_baseline(filepath))
+        self.assertListEqual(exploded, baseline)
+        self.assertIs(type(exploded[0]["lanes"]), int)
+        self.assertNotIn("lanes", exploded[-1])
+
+    def test_explode_multi_parts_and_rings(self):
+        filepath = self._write({"type": "FeatureCollection", "features": [
+            {"type": "Feature", "properties": {"name": "multi"}, "geometry": {"type": "MultiLineString", "coordinates": [
+                [[8.6, 50.1, 100.0], [8.61, 50.11, 101.0]],
+                [[8.62, 50.12], [8.63, 50.13], [8.64, 50.14]],
+            ]}},
+            {"type": "Feature", "properties": {"name": "park"}, "geometry": {"type": "Polygon", "coordinates": [
+                [[8.0, 50.0], [8.1, 50.0], [8.1, 50.1], [8.0, 50.0]],
+                [[8.02, 50.02], [8.03, 50.02], [8.03, 50.03], [8.02, 50.02]],
+            ]}},
+            {"type": "Feature", "properties": {"name": "empty"}, "geometry": None},
+        ]})
+        vertices = explode_bike_trail_arrays(filepath)
+
+        self.assertEqual(len(vertices), 13)
+        self.assertListEqual(vertices.feature_index.tolist(), [0] * 5 + [1] * 8)
+        self.assertListEqual(vertices.part_index.tolist(), [0, 0, 1, 1, 1] + [0] * 4 + [1] * 4)
+        self.assertListEqual(vertices.attributes["name"].tolist(), ["multi", "park", "empty"])
+
+        vertices_sdf = vertices.to_sdf()
+        self.assertEqual(len(vertices_sdf), 13)
+        self.assertEqual(vertices_sdf["name"].iloc[5], "park")
+        self.assertIsNotNone(vertices_sdf.spatial, "DataFrame is not spatially enabled!")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+from data_engineering import cli
+from fakes import FakeFeatureLayer, FakeGIS, FakeItem
+from synthetic import create_agent_pos_database, create_charging_stations, create_traffic_accidents
+from unittest import mock
+from urban_traffic.model import load_model
+import contextlib
+import io
+import json
+import os
+import pandas as pd
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+CHARGING_STATIONS_ITEM_ID = "bc3c97f73d6b4be4921be8560fbc325a"
+HEAVY_MODULES = ["arcgis", "arcgis.map", "sklearn"]
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._database = os.path.join(self._temp_dir.name, "traffic.db")
+        create_agent_pos_database(self._database, 2000)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _run(self, *arguments) -> str:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            cli.main(list(arguments))
+        return output.getvalue()
+
+    def test_traffic_read_does_not_import_heavy_modules(self):
+        script = (
+            "import json, sys\n"
+            "import data_engineering.cli, urban_traffic.utils\n"
+            f"data_engineering.cli.main(['traffic', '--filepath', {self._database!r}, '--limit', '5'])\n"
+            f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]), file=sys.stderr)\n"
+        )
+        completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, env={
+            key: value for key, value in os.environ.items() if key != "ARCGIS_API_KEY"
+        })
+        self.assertEqual(len(json.loads(completed.stdout)), 5)
+        self.assertListEqual(json.loads(completed.stderr.strip().splitlines()[-1]), [])
+
+    def test_prepare_commute_cars(self):
+        output = os.path.join(self._temp_dir.name, "commute.parquet")
+        self._run("prepare", "--filepath", self._database, "--commute", "--output", output)
+        commute_cars = pd.read_parquet(output)
+        self.assertGreater(len(commute_cars), 0)
+        self.assertTrue((commute_cars["car"] == 1).all())
+        self.assertTrue(commute_cars["hour"].between(8, 9).all())
+
+        compact_output = os.path.join(self._temp_dir.name, "commute_compact.parquet")
+        self._run("prepare", "--filepath", self._database, "--commute", "--compact", "--output", compact_output)
+        compact_commute_cars = pd.read_parquet(compact_output)
+        self.assertEqual(compact_commute_cars["latitude"].dtype, "float32")
+        self.assertListEqual(compact_commute_cars["trip"].tolist(), commute_cars["trip"].tolist())
+
+        partitioned_output = os.path.join(self._temp_dir.name, "commute_partitioned.parquet")
+        self._run("prepare", "--filepath", self._database, "--commute", "--workers", "2", "--output", partitioned_output)
+        pd.testing.assert_frame_equal(pd.read_parquet(partitioned_output), commute_cars.reset_index(drop=True))
+
+    def test_train_saves_model(self):
+        accidents = os.path.join(self._temp_dir.name, "accidents.csv")
+        model_path = os.path.join(self._temp_dir.name, "model.joblib")
+        create_traffic_accidents(600).to_csv(accidents, index=False)
+        output = self._run("train", "--input", accidents, "--model", model_path, "--cv", "2", "--n-jobs", "1")
+        self.assertIn("Cross-validated accuracy", output)
+        self.assertEqual(len(load_model(model_path).predict(create_traffic_accidents(10, seed=3))), 10)
+
+    def test_fetch_logs_in_when_needed(self):
+        with mock.patch.dict(os.environ, {}, clear=True), self.assertRaisesRegex(ValueError, "ARCGIS_API_KEY"):
+            cli.get_gis.cache_clear()
+            cli.get_gis()
+
+        gis = FakeGIS({CHARGING_STATIONS_ITEM_ID: FakeItem(CHARGING_STATIONS_ITEM_ID, [FakeFeatureLayer(create_charging_stations(30))])})
+        with mock.patch.object(cli, "get_gis", return_value=gis):
+            output = self._run("fetch", "charging-stations", "--max-record-count", "20")
+        self.assertEqual(len(json.loads(output)), 20)
+
+if __name__ == '__main__':
+    unittest.main()
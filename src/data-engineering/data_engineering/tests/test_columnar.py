@@ -0,0 +1,48 @@
+from urban_traffic.columnar import ColumnBuffer, accumulate_rows
+import numpy as np
+import unittest
+
+
+def create_rows(row_count: int) -> list[tuple]:
+    return [
+        (object_id, f'{{"x": {object_id}, "y": 50.1}}', object_id // 10, "car" if object_id % 2 else None)
+        for object_id in range(1, row_count + 1)
+    ]
+
+
+class TestColumnar(unittest.TestCase):
+
+    def test_column_buffer_grows(self):
+        buffer = ColumnBuffer(np.int64, capacity=2)
+        for value in range(100):
+            buffer.append(value)
+        self.assertEqual(len(buffer), 100)
+        self.assertEqual(buffer.to_numpy().tolist(), list(range(100)))
+
+        buffer.clear()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.to_numpy().tolist(), [])
+
+    def test_accumulate_rows(self):
+        fields = ["OID@", "SHAPE@JSON", "trip", "vehicle_type"]
+        data_frames = list(accumulate_rows(iter(create_rows(2500)), fields, dtypes={"OID@": np.int64}))
+        self.assertEqual(len(data_frames), 1)
+        data_frame = data_frames[0]
+        self.assertEqual(list(data_frame.columns), fields)
+        self.assertEqual(len(data_frame), 2500)
+        self.assertEqual(data_frame["OID@"].dtype, np.int64)
+        self.assertEqual(data_frame["trip"].dtype, np.int64, "Object columns were not inferred!")
+        self.assertIsNone(data_frame["vehicle_type"].iloc[1])
+
+    def test_accumulate_rows_in_chunks(self):
+        fields = ["OID@", "SHAPE@JSON", "trip", "vehicle_type"]
+        data_frames = list(accumulate_rows(iter(create_rows(2500)), fields, chunk_size=1000))
+        self.assertEqual([len(data_frame) for data_frame in data_frames], [1000, 1000, 500])
+        self.assertEqual(data_frames[2]["OID@"].iloc[0], 2001)
+
+    def test_accumulate_no_rows(self):
+        self.assertEqual(len(next(accumulate_rows(iter([]), ["OID@"]))), 0)
+        self.assertEqual(list(accumulate_rows(iter([]), ["OID@"], chunk_size=10)), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+from synthetic import FRANKFURT_EXTENT, create_agent_pos_database, create_agent_positions
+from unittest import mock
+from urban_traffic import cube as cube_module
+from urban_traffic.cube import SpaceTimeCube, build_cube
+from urban_traffic.geodesy import radius_bbox
+from urban_traffic.reader import iter_traffic_sql
+from urban_traffic.utils import filter_commute_cars, prepare_traffic
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import unittest
+
+
+CELL_SIZE = 0.01
+
+
+class TestSpaceTimeCube(unittest.TestCase):
+
+    def setUp(self):
+        self._traffic_df = create_agent_positions(20000)
+
+    def _expected(self, traffic_df: pd.DataFrame) -> pd.DataFrame:
+        prepared = prepare_traffic(traffic_df)
+        return pd.DataFrame({
+            "vehicle_type": traffic_df["vehicle_type"].fillna("pedestrian").str.lower(),
+            "slice": prepared["hour"].astype(int),
+            "row": np.floor((traffic_df["latitude"] - FRANKFURT_EXTENT[1]) / CELL_SIZE).astype(int),
+            "column": np.floor((traffic_df["longitude"] - FRANKFURT_EXTENT[0]) / CELL_SIZE).astype(int),
+            "trip": traffic_df["trip"],
+            "person": traffic_df["person"],
+        })
+
+    def test_counts_and_distinct_match_group_by(self):
+        cube = build_cube(self._traffic_df, FRANKFURT_EXTENT, CELL_SIZE)
+        expected = self._expected(self._traffic_df).groupby(["vehicle_type", "slice", "row", "column"]).agg(
+            count=("trip", "size"), trips=("trip", "nunique"), persons=("person", "nunique"))
+
+        cube_df = cube.to_dataframe()
+        cube_df["slice"] = (cube_df["slice_start"].dt.total_seconds() // 3600).astype(int)
+        cube_df = cube_df.set_index(["vehicle_type", "slice", "row", "column"])[["count", "trips", "persons"]]
+        cube_df.index = cube_df.index.set_levels(cube_df.index.levels[0].astype(object), level=0)
+        pd.testing.assert_frame_equal(cube_df.sort_index().astype(np.int64), expected.sort_index().astype(np.int64))
+        self.assertEqual(cube.dropped, 0)
+
+    def test_chunks_and_merge_equal_single_pass(self):
+        single = build_cube(self._traffic_df, FRANKFURT_EXTENT, CELL_SIZE)
+        chunks = [self._traffic_df.iloc[start:start + 3000] for start in range(0, len(self._traffic_df), 3000)]
+        incremental = build_cube(chunks, FRANKFURT_EXTENT, CELL_SIZE)
+        merged = build_cube(chunks[:3], FRANKFURT_EXTENT, CELL_SIZE).merge(build_cube(chunks[3:], FRANKFURT_EXTENT, CELL_SIZE, vehicle_types=["bus"]))
+
+        for cube in (incremental, merged):
+            order = [cube.vehicle_types.index(vehicle_type) for vehicle_type in single.vehicle_types]
+            np.testing.assert_array_equal(cube.counts[order], single.counts)
+            np.testing.assert_array_equal(cube.distinct("trip")[order], single.distinct("trip"))
+            self.assertDictEqual(cube.query(hours=(8, 10), vehicle_types=["car"]), single.query(hours=(8, 10), vehicle_types=["car"]))
+
+    def test_pending_pairs_are_merged_past_the_threshold(self):
+        single = build_cube(self._traffic_df, FRANKFURT_EXTENT, CELL_SIZE)
+        chunks = [self._traffic_df.iloc[start:start + 1000] for start in range(0, len(self._traffic_df), 1000)]
+        with mock.patch.object(cube_module, "PAIR_MERGE_THRESHOLD", 2500):
+            cube = SpaceTimeCube(FRANKFURT_EXTENT, CELL_SIZE)
+            for chunk in chunks:
+                cube.add(chunk)
+                self.assertLessEqual(sum(len(keys) for keys in cube._pairs["trip"][1:]), 2500)
+        np.testing.assert_array_equal(cube.distinct_pairs("trip"), single.distinct_pairs("trip"))
+        np.testing.assert_array_equal(cube.distinct_pairs("person"), single.distinct_pairs("person"))
+
+        with self.assertRaises(ValueError):
+            cube_module._pair_keys(np.array([2**31], dtype=np.int64), np.array([1]), "trip")
+
+    def test_commute_cars_near_location(self):
+        cube = build_cube(self._traffic_df, FRANKFURT_EXTENT, CELL_SIZE)
+        bbox = radius_bbox(8.65, 50.11, 1500)
+        result = cube.query(bbox=bbox, hours=(8, 10), vehicle_types=["car"])
+
+        # The query selects all cells overlapping the bounding box
+        xmin, ymin, xmax, ymax = bbox
+        cell_xmin = FRANKFURT_EXTENT[0] + np.floor((xmin - FRANKFURT_EXTENT[0]) / CELL_SIZE) * CELL_SIZE
+        cell_ymin = FRANKFURT_EXTENT[1] + np.floor((ymin - FRANKFURT_EXTENT[1]) / CELL_SIZE) * CELL_SIZE
+        cell_xmax = FRANKFURT_EXTENT[0] + (np.floor((xmax - FRANKFURT_EXTENT[0]) / CELL_SIZE) + 1) * CELL_SIZE
+        cell_ymax = FRANKFURT_EXTENT[1] + (np.floor((ymax - FRANKFURT_EXTENT[1]) / CELL_SIZE) + 1) * CELL_SIZE
+        commute_cars = filter_commute_cars(prepare_traffic(self._traffic_df))
+        commute_cars = commute_cars[
+            commute_cars["longitude"].between(cell_xmin, cell_xmax, inclusive="left")
+            & commute_cars["latitude"].between(cell_ymin, cell_ymax, inclusive="left")
+        ]
+        self.assertGreater(result["count"], 0)
+        self.assertDictEqual(result, {"count": len(commute_cars), "trips": commute_cars["trip"].nunique(), "persons": commute_cars["person"].nunique()})
+
+    def test_prepared_frames_and_sql_chunks(self):
+        vehicle_types = ["car", "bike", "bus", "pedestrian"]
+        prepared = build_cube(prepare_traffic(self._traffic_df), FRANKFURT_EXTENT, CELL_SIZE, slice_minutes=30, vehicle_types=vehicle_types)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = os.path.join(temp_dir, "traffic.db")
+            create_agent_pos_database(filepath, 20000)
+            streamed = build_cube(iter_traffic_sql(filepath, chunk_size=4000), FRANKFURT_EXTENT, CELL_SIZE, slice_minutes=30, vehicle_types=vehicle_types)
+        np.testing.assert_array_equal(prepared.counts, streamed.counts)
+        self.assertEqual(prepared.counts.shape, (4, 48, 15, 20))
+        self.assertEqual(prepared.query()["count"], len(self._traffic_df))
+
+    def test_outside_positions_are_dropped(self):
+        traffic_df = self._traffic_df.iloc[:10].copy()
+        traffic_df.loc[traffic_df.index[:3], "longitude"] = 9.5
+        cube = SpaceTimeCube(FRANKFURT_EXTENT, CELL_SIZE).add(traffic_df)
+        self.assertEqual(cube.dropped, 3)
+        self.assertEqual(cube.query()["count"], 7)
+        with self.assertRaises(ValueError):
+            SpaceTimeCube(FRANKFURT_EXTENT, CELL_SIZE, slice_minutes=7)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+from data_engineering import instrumentation
+from data_engineering.instrumentation import PROFILE_ENV, active_run, instrumented, profile_run, record_bytes
+from data_engineering.orchestration import gather_sources_blocking
+from data_engineering.utils import convert_internal_dict, deep_compare, dict_compare, fetch_charging_stations
+from fakes import FakeContentManager, FakeFeatureLayer, FakeGIS, FakeItem
+from functools import partial
+from synthetic import create_agent_pos_database, create_bike_trail_file, create_charging_stations
+from unittest import mock
+from urban_traffic.utils import explode_bike_trail, prepare_traffic, read_traffic_sql
+import json
+import pandas as pd
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+
+CHARGING_STATIONS_ITEM_ID = "bc3c97f73d6b4be4921be8560fbc325a"
+FAKE_PORTAL_CALLS = [("fakes", "FakeContentManager.get"), ("fakes", "FakeFeatureLayer.query")]
+
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+def slow_chunks(chunk_count: int, delay: float):
+    for _ in range(chunk_count):
+        time.sleep(delay)
+        instrumented(add)(1, 2)
+        yield pd.DataFrame({"value": range(10)})
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_disabled_wrapper_calls_through(self):
+        instrumented_add = instrumented(add)
+        self.assertIsNone(active_run())
+        self.assertIs(instrumented_add.__wrapped__, add)
+        self.assertEqual(instrumented_add(1, 2), 3)
+
+        calls = 200_000
+        start = time.perf_counter()
+        for _ in range(calls):
+            instrumented_add(1, 2)
+        overhead = (time.perf_counter() - start) / calls
+        self.assertLess(overhead, 20e-6)
+
+    def test_records_portal_calls_and_rows(self):
+        gis = FakeGIS({CHARGING_STATIONS_ITEM_ID: FakeItem(CHARGING_STATIONS_ITEM_ID, [FakeFeatureLayer(create_charging_stations(50))])})
+        original_get = FakeContentManager.get
+        original_query = FakeFeatureLayer.query
+        with tempfile.TemporaryDirectory() as temp_dir, mock.patch.object(instrumentation, "PORTAL_CALLS", FAKE_PORTAL_CALLS):
+            filepath = os.path.join(temp_dir, "traffic.db")
+            create_agent_pos_database(filepath, 1000)
+            with profile_run(os.path.join(temp_dir, "run")) as run:
+                self.assertIs(active_run(), run)
+                fetch_charging_stations(gis)
+                prepare_traffic(read_traffic_sql(filepath, 0))
+
+            self.assertIsNone(active_run())
+            self.assertIs(FakeFeatureLayer.query, original_query)
+            self.assertIs(FakeContentManager.get, original_get)
+            with open(os.path.join(temp_dir, "run.json"), "r", encoding="utf-8") as file_in:
+                summary = json.load(file_in)
+            with open(os.path.join(temp_dir, "run.trace.json"), "r", encoding="utf-8") as file_in:
+                trace = json.load(file_in)
+
+        functions = summary["functions"]
+        self.assertEqual(summary["portal_calls"], 2)
+        fetch_entry = functions["data_engineering.utils.fetch_charging_stations"]
+        self.assertEqual(fetch_entry["rows"], 50)
+        self.assertEqual(fetch_entry["portal_calls"], 2)
+        self.assertEqual(functions["data_engineering.utils.get_charging_stations_layer"]["portal_calls"], 1)
+        self.assertEqual(functions["urban_traffic.utils.read_traffic_sql"]["rows"], 1000)
+        self.assertEqual(functions["urban_traffic.utils.prepare_traffic"]["rows"], 1000)
+        # Every row contains at least the 19 characters of its trip time
+        self.assertGreater(functions["urban_traffic.utils.read_traffic_sql"]["bytes_read"], 19 * 1000)
+        self.assertEqual(summary["bytes_read"], functions["urban_traffic.utils.read_traffic_sql"]["bytes_read"])
+        self.assertEqual(functions["urban_traffic.utils.prepare_traffic"]["bytes_read"], 0)
+
+        self.assertEqual(len(trace["traceEvents"]), sum(entry["calls"] for entry in functions.values()))
+        self.assertTrue(all("X" == event["ph"] and 0 <= event["dur"] for event in trace["traceEvents"]))
+        read_events = [event for event in trace["traceEvents"] if event["name"].endswith(".read_traffic_sql")]
+        self.assertEqual(read_events[0]["args"]["bytes_read"], summary["bytes_read"])
+
+    def test_worker_threads_count_for_the_calling_span(self):
+        feature_layer = FakeFeatureLayer(create_charging_stations(50), max_record_count=10)
+        gis = FakeGIS({CHARGING_STATIONS_ITEM_ID: FakeItem(CHARGING_STATIONS_ITEM_ID, [feature_layer])})
+
+        @instrumented
+        def fetch_sources():
+            return gather_sources_blocking({"first": partial(feature_layer.query, as_df=True), "second": partial(feature_layer.query, as_df=True)})
+
+        with mock.patch.object(instrumentation, "PORTAL_CALLS", FAKE_PORTAL_CALLS), profile_run() as run:
+            fetch_charging_stations(gis, return_all_records=True, max_workers=2)
+            fetch_sources()
+        functions = run.summary()["functions"]
+
+        # The object id query runs on the calling thread, the five page queries in the paging workers
+        queries = [span for span in run.spans if "portal" == span.category and span.parent == "data_engineering.utils.query_layer"]
+        self.assertEqual(len(queries), 6)
+        self.assertGreater(len({span.thread_id for span in queries}), 1)
+        self.assertEqual(functions["data_engineering.utils.query_layer"]["portal_calls"], 6)
+        self.assertEqual(functions["data_engineering.utils.fetch_charging_stations"]["portal_calls"], 7)
+        fetch_sources_entry = next(entry for name, entry in functions.items() if name.endswith(".fetch_sources"))
+        self.assertEqual(fetch_sources_entry["portal_calls"], 2)
+
+    def test_record_bytes(self):
+        record_bytes(10)
+        with profile_run() as run:
+            instrumented(record_bytes)(100)
+            with tempfile.TemporaryDirectory() as temp_dir:
+                filepath = os.path.join(temp_dir, "bike_trail.geojson")
+                create_bike_trail_file(filepath, 100)
+                file_size = os.path.getsize(filepath)
+                sum(1 for _ in explode_bike_trail(filepath))
+        functions = run.summary()["functions"]
+        self.assertEqual(functions["data_engineering.instrumentation.record_bytes"]["bytes_read"], 100)
+        self.assertEqual(functions["urban_traffic.utils.explode_bike_trail"]["bytes_read"], file_size)
+        self.assertEqual(run.summary()["bytes_read"], 100 + file_size)
+
+    def test_nested_runs_record_into_outer_run(self):
+        with profile_run() as outer_run:
+            with profile_run() as inner_run:
+                self.assertIs(inner_run, outer_run)
+            self.assertIs(active_run(), outer_run)
+            instrumented(add)(1, 2)
+        self.assertEqual(outer_run.summary()["functions"][f"{__name__}.add"]["calls"], 1)
+
+    def test_generators_record_their_iteration(self):
+        with profile_run() as run:
+            chunks = instrumented(slow_chunks)(5, 0.02)
+            self.assertEqual(run.summary()["functions"], {})
+            self.assertEqual(sum(len(chunk) for chunk in chunks), 50)
+
+            partial_chunks = instrumented(slow_chunks)(5, 0.0)
+            next(partial_chunks)
+            partial_chunks.close()
+
+        spans = [span for span in run.spans if span.name.endswith("slow_chunks")]
+        self.assertListEqual([span.rows for span in spans], [50, 10])
+        self.assertGreaterEqual(spans[0].seconds, 0.1)
+        functions = run.summary()["functions"]
+        self.assertEqual(functions[f"{__name__}.add"]["calls"], 6)
+        self.assertTrue(all(span.parent == spans[0].name for span in run.spans if span.name.endswith(".add")))
+
+    def test_explode_bike_trail_counts_vertices(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = os.path.join(temp_dir, "bike_trail.geojson")
+            create_bike_trail_file(filepath, 2_000)
+            with profile_run() as run:
+                vertex_count = sum(1 for _ in explode_bike_trail(filepath))
+        entry = run.summary()["functions"]["urban_traffic.utils.explode_bike_trail"]
+        self.assertEqual(vertex_count, 2_000)
+        self.assertEqual(entry["rows"], 2_000)
+        self.assertEqual(entry["calls"], 1)
+
+    def test_errors_are_recorded(self):
+        def fail():
+            raise ValueError("Failed!")
+        with profile_run() as run:
+            with self.assertRaises(ValueError):
+                instrumented(fail)()
+        self.assertEqual(list(run.summary()["functions"].values())[0]["errors"], 1)
+
+    def test_enabled_by_environment(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            prefix = os.path.join(temp_dir, "env_run")
+            script = (
+                "import pandas as pd\n"
+                "from urban_traffic.utils import prepare_traffic\n"
+                "prepare_traffic(pd.DataFrame({'trip_time': ['2024-05-01T07:00:00'], 'vehicle_type': ['car']}))\n"
+            )
+            subprocess.run([sys.executable, "-c", script], env={**os.environ, PROFILE_ENV: prefix}, check=True)
+            with open(f"{prefix}.json", "r", encoding="utf-8") as file_in:
+                summary = json.load(file_in)
+        self.assertEqual(summary["functions"]["urban_traffic.utils.prepare_traffic"]["calls"], 1)
+
+    def test_recursive_helpers_are_not_wrapped(self):
+        # A wrapper frame on every recursion level would halve the supported nesting depth
+        for func in (convert_internal_dict, deep_compare, dict_compare):
+            self.assertFalse(hasattr(func, "__wrapped__"))
+
+        nested_old, nested_new = 0, 1
+        for _ in range(300):
+            nested_old, nested_new = {"a": nested_old}, {"a": nested_new}
+        with profile_run():
+            self.assertIsNotNone(deep_compare(nested_old, nested_new))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+from synthetic import FRANKFURT_EXTENT, create_agent_positions, create_charging_stations
+from urban_traffic.geodesy import web_mercator_to_wgs84, wgs84_to_web_mercator
+from urban_traffic.lod import PointLevelOfDetail, zoom_resolution
+from urban_traffic.utils import generate_cluster_renderer
+import numpy as np
+import unittest
+
+
+class TestLevelOfDetail(unittest.TestCase):
+
+    def setUp(self):
+        self._car_positions = create_agent_positions(50_000)
+        self._lod = PointLevelOfDetail.from_frame(self._car_positions, cell_pixels=32)
+
+    def test_zoom_resolution(self):
+        self.assertAlmostEqual(zoom_resolution(0), 156543.03392804097)
+        self.assertAlmostEqual(zoom_resolution(12), 156543.03392804097 / 4096)
+        x, y = wgs84_to_web_mercator([8.68, -180.0], [50.11, 0.0])
+        np.testing.assert_allclose(web_mercator_to_wgs84(x, y), ([8.68, -180.0], [50.11, 0.0]), atol=1e-9)
+
+    def test_matches_brute_force_binning(self):
+        level = self._lod.level(13)
+        cell_size = 32 * zoom_resolution(13)
+        x, y = wgs84_to_web_mercator(self._car_positions["longitude"], self._car_positions["latitude"])
+        cells, counts = np.unique(np.column_stack([
+            np.floor((np.pi * 6_378_137.0 - y) / cell_size),
+            np.floor((x + np.pi * 6_378_137.0) / cell_size),
+        ]).astype(np.int64), axis=0, return_counts=True)
+        np.testing.assert_array_equal(level.rows, cells[:, 0])
+        np.testing.assert_array_equal(level.columns, cells[:, 1])
+        np.testing.assert_array_equal(level.counts, counts)
+        self.assertEqual(level.counts.sum(), len(self._car_positions))
+        self.assertIs(self._lod.level(13), level)
+
+    def test_decimate(self):
+        city = self._lod.decimate(11)
+        street = self._lod.decimate(16)
+        self.assertLess(len(city), len(self._car_positions) / 50)
+        self.assertLess(len(city), len(street))
+        self.assertTrue(np.all(np.diff(city) > 0))
+
+        # Every representative lies within its cell
+        level = self._lod.level(11)
+        representatives = self._car_positions.iloc[level.representatives]
+        x, y = wgs84_to_web_mercator(representatives["longitude"], representatives["latitude"])
+        np.testing.assert_array_equal(np.floor((x + np.pi * 6_378_137.0) / level.cell_size), level.columns)
+
+    def test_clusters_within_extent(self):
+        xmin, ymin, xmax, ymax = FRANKFURT_EXTENT
+        extent = (xmin, ymin, (xmin + xmax) / 2, (ymin + ymax) / 2)
+        clusters = self._lod.clusters(14, extent)
+        self.assertLess(len(clusters), len(self._lod.clusters(14)))
+        self.assertTrue(clusters["longitude"].between(extent[0] - 0.01, extent[2] + 0.01).all())
+
+        # Map extents in Web Mercator select the same cells
+        (mxmin, mxmax), (mymin, mymax) = wgs84_to_web_mercator([extent[0], extent[2]], [extent[1], extent[3]])
+        map_extent = {"xmin": mxmin, "ymin": mymin, "xmax": mxmax, "ymax": mymax, "spatialReference": {"wkid": 102100, "latestWkid": 3857}}
+        self.assertEqual(len(self._lod.clusters(14, map_extent)), len(clusters))
+        with self.assertRaises(ValueError):
+            self._lod.clusters(14, {**map_extent, "spatialReference": {"wkid": 25832}})
+
+        inside = self._car_positions["longitude"].between(extent[0], extent[2]) & self._car_positions["latitude"].between(extent[1], extent[3])
+        self.assertGreaterEqual(clusters["point_count"].sum(), inside.sum())
+
+    def test_cluster_sdf_and_renderer(self):
+        charging_stations = create_charging_stations(500)
+        lod = PointLevelOfDetail.from_frame(charging_stations)
+        clusters = lod.cluster_sdf(12)
+        self.assertEqual(clusters["point_count"].sum(), 500)
+        self.assertEqual(clusters.spatial.geometry_type, ["point"])
+
+        renderer = generate_cluster_renderer(clusters["point_count"].max()).dict()
+        self.assertEqual(renderer["visualVariables"][0]["field"], "point_count")
+        self.assertEqual(renderer["visualVariables"][0]["maxDataValue"], clusters["point_count"].max())
+
+        empty = PointLevelOfDetail(np.empty(0), np.empty(0))
+        self.assertEqual(len(empty.clusters(10)), 0)
+        with self.assertRaises(ValueError):
+            PointLevelOfDetail(np.empty(0), np.empty(0), cell_pixels=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+from arcgis.geometry import Envelope
+from fakes import FakeSearchCursor
+from synthetic import create_traffic_accidents
+from unittest import mock
+from urban_traffic.model import build_model_pipeline, load_model, predict_batches, save_model, train_model
+from urban_traffic.utils import read_traffic_accidents_features_by_extent
+import os
+import pandas as pd
+import scipy.sparse
+import tempfile
+import types
+import unittest
+
+
+CATEGORICAL_COLS = ["uwochentag", "uart", "ukategorie", "ulichtverh", "ist_strasse"]
+NUMERIC_COLS = ["ustunde"]
+TARGET_COL = "utyp1_grouped"
+
+
+class TestModel(unittest.TestCase):
+
+    def setUp(self):
+        self._traffic_accidents = create_traffic_accidents(2000)
+
+    def test_one_hot_output_is_sparse(self):
+        model = build_model_pipeline(CATEGORICAL_COLS, NUMERIC_COLS)
+        features = model.named_steps["preprocessor"].fit_transform(self._traffic_accidents[CATEGORICAL_COLS + NUMERIC_COLS])
+        self.assertTrue(scipy.sparse.issparse(features))
+        self.assertEqual(model.named_steps["classifier"].n_jobs, -1)
+
+    def test_train_save_and_score_in_batches(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            search = train_model(
+                self._traffic_accidents, CATEGORICAL_COLS, NUMERIC_COLS, TARGET_COL,
+                param_grid={"classifier__n_estimators": [10, 20]}, cv=3, n_jobs=2,
+                cache_dir=os.path.join(temp_dir, "cache"))
+            self.assertGreater(search.best_score_, 0.7)
+            self.assertIsNone(search.best_estimator_.memory)
+
+            filepath = save_model(search.best_estimator_, os.path.join(temp_dir, "model.joblib"))
+            model = load_model(filepath)
+
+        # Additional columns, e.g. the geometry, are ignored while scoring
+        new_accidents = create_traffic_accidents(1000, seed=7).drop(columns=TARGET_COL)
+        new_accidents["SHAPE"] = None
+        frames = [new_accidents.iloc[:600], new_accidents.iloc[600:]]
+        scores = list(predict_batches(model, frames, batch_size=250, probabilities=True))
+
+        self.assertListEqual([len(batch) for batch in scores], [250, 250, 100, 250, 150])
+        scores = pd.concat(scores)
+        self.assertTrue(scores.index.equals(new_accidents.index))
+        self.assertListEqual(scores["prediction"].tolist(), model.predict(new_accidents[CATEGORICAL_COLS + NUMERIC_COLS]).tolist())
+        probability_cols = [col for col in scores.columns if col.startswith("probability_")]
+        self.assertEqual(len(probability_cols), 3)
+        self.assertTrue(((scores[probability_cols].sum(axis=1) - 1.0).abs() < 1e-9).all())
+
+    def test_read_accidents_streams_from_search_cursor(self):
+        cursors = []
+        accident_features = self._traffic_accidents.rename(columns={TARGET_COL: "utyp1"})
+
+        def create_cursor(*args, **kwargs):
+            cursors.append(FakeSearchCursor(accident_features, *args, **kwargs))
+            return cursors[-1]
+
+        arcpy_da = types.SimpleNamespace(SearchCursor=create_cursor)
+        extent = Envelope({"xmin": 8.55, "ymin": 50.05, "xmax": 8.75, "ymax": 50.2, "spatialReference": {"wkid": 4326}})
+        with mock.patch.dict("sys.modules", {"arcpy": types.SimpleNamespace(da=arcpy_da), "arcpy.da": arcpy_da}):
+            frames = read_traffic_accidents_features_by_extent("accidents.gdb/accidents", extent, chunks=True, chunk_size=300)
+            first_frame = next(frames)
+            self.assertEqual(cursors[0].rows_read, 300)
+            frames = [first_frame, *frames]
+
+        self.assertListEqual([len(frame) for frame in frames], [300, 300, 300, 300, 300, 300, 200])
+        accidents = pd.concat(frames, ignore_index=True)
+        self.assertListEqual(accidents["OBJECTID"].tolist(), list(range(1, 2001)))
+        self.assertListEqual(accidents["ustunde"].tolist(), self._traffic_accidents["ustunde"].tolist())
+        self.assertEqual(first_frame.spatial.sr["wkid"], 4326)
+
+    def test_read_accidents_of_extent_without_spatial_reference(self):
+        accident_features = self._traffic_accidents.rename(columns={TARGET_COL: "utyp1"})
+        arcpy_da = types.SimpleNamespace(SearchCursor=lambda *args, **kwargs: FakeSearchCursor(accident_features, *args, **kwargs))
+        extent = Envelope({"xmin": 8.55, "ymin": 50.05, "xmax": 8.75, "ymax": 50.2})
+        with mock.patch.dict("sys.modules", {"arcpy": types.SimpleNamespace(da=arcpy_da), "arcpy.da": arcpy_da}):
+            frames = list(read_traffic_accidents_features_by_extent("accidents.gdb/accidents", extent, chunks=True))
+
+        self.assertEqual(sum(len(frame) for frame in frames), 2000)
+        self.assertEqual(frames[0].spatial.sr["wkid"], 4326)
+
+
+if __name__ == '__main__':
+    unittest.main()
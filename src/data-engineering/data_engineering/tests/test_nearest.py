@@ -0,0 +1,64 @@
+from arcgis.features import GeoAccessor
+from synthetic import create_agent_positions, create_charging_stations
+from urban_traffic.geodesy import haversine_meters, web_mercator_to_wgs84, wgs84_coordinates
+from urban_traffic.nearest import StationIndex, group_by_candidates, iter_routing_batches, nearest_charging_stations
+import numpy as np
+import pandas as pd
+import unittest
+
+
+class TestNearest(unittest.TestCase):
+
+    def setUp(self):
+        self._charging_stations = create_charging_stations(300)
+        self._car_positions = create_agent_positions(2000).iloc[::2]
+
+    def test_matches_brute_force(self):
+        station_lon, station_lat = wgs84_coordinates(self._charging_stations)
+        car_lon, car_lat = wgs84_coordinates(self._car_positions)
+        distances, indices = StationIndex(station_lon, station_lat).query(car_lon, car_lat, k=3, batch_size=256)
+
+        all_distances = haversine_meters(car_lon[:, None], car_lat[:, None], station_lon[None, :], station_lat[None, :])
+        expected = np.sort(all_distances, axis=1)[:, :3]
+        np.testing.assert_allclose(distances, expected, rtol=1e-9, atol=1e-6)
+        np.testing.assert_array_equal(indices[:, 0], all_distances.argmin(axis=1))
+
+    def test_web_mercator_stations(self):
+        lon, lat = wgs84_coordinates(self._charging_stations)
+        x = np.radians(lon) * 6_378_137.0
+        y = np.log(np.tan(np.pi / 4.0 + np.radians(lat) / 2.0)) * 6_378_137.0
+        mercator_stations = GeoAccessor.from_xy(pd.DataFrame({"x": x, "y": y}), x_column="x", y_column="y", sr=102100)
+
+        converted_lon, converted_lat = wgs84_coordinates(mercator_stations)
+        np.testing.assert_allclose(converted_lon, lon, atol=1e-9)
+        np.testing.assert_allclose(converted_lat, lat, atol=1e-9)
+        np.testing.assert_allclose(web_mercator_to_wgs84(0.0, 0.0), (0.0, 0.0))
+
+    def test_nearest_charging_stations(self):
+        nearest = nearest_charging_stations(self._charging_stations, self._car_positions, k=2)
+        self.assertEqual(len(nearest), 2 * len(self._car_positions))
+        self.assertTrue(nearest["car_index"].isin(self._car_positions.index).all())
+        self.assertTrue((nearest.groupby("car_index")["distance_meters"].diff().dropna() >= 0).all())
+        self.assertEqual(len(nearest_charging_stations(self._charging_stations.iloc[:1].copy(), self._car_positions, k=5)), len(self._car_positions))
+
+    def test_group_by_candidates(self):
+        indices = np.array([[1, 2], [2, 1], [3, 4], [1, 2]])
+        groups = group_by_candidates(indices)
+        self.assertListEqual([(stations.tolist(), cars.tolist()) for stations, cars in groups], [([1, 2], [0, 1, 3]), ([3, 4], [2])])
+
+    def test_routing_batches_cover_every_car(self):
+        _, indices = StationIndex.from_frame(self._charging_stations).query(*wgs84_coordinates(self._car_positions), k=3)
+        candidates = {car: set(self._charging_stations.index[row]) for car, row in zip(self._car_positions.index, indices)}
+
+        for max_facilities in (None, 12):
+            batches = list(iter_routing_batches(self._charging_stations, self._car_positions, k=3, max_facilities=max_facilities))
+            cars = pd.Index(np.concatenate([batch_cars.index.to_numpy() for _, batch_cars in batches]))
+            self.assertTrue(cars.sort_values().equals(self._car_positions.index.sort_values()))
+            for batch_stations, batch_cars in batches:
+                self.assertTrue(all(candidates[car] <= set(batch_stations.index) for car in batch_cars.index))
+                if max_facilities:
+                    self.assertLessEqual(len(batch_stations), max_facilities)
+        self.assertLess(len(batches), len(list(iter_routing_batches(self._charging_stations, self._car_positions, k=3))))
+
+if __name__ == '__main__':
+    unittest.main()
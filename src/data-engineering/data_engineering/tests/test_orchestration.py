@@ -0,0 +1,88 @@
+from data_engineering.orchestration import gather_sources, gather_sources_blocking
+from data_engineering.utils import fetch_charging_stations
+from fakes import FakeFeatureLayer, FakeGIS, FakeItem
+from functools import partial
+from synthetic import create_agent_pos_database, create_charging_stations
+from urban_traffic.utils import fetch_traffic_data
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+
+CHARGING_STATIONS_ITEM_ID = "bc3c97f73d6b4be4921be8560fbc325a"
+
+
+class DelayedFetcher:
+    """Simulates a blocking fetch and tracks the number of concurrent fetches."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, value):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            return value
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class TestOrchestration(unittest.TestCase):
+
+    def test_latency_is_max_instead_of_sum(self):
+        fetcher = DelayedFetcher(0.3)
+        start = time.perf_counter()
+        results = gather_sources_blocking({name: partial(fetcher.fetch, name) for name in ["a", "b", "c"]}, max_concurrency=3)
+        elapsed = time.perf_counter() - start
+
+        self.assertDictEqual(results, {"a": "a", "b": "b", "c": "c"})
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(fetcher.max_active, 3)
+
+    def test_bounded_concurrency(self):
+        fetcher = DelayedFetcher(0.05)
+        results = gather_sources_blocking({index: partial(fetcher.fetch, index) for index in range(8)}, max_concurrency=2)
+        self.assertListEqual(list(results.values()), list(range(8)))
+        self.assertEqual(fetcher.max_active, 2)
+
+    def test_timeout(self):
+        sources = {"slow": partial(DelayedFetcher(1.0).fetch, 1), "fast": partial(DelayedFetcher(0.0).fetch, 2)}
+        with self.assertRaisesRegex(TimeoutError, "slow"):
+            gather_sources_blocking(sources, timeout=0.1)
+
+        results = gather_sources_blocking(sources, timeout=0.1, return_exceptions=True)
+        self.assertIsInstance(results["slow"], TimeoutError)
+        self.assertEqual(results["fast"], 2)
+        with self.assertRaises(ValueError):
+            gather_sources_blocking(sources, max_concurrency=0)
+
+    def test_timeout_starts_when_the_source_runs(self):
+        # The timed out source keeps the only worker busy, the next source must not time out while waiting for it
+        sources = {"slow": partial(DelayedFetcher(0.5).fetch, 1), "fast": partial(DelayedFetcher(0.05).fetch, 2)}
+        results = gather_sources_blocking(sources, max_concurrency=1, timeout=0.2, return_exceptions=True)
+        self.assertIsInstance(results["slow"], TimeoutError)
+        self.assertEqual(results["fast"], 2)
+
+    def test_portal_and_database_sources(self):
+        gis = FakeGIS({CHARGING_STATIONS_ITEM_ID: FakeItem(CHARGING_STATIONS_ITEM_ID, [FakeFeatureLayer(create_charging_stations(20))])})
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = os.path.join(temp_dir, "traffic.db")
+            create_agent_pos_database(filepath, 100)
+            frames = asyncio.run(gather_sources({
+                "charging_stations": partial(fetch_charging_stations, gis, max_record_count=10),
+                "traffic_data": partial(fetch_traffic_data, filepath, max_record_count=10),
+            }))
+        self.assertEqual(len(frames["charging_stations"]), 10)
+        self.assertEqual(len(frames["traffic_data"]), 10)
+
+if __name__ == '__main__':
+    unittest.main()
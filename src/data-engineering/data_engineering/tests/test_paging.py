@@ -0,0 +1,66 @@
+from arcgis.features import GeoAccessor
+from data_engineering.paging import fetch_all_features, iter_feature_pages, plan_object_id_pages, plan_offset_pages
+from fakes import FakeFeatureLayer
+import pandas as pd
+import unittest
+
+
+def create_features(object_ids: list[int]) -> pd.DataFrame:
+    data_frame = pd.DataFrame({
+        "OBJECTID": object_ids,
+        "name": [f"station {object_id}" for object_id in object_ids],
+        "x": [8.6 + object_id / 10000 for object_id in object_ids],
+        "y": [50.1 for _ in object_ids],
+    })
+    return GeoAccessor.from_xy(data_frame, x_column="x", y_column="y", sr=4326)
+
+
+class TestPaging(unittest.TestCase):
+
+    def test_plan_object_id_pages(self):
+        self.assertEqual(plan_object_id_pages([5, 1, 2, 9, 30], 2), [(1, 2), (5, 9), (30, 30)])
+        self.assertEqual(plan_object_id_pages([], 10), [])
+        with self.assertRaises(ValueError):
+            plan_object_id_pages([1], 0)
+
+    def test_plan_offset_pages(self):
+        self.assertEqual(plan_offset_pages(25, 10), [(0, 10), (10, 10), (20, 5)])
+        self.assertEqual(plan_offset_pages(0, 10), [])
+
+    def test_fetch_all_features_by_object_id(self):
+        object_ids = list(range(1, 2501, 2))
+        feature_layer = FakeFeatureLayer(create_features(object_ids), max_record_count=100)
+        features = fetch_all_features(feature_layer, max_workers=4)
+        self.assertEqual(features["OBJECTID"].tolist(), object_ids)
+        self.assertIsNotNone(features.spatial, "DataFrame is not spatially enabled!")
+        self.assertLessEqual(feature_layer.max_active_queries, 4, "Too many concurrent requests!")
+        # One ids query and one query for every page
+        self.assertEqual(len(feature_layer.queries), 1 + 13)
+
+    def test_fetch_all_features_by_offset(self):
+        object_ids = list(range(1, 251))
+        feature_layer = FakeFeatureLayer(create_features(object_ids))
+        features = fetch_all_features(feature_layer, page_size=40, strategy="offset", max_workers=2)
+        self.assertEqual(features["OBJECTID"].tolist(), object_ids)
+        self.assertLessEqual(feature_layer.max_active_queries, 2, "Too many concurrent requests!")
+
+    def test_fetch_no_features(self):
+        feature_layer = FakeFeatureLayer(create_features(list(range(1, 11))))
+        for strategy in ("objectid", "offset"):
+            features = fetch_all_features(feature_layer, where="OBJECTID > 100", strategy=strategy)
+            self.assertTrue(features.empty)
+            self.assertListEqual(features.columns.tolist(), feature_layer.features.columns.tolist())
+            self.assertEqual(features.spatial.name, "SHAPE")
+
+    def test_iter_feature_pages_retries(self):
+        feature_layer = FakeFeatureLayer(create_features(list(range(1, 101))), failures=2)
+        pages = list(iter_feature_pages(feature_layer, page_size=30, backoff=0))
+        self.assertEqual([len(page) for page in pages], [30, 30, 30, 10])
+
+    def test_iter_feature_pages_gives_up(self):
+        feature_layer = FakeFeatureLayer(create_features(list(range(1, 11))), failures=10)
+        with self.assertRaises(ConnectionError):
+            list(iter_feature_pages(feature_layer, page_size=5, max_retries=1, backoff=0))
+
+if __name__ == '__main__':
+    unittest.main()
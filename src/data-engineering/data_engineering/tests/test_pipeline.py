@@ -0,0 +1,61 @@
+from contextlib import closing
+from sqlite3 import connect
+from synthetic import create_agent_pos_database
+from urban_traffic.pipeline import merge_partitions, rowid_partitions, run_traffic_pipeline
+from urban_traffic.utils import filter_commute_cars, prepare_traffic, read_traffic_sql
+import numpy as np
+import os
+import pandas as pd
+import pyarrow as pa
+import tempfile
+import unittest
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._database = os.path.join(self._temp_dir.name, "traffic.db")
+        create_agent_pos_database(self._database, 30_000, chunk_size=10_000)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_rowid_partitions(self):
+        partitions = rowid_partitions(self._database, 7)
+        self.assertEqual(len(partitions), 7)
+        self.assertEqual(partitions[0][0], 1)
+        self.assertEqual(partitions[-1][1], 30_001)
+        self.assertTrue(all(end == start for (_, end), (start, _) in zip(partitions[:-1], partitions[1:])))
+        self.assertEqual(len(rowid_partitions(self._database, 100_000)), 30_000)
+
+        empty_database = os.path.join(self._temp_dir.name, "empty.db")
+        with closing(connect(empty_database)) as connection:
+            connection.execute("CREATE TABLE agent_pos (trip INTEGER, person INTEGER);")
+        self.assertListEqual(rowid_partitions(empty_database, 4), [])
+        with self.assertRaises(ValueError):
+            rowid_partitions(self._database, 0)
+
+    def test_matches_single_process(self):
+        expected = filter_commute_cars(prepare_traffic(read_traffic_sql(self._database, 0))).reset_index(drop=True)
+        commute_cars = run_traffic_pipeline(self._database, max_workers=2, partition_count=5, spill_dir=self._temp_dir.name)
+        pd.testing.assert_frame_equal(commute_cars, expected)
+        self.assertListEqual(sorted(os.listdir(self._temp_dir.name)), ["traffic.db"])
+
+        prepared = run_traffic_pipeline(self._database, commute=False, compact=True, max_workers=2, partition_count=3)
+        self.assertEqual(len(prepared), 30_000)
+        self.assertEqual(prepared["longitude"].dtype, np.float32)
+
+    def test_merge_fills_missing_vehicle_types(self):
+        first = pa.table({"trip": pa.array([1, 2], pa.int64()), "car": pa.array([1, 0], pa.uint8()), "bus": pa.array([0, 1], pa.uint8())})
+        second = pa.table({"trip": pa.array([3], pa.int64()), "bike": pa.array([1], pa.uint8()), "car": pa.array([0], pa.uint8())})
+        merged = merge_partitions([first, second])
+        self.assertListEqual(list(merged.columns), ["trip", "car", "bus", "bike"])
+        self.assertListEqual(merged["bus"].tolist(), [0, 1, 0])
+        self.assertListEqual(merged["bike"].tolist(), [0, 0, 1])
+        self.assertEqual(merged["bike"].dtype, np.uint8)
+        self.assertTrue(merge_partitions([]).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from data_engineering.portal_cache import TTLCache, get_cached_item, get_portal_cache, invalidate_portal_cache
+from data_engineering.utils import get_charging_stations_layer, get_drawing_info, get_live_traffic_item
+from fakes import FakeFeatureLayer, FakeGIS, FakeItem
+import pandas as pd
+import unittest
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestPortalCache(unittest.TestCase):
+
+    def setUp(self):
+        self._feature_layer = FakeFeatureLayer(pd.DataFrame({"OBJECTID": [1]}))
+        self._gis = FakeGIS({
+            "bc3c97f73d6b4be4921be8560fbc325a": FakeItem("bc3c97f73d6b4be4921be8560fbc325a", [self._feature_layer]),
+            "ff11eb5b930b4fabba15c47feb130de4": FakeItem("ff11eb5b930b4fabba15c47feb130de4"),
+        })
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, clock=clock)
+        self.assertEqual(cache.get_or_load("key", lambda: 1), 1)
+        self.assertEqual(cache.get_or_load("key", lambda: 2), 1)
+        clock.now = 11
+        self.assertEqual(cache.get_or_load("key", lambda: 3), 3)
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 2, "evictions": 0, "size": 1})
+
+    def test_lru_eviction(self):
+        cache = TTLCache(max_size=2)
+        cache.get_or_load("a", lambda: 1)
+        cache.get_or_load("b", lambda: 2)
+        cache.get_or_load("a", lambda: 1)
+        cache.get_or_load("c", lambda: 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.get_or_load("b", lambda: 4), 4, "The least recently used entry was not evicted!")
+
+    def test_layer_lookups_are_cached(self):
+        for _ in range(3):
+            self.assertIs(get_charging_stations_layer(self._gis), self._feature_layer)
+            get_live_traffic_item(self._gis)
+        self.assertEqual(self._gis.content.get_calls, 2)
+
+        invalidate_portal_cache(self._gis)
+        get_charging_stations_layer(self._gis)
+        self.assertEqual(self._gis.content.get_calls, 3)
+
+    def test_missing_items_are_not_cached(self):
+        self.assertIsNone(get_cached_item(self._gis, "00000000000000000000000000000000"))
+        self.assertIsNone(get_cached_item(self._gis, "00000000000000000000000000000000"))
+        self.assertEqual(self._gis.content.get_calls, 2)
+        self.assertEqual(len(get_portal_cache(self._gis)), 0)
+
+    def test_drawing_info_is_cached(self):
+        drawing_info = get_drawing_info(self._gis, self._feature_layer)
+        drawing_info["renderer"]["type"] = "modified"
+        self.assertEqual(get_drawing_info(self._gis, self._feature_layer)["renderer"]["type"], "simple")
+        self.assertEqual(get_portal_cache(self._gis).hits, 1)
+
+if __name__ == '__main__':
+    unittest.main()
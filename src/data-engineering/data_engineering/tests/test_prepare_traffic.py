@@ -0,0 +1,44 @@
+from synthetic import create_agent_positions
+from urban_traffic.utils import filter_commute_cars, prepare_traffic
+import numpy as np
+import pandas as pd
+import unittest
+
+
+class TestPrepareTraffic(unittest.TestCase):
+
+    def test_prepare_traffic(self):
+        traffic_df = pd.DataFrame({
+            "trip": [1, 2, 3, 4],
+            "vehicle_type": ["Car", None, "bike", "car"],
+            "trip_time": ["2024-05-01T08:15:30", "2024-05-01T09:00:01", "2024-05-01T23:59:59", "2024-05-01T00:00:00"],
+        })
+        prepared = prepare_traffic(traffic_df)
+
+        self.assertListEqual(list(prepared.columns), ["trip", "hour", "minute", "second", "car", "pedestrian", "bike"])
+        self.assertListEqual(prepared["hour"].tolist(), [8, 9, 23, 0])
+        self.assertListEqual(prepared["minute"].tolist(), [15, 0, 59, 0])
+        self.assertListEqual(prepared["second"].tolist(), [30, 1, 59, 0])
+        self.assertListEqual(prepared["car"].tolist(), [1, 0, 0, 1])
+        self.assertListEqual(prepared["pedestrian"].tolist(), [0, 1, 0, 0])
+        self.assertListEqual(prepared["bike"].tolist(), [0, 0, 1, 0])
+        self.assertEqual(prepared["car"].dtype, np.uint8)
+        self.assertEqual(prepared["hour"].dtype, np.int64)
+        self.assertListEqual((prepared["hour"] - 9).tolist(), [-1, 0, 14, -9])
+        self.assertListEqual(list(traffic_df.columns), ["trip", "vehicle_type", "trip_time"], "The input DataFrame was modified!")
+
+    def test_prepare_traffic_inplace(self):
+        traffic_df = create_agent_positions(1000)
+        prepared = prepare_traffic(traffic_df, inplace=True)
+        self.assertIs(prepared, traffic_df)
+        self.assertNotIn("trip_time", traffic_df.columns)
+        self.assertTrue((traffic_df[["car", "bike", "bus", "pedestrian"]].sum(axis=1) == 1).all())
+
+    def test_filter_commute_cars(self):
+        commute_cars = filter_commute_cars(prepare_traffic(create_agent_positions(5000)))
+        self.assertGreater(len(commute_cars), 0)
+        self.assertTrue(commute_cars["hour"].isin([8, 9]).all())
+        self.assertTrue((commute_cars["car"] == 1).all())
+
+if __name__ == '__main__':
+    unittest.main()
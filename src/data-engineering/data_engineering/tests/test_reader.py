@@ -0,0 +1,59 @@
+from synthetic import create_agent_pos_database
+from urban_traffic.reader import build_traffic_query, iter_traffic_sql
+from datetime import datetime
+import os
+import pandas as pd
+import tempfile
+import unittest
+
+
+class TestReader(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls._filepath = os.path.join(cls._directory.name, "traffic.sqlite")
+        cls._agent_positions = create_agent_pos_database(cls._filepath, 5000)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def test_chunk_sizes(self):
+        chunks = list(iter_traffic_sql(self._filepath, chunk_size=1200))
+        self.assertEqual([len(chunk) for chunk in chunks], [1200, 1200, 1200, 1200, 200])
+        self.assertEqual(len(list(iter_traffic_sql(self._filepath, chunk_size=1000, limit=1500))), 2)
+
+    def test_predicate_pushdown(self):
+        bbox = (8.6, 50.1, 8.65, 50.15)
+        chunks = iter_traffic_sql(
+            self._filepath,
+            chunk_size=100,
+            columns=["trip", "longitude", "latitude"],
+            bbox=bbox,
+            time_window=(datetime(2024, 5, 1, 7), "2024-05-01T10:00:00"),
+            vehicle_types=["car", "pedestrian"])
+        traffic = pd.concat(chunks, ignore_index=True)
+
+        expected = self._agent_positions[
+            self._agent_positions["longitude"].between(8.6, 8.65)
+            & self._agent_positions["latitude"].between(50.1, 50.15)
+            & (self._agent_positions["trip_time"] >= "2024-05-01T07:00:00")
+            & (self._agent_positions["trip_time"] < "2024-05-01T10:00:00")
+            & self._agent_positions["vehicle_type"].fillna("pedestrian").str.lower().isin(["car", "pedestrian"])
+        ]
+        self.assertListEqual(list(traffic.columns), ["trip", "longitude", "latitude"])
+        self.assertGreater(len(expected), 0)
+        self.assertListEqual(traffic["trip"].tolist(), expected["trip"].tolist())
+
+    def test_lazy_geometry(self):
+        chunk = next(iter_traffic_sql(self._filepath, chunk_size=10, with_geometry=True))
+        self.assertIsNotNone(chunk.spatial, "DataFrame is not spatially enabled!")
+        self.assertNotIn("SHAPE", next(iter_traffic_sql(self._filepath, chunk_size=10)).columns)
+
+    def test_unknown_columns_are_rejected(self):
+        with self.assertRaises(ValueError):
+            build_traffic_query(["trip"], columns=["trip; DROP TABLE agent_pos"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+from arcgis.features import GeoAccessor
+from arcgis._impl.common._mixins import PropertyMap
+from data_engineering.portal_cache import get_cached_layer
+from data_engineering.result_cache import ResultCache
+from fakes import FakeFeatureLayer, FakeGIS, FakeItem
+from unittest import mock
+import os
+import pandas as pd
+import tempfile
+import unittest
+
+
+def create_features(object_ids: list[int], edit_dates: list[str]) -> pd.DataFrame:
+    data_frame = pd.DataFrame({
+        "OBJECTID": object_ids,
+        "Anzahl_Ladepunkte": [2 for _ in object_ids],
+        "EditDate": pd.to_datetime(edit_dates),
+        "x": [8.6 + object_id / 1000 for object_id in object_ids],
+        "y": [50.1 for _ in object_ids],
+    })
+    return GeoAccessor.from_xy(data_frame, x_column="x", y_column="y", sr=4326)
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._cache = ResultCache(self._directory.name)
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_incremental_refresh(self):
+        features = create_features([1, 2, 3], ["2024-01-01", "2024-01-02", "2024-01-03"])
+        feature_layer = FakeFeatureLayer(features, properties={"editFieldsInfo": {"editDateField": "EditDate"}})
+        self.assertEqual(len(self._cache.fetch(feature_layer)), 3)
+        self.assertEqual(self._cache.misses, 1)
+
+        # Edit the second, delete the third and add a fourth feature
+        edited = create_features([1, 2, 4], ["2024-01-01", "2024-01-05", "2024-01-06"])
+        edited.loc[1, "Anzahl_Ladepunkte"] = 4
+        feature_layer.features = edited
+        feature_layer.queries.clear()
+
+        refreshed = self._cache.fetch(feature_layer)
+        self.assertEqual(self._cache.refreshes, 1)
+        self.assertEqual(refreshed["OBJECTID"].tolist(), [1, 2, 4])
+        self.assertEqual(refreshed["Anzahl_Ladepunkte"].tolist(), [2, 4, 2])
+        self.assertIsNotNone(refreshed.spatial, "DataFrame is not spatially enabled!")
+        self.assertTrue(any("EditDate >= TIMESTAMP '2024-01-03 00:00:00'" in query["where"] for query in feature_layer.queries))
+
+    def test_unchanged_layer_is_served_from_cache(self):
+        features = create_features([1, 2], ["2024-01-01", "2024-01-02"])
+        feature_layer = FakeFeatureLayer(features, properties={"editingInfo": {"lastEditDate": 1704153600000}})
+        self._cache.fetch(feature_layer)
+        feature_layer.queries.clear()
+
+        cached = self._cache.fetch(feature_layer)
+        self.assertEqual(self._cache.hits, 1)
+        self.assertEqual(len(feature_layer.queries), 0, "The unchanged layer was queried again!")
+        self.assertEqual(cached["OBJECTID"].tolist(), [1, 2])
+
+        feature_layer.properties["editingInfo"]["lastEditDate"] = 1704240000000
+        self._cache.fetch(feature_layer)
+        self.assertEqual(self._cache.misses, 2)
+
+    def test_unchanged_edit_date_skips_refresh(self):
+        features = create_features([1, 2], ["2024-01-01", "2024-01-02"])
+        feature_layer = FakeFeatureLayer(features, properties={
+            "editFieldsInfo": {"editDateField": "EditDate"},
+            "editingInfo": {"lastEditDate": 1704153600000},
+        })
+        self._cache.fetch(feature_layer)
+        feature_layer.queries.clear()
+
+        self.assertEqual(self._cache.fetch(feature_layer)["OBJECTID"].tolist(), [1, 2])
+        self.assertEqual((self._cache.hits, self._cache.refreshes), (1, 0))
+        self.assertEqual(len(feature_layer.queries), 0, "The unchanged layer was refreshed!")
+
+        feature_layer.features = create_features([1, 2, 3], ["2024-01-01", "2024-01-02", "2024-01-03"])
+        feature_layer.properties["editingInfo"]["lastEditDate"] = 1704240000000
+        self.assertEqual(self._cache.fetch(feature_layer)["OBJECTID"].tolist(), [1, 2, 3])
+        self.assertEqual(self._cache.refreshes, 1)
+
+    def test_failed_write_keeps_the_cached_result(self):
+        feature_layer = FakeFeatureLayer(create_features([1, 2], ["2024-01-01", "2024-01-02"]), properties={
+            "editingInfo": {"lastEditDate": 1704153600000},
+        })
+        self._cache.fetch(feature_layer)
+
+        def write_partially(_, path: str):
+            with open(path, "wb") as file_out:
+                file_out.write(b"PAR1")
+            raise OSError("Simulated full disk!")
+
+        feature_layer.features = create_features([1, 2, 3], ["2024-01-01", "2024-01-02", "2024-01-03"])
+        feature_layer.properties["editingInfo"]["lastEditDate"] = 1704240000000
+        with mock.patch.object(GeoAccessor, "to_parquet", write_partially), self.assertRaises(OSError):
+            self._cache.fetch(feature_layer)
+        self.assertListEqual(sorted(os.path.splitext(filename)[1] for filename in os.listdir(self._directory.name)), [".json", ".parquet"])
+
+        # The previous result and its metadata are intact, the edited layer is fetched again
+        self.assertEqual(self._cache.fetch(feature_layer)["OBJECTID"].tolist(), [1, 2, 3])
+        self.assertEqual((self._cache.hits, self._cache.misses), (0, 3))
+
+    def test_layer_edited_while_its_handle_is_cached(self):
+        item_id = "bc3c97f73d6b4be4921be8560fbc325a"
+        feature_layer = FakeFeatureLayer(create_features([1, 2], ["2024-01-01", "2024-01-02"]), properties={
+            "editFieldsInfo": {"editDateField": "EditDate"},
+            "editingInfo": {"lastEditDate": 1704153600000},
+        })
+        gis = FakeGIS({item_id: FakeItem(item_id, [feature_layer])})
+        self._cache.fetch(get_cached_layer(gis, item_id))
+
+        # The service is edited, the cached layer handle still holds the previous metadata
+        feature_layer.features = create_features([1, 2, 3], ["2024-01-01", "2024-01-02", "2024-01-03"])
+        feature_layer.service_properties = PropertyMap({
+            **feature_layer.properties,
+            "editingInfo": {"lastEditDate": 1704240000000},
+        })
+        layer = get_cached_layer(gis, item_id)
+        self.assertIs(layer, feature_layer)
+        self.assertEqual(gis.content.get_calls, 1)
+
+        self.assertEqual(self._cache.fetch(layer)["OBJECTID"].tolist(), [1, 2, 3])
+        self.assertEqual((self._cache.hits, self._cache.refreshes), (0, 1))
+        self.assertEqual(feature_layer.hydrations, 2)
+
+    def test_cache_key(self):
+        url = "https://services.example.com/FeatureServer/0"
+        self.assertEqual(ResultCache.cache_key(url, out_fields=["b", "a"]), ResultCache.cache_key(url, out_fields="a,b"))
+        self.assertNotEqual(ResultCache.cache_key(url), ResultCache.cache_key(url, where="Gi_Bin>=3"))
+
+if __name__ == '__main__':
+    unittest.main()
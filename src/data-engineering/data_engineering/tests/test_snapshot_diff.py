@@ -0,0 +1,106 @@
+from arcgis.features import GeoAccessor
+from data_engineering.snapshot_diff import MISSING, diff_nested, diff_snapshots
+import numpy as np
+import pandas as pd
+import time
+import unittest
+
+
+def create_snapshot(row_count: int) -> pd.DataFrame:
+    object_ids = np.arange(1, row_count + 1)
+    return pd.DataFrame({
+        "OBJECTID": object_ids,
+        "Anzahl_Ladepunkte": object_ids % 4 + 1,
+        "Betreiber": np.where(object_ids % 2, "Mainova", "Stadtwerke"),
+        "x": 8.6 + object_ids / 1e6,
+        "y": np.full(row_count, 50.1),
+    })
+
+
+class TestSnapshotDiff(unittest.TestCase):
+
+    def test_diff_snapshots(self):
+        old_df = create_snapshot(6)
+        new_df = old_df.copy()
+        new_df.loc[1, "Anzahl_Ladepunkte"] = 10
+        new_df.loc[2, "x"] = 9.0
+        old = GeoAccessor.from_xy(old_df, x_column="x", y_column="y", sr=4326)
+        new = GeoAccessor.from_xy(new_df, x_column="x", y_column="y", sr=4326).drop(index=[5])
+        new = pd.concat([new, old.iloc[[0]].assign(OBJECTID=7)], ignore_index=True)
+        # The row order must not matter
+        new = new.iloc[::-1].reset_index(drop=True)
+
+        diff = diff_snapshots(old, new, columns=["Anzahl_Ladepunkte", "Betreiber", "SHAPE"])
+        self.assertListEqual(diff.added["OBJECTID"].tolist(), [7])
+        self.assertListEqual(diff.removed["OBJECTID"].tolist(), [6])
+        self.assertListEqual(sorted(diff.modified["OBJECTID"].tolist()), [2, 3])
+        self.assertTrue(diff.changed_columns.loc[2, "Anzahl_Ladepunkte"])
+        self.assertFalse(diff.changed_columns.loc[2, "SHAPE"])
+        self.assertTrue(diff.changed_columns.loc[3, "SHAPE"])
+        self.assertEqual(diff.summary()["changed_columns"], {"Anzahl_Ladepunkte": 1, "SHAPE": 1})
+
+    def test_large_snapshots(self):
+        old = create_snapshot(1_000_000)
+        old["SHAPE"] = [{"x": x, "y": y, "spatialReference": {"wkid": 4326}} for x, y in zip(old["x"].tolist(), old["y"].tolist())]
+        new = old.sample(frac=1.0, random_state=42).reset_index(drop=True)
+        new.loc[new["OBJECTID"] == 500, "Betreiber"] = "Neu"
+        moved = new.index[new["OBJECTID"] == 700][0]
+        new.at[moved, "SHAPE"] = {"x": 9.0, "y": 50.1, "spatialReference": {"wkid": 4326}}
+        new["Anzahl_Ladepunkte"] = new["Anzahl_Ladepunkte"].astype(np.float64)
+
+        started = time.perf_counter()
+        diff = diff_snapshots(old, new)
+        self.assertLess(time.perf_counter() - started, 10.0)
+        self.assertListEqual(sorted(diff.modified["OBJECTID"].tolist()), [500, 700])
+        self.assertTrue(diff.changed_columns.loc[700, "SHAPE"])
+        self.assertFalse(diff.changed_columns.loc[500, "SHAPE"])
+        self.assertTrue(diff.added.empty and diff.removed.empty)
+
+    def test_diff_polygon_geometries(self):
+        square = {"rings": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]], "spatialReference": {"wkid": 4326}}
+        old = pd.DataFrame({"OBJECTID": [1, 2, 3, 4, 5, 6], "SHAPE": [
+            square,
+            {"paths": [[[0, 0], [1, 1]], [[2, 2], [3, 3]]]},
+            {"rings": [[[0, 0, 5], [0, 1, 5], [1, 1, 5], [0, 0, 5]]], "hasZ": True},
+            None,
+            {"rings": [[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]},
+            {"x": None, "y": None},
+        ]})
+        new = old.copy()
+        new.at[1, "SHAPE"] = {"paths": [[[0, 0], [1, 1], [2, 2], [3, 3]]]}
+        new.at[2, "SHAPE"] = {"rings": [[[0, 0, 6], [0, 1, 6], [1, 1, 6], [0, 0, 6]]], "hasZ": True}
+        new.at[4, "SHAPE"] = {"rings": [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]}
+        new.at[5, "SHAPE"] = {"x": 1.0, "y": None}
+
+        diff = diff_snapshots(old, new)
+        self.assertListEqual(diff.modified["OBJECTID"].tolist(), [2, 3, 5, 6])
+        self.assertTrue(diff_snapshots(old, old.iloc[::-1].copy()).is_empty)
+
+    def test_duplicate_keys_are_rejected(self):
+        with self.assertRaises(ValueError):
+            diff_snapshots(pd.DataFrame({"OBJECTID": [1, 1]}), pd.DataFrame({"OBJECTID": [1]}))
+
+    def test_diff_nested(self):
+        old = {"type": "classBreaks", "classBreakInfos": [{"classMaxValue": 1}, {"classMaxValue": 2}], "field": "Gi_Bin"}
+        new = {"type": "classBreaks", "classBreakInfos": [{"classMaxValue": 1}, {"classMaxValue": 3}, {"classMaxValue": 4}], "legend": True}
+        self.assertListEqual(diff_nested(old, new), [
+            (("classBreakInfos", 1, "classMaxValue"), 2, 3),
+            (("classBreakInfos", 2), MISSING, {"classMaxValue": 4}),
+            (("field",), "Gi_Bin", MISSING),
+            (("legend",), MISSING, True),
+        ])
+        self.assertListEqual(diff_nested(old, old), [])
+
+    def test_diff_nested_deep_structures(self):
+        old, new = {}, {}
+        old_node, new_node = old, new
+        for _ in range(5000):
+            old_node["child"], new_node["child"] = {}, {}
+            old_node, new_node = old_node["child"], new_node["child"]
+        new_node["value"] = 1
+        differences = diff_nested(old, new)
+        self.assertEqual(len(differences), 1)
+        self.assertEqual(len(differences[0][0]), 5001)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+from synthetic import create_agent_pos_database
+from urban_traffic.geodesy import haversine_meters, radius_bbox
+from urban_traffic.spatial_index import build_traffic_index, query_traffic_radius
+import os
+import tempfile
+import unittest
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls._filepath = os.path.join(cls._directory.name, "traffic.sqlite")
+        cls._agent_positions = create_agent_pos_database(cls._filepath, 20000)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def test_haversine(self):
+        self.assertAlmostEqual(float(haversine_meters(8.0, 50.0, 8.0, 51.0)), 111_195, delta=1)
+        self.assertEqual(float(haversine_meters(8.62376, 50.11862, 8.62376, 50.11862)), 0.0)
+
+    def test_radius_bbox_contains_circle(self):
+        lon, lat, meters = 8.62376, 50.11862, 1000
+        xmin, ymin, xmax, ymax = radius_bbox(lon, lat, meters)
+        self.assertGreaterEqual(float(haversine_meters(lon, lat, xmin, lat)), meters - 1)
+        self.assertGreaterEqual(float(haversine_meters(lon, lat, lon, ymax)), meters - 1)
+
+    def test_query_traffic_radius(self):
+        self.assertEqual(build_traffic_index(self._filepath), len(self._agent_positions))
+        self.assertEqual(build_traffic_index(self._filepath), len(self._agent_positions), "The existing index was not reused!")
+
+        lon, lat, meters = 8.62376, 50.11862, 1500
+        traffic = query_traffic_radius(self._filepath, lon, lat, meters, columns=["trip", "vehicle_type"])
+        distances = haversine_meters(lon, lat, self._agent_positions["longitude"], self._agent_positions["latitude"])
+        expected = self._agent_positions[distances <= meters]
+
+        self.assertGreater(len(expected), 0)
+        self.assertListEqual(sorted(traffic["trip"].tolist()), sorted(expected["trip"].tolist()))
+        self.assertListEqual(list(traffic.columns), ["trip", "vehicle_type", "SHAPE"])
+        self.assertIsNotNone(traffic.spatial, "DataFrame is not spatially enabled!")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+from arcgis.features import Feature, FeatureSet
+from data_engineering.geometry import points_in_polygon, polygon_edges
+from synthetic import create_agent_positions, create_hotcold_features
+from urban_traffic.spatial_join import PolygonIndex, join_polygon_values
+import numpy as np
+import pandas as pd
+import unittest
+
+
+def create_hexagon(center_x: float, center_y: float, radius: float) -> list:
+    angles = np.radians(np.arange(0, 361, 60))
+    return [[[float(x), float(y)] for x, y in zip(center_x + radius * np.cos(angles), center_y + radius * np.sin(angles))]]
+
+
+class TestSpatialJoin(unittest.TestCase):
+
+    def test_lookup_matches_brute_force(self):
+        generator = np.random.default_rng(3)
+        rings = [create_hexagon(x, y, 0.6) for x in range(10) for y in range(10)]
+        index = PolygonIndex(rings, np.arange(len(rings)))
+        x = generator.uniform(-1, 11, 20000)
+        y = generator.uniform(-1, 11, 20000)
+        polygons = index.lookup_polygons(x, y, batch_size=3000)
+
+        expected = np.full(len(x), -1)
+        for polygon, polygon_rings in reversed(list(enumerate(rings))):
+            expected[points_in_polygon(x, y, polygon_edges(polygon_rings))] = polygon
+        np.testing.assert_array_equal(polygons, expected)
+        self.assertTrue((polygons == -1).any() and (polygons >= 0).any())
+
+    def test_holes(self):
+        rings = [[[[0, 0], [0, 10], [10, 10], [10, 0], [0, 0]], [[4, 4], [6, 4], [6, 6], [4, 6], [4, 4]]]]
+        index = PolygonIndex(rings, np.array([3]))
+        self.assertListEqual(index.lookup_polygons(np.array([1.0, 5.0]), np.array([1.0, 5.0])).tolist(), [0, -1])
+
+    def test_join_gi_bin(self):
+        hotcold_features = create_hotcold_features(cell_size=0.01)
+        feature_set = FeatureSet.from_dataframe(hotcold_features)
+        traffic_df = create_agent_positions(50000)
+        traffic_df.index = traffic_df.index + 100
+        gi_bin = join_polygon_values(feature_set, traffic_df)
+
+        self.assertEqual(gi_bin.name, "Gi_Bin")
+        self.assertTrue(gi_bin.index.equals(traffic_df.index))
+        self.assertEqual(str(gi_bin.dtype), "Int64")
+
+        # The squares start at the synthetic extent, so the cell follows from the coordinates
+        columns = np.floor((traffic_df["longitude"].to_numpy() - 8.55) / 0.01).astype(int)
+        rows = np.floor((traffic_df["latitude"].to_numpy() - 50.05) / 0.01).astype(int)
+        column_count = len(np.arange(8.55, 8.75, 0.01))
+        lookup = hotcold_features.set_index("OBJECTID")["Gi_Bin"]
+        sample = slice(0, 500)
+        expected = lookup.loc[rows[sample] * column_count + columns[sample] + 1].to_numpy()
+        np.testing.assert_array_equal(gi_bin.iloc[sample].to_numpy(dtype=np.int64), expected)
+
+    def test_join_web_mercator_polygons(self):
+        traffic_df = create_agent_positions(5000)
+        expected = join_polygon_values(FeatureSet.from_dataframe(create_hotcold_features(cell_size=0.01)), traffic_df)
+        feature_set = FeatureSet.from_dataframe(create_hotcold_features(cell_size=0.01, wkid=102100))
+        pd.testing.assert_series_equal(join_polygon_values(feature_set, traffic_df), expected)
+
+        feature_set.spatial_reference = {"wkid": 25832}
+        with self.assertRaises(ValueError):
+            join_polygon_values(feature_set, traffic_df)
+
+    def test_points_outside(self):
+        feature_set = FeatureSet([Feature(geometry={"rings": create_hexagon(0, 0, 1)}, attributes={"Gi_Bin": 3})], geometry_type="esriGeometryPolygon")
+        gi_bin = join_polygon_values(feature_set, pd.DataFrame({"longitude": [0.0, 5.0], "latitude": [0.0, 5.0]}))
+        self.assertEqual(gi_bin.iloc[0], 3)
+        self.assertTrue(pd.isna(gi_bin.iloc[1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+from arcgis.features import GeoAccessor
+from data_engineering.geometry import points_in_polygon, polygon_edges
+from data_engineering.result_cache import ResultCache
+from data_engineering.tiling import cover_tiles
+from data_engineering.utils import fetch_hotcold_features
+from fakes import FakeFeatureLayer, FakeGIS, FakeItem
+from synthetic import create_hotcold_features
+import numpy as np
+import pandas as pd
+import tempfile
+import unittest
+
+
+HOTCOLD_ITEM_ID = "6ee6272938624808956debfc17fcc958"
+
+
+class TestTiling(unittest.TestCase):
+
+    def setUp(self):
+        self._hotcold_layer = FakeFeatureLayer(create_hotcold_features(cell_size=0.01))
+        self._gis = FakeGIS({HOTCOLD_ITEM_ID: FakeItem(HOTCOLD_ITEM_ID, [self._hotcold_layer])})
+
+        # Two corridors in opposite corners of the city
+        generator = np.random.default_rng(7)
+        corridor_x = np.r_[generator.uniform(8.561, 8.569, 200), generator.uniform(8.731, 8.739, 200)]
+        corridor_y = np.r_[generator.uniform(50.061, 50.069, 200), generator.uniform(50.181, 50.189, 200)]
+        self._points = GeoAccessor.from_xy(pd.DataFrame({"x": corridor_x, "y": corridor_y}), x_column="x", y_column="y", sr=4326)
+
+    def test_points_in_polygon(self):
+        square_with_hole = polygon_edges([
+            [[0, 0], [0, 10], [10, 10], [10, 0], [0, 0]],
+            [[4, 4], [6, 4], [6, 6], [4, 6], [4, 4]],
+        ])
+        inside = points_in_polygon(np.array([1.0, 5.0, 11.0, 9.9]), np.array([1.0, 5.0, 5.0, 0.1]), square_with_hole, batch_size=8)
+        self.assertListEqual(inside.tolist(), [True, False, False, True])
+
+    def test_cover_tiles(self):
+        x = np.array([0.5, 1.5, 3.5, 0.2])
+        y = np.array([0.5, 0.5, 0.5, 2.5])
+        self.assertListEqual(cover_tiles(x, y, 1.0), [(0.0, 0.0, 2.0, 1.0), (3.0, 0.0, 4.0, 1.0), (0.0, 2.0, 1.0, 3.0)])
+        self.assertEqual(len(cover_tiles(x, y, 1.0, merge_rows=False)), 4)
+
+    def test_tile_cover_queries_fewer_features(self):
+        full_extent_features, _ = fetch_hotcold_features(self._gis, self._points)
+        tiled_features, drawing_info = fetch_hotcold_features(self._gis, self._points, tile_size=0.01)
+        exact_features, _ = fetch_hotcold_features(self._gis, self._points, tile_size=0.01, exact=True)
+
+        self.assertIn("renderer", drawing_info)
+        self.assertGreater(len(full_extent_features.features), 200)
+        self.assertLess(len(tiled_features.features), 30)
+        object_ids = [feature.attributes["OBJECTID"] for feature in tiled_features.features]
+        self.assertEqual(len(object_ids), len(set(object_ids)), "Duplicate features were returned!")
+        self.assertEqual(len(exact_features.features), 2)
+
+    def test_too_many_tiles_query_the_full_extent(self):
+        full_extent_features, _ = fetch_hotcold_features(self._gis, self._points)
+        query_count = len(self._hotcold_layer.queries)
+        tiled_features, _ = fetch_hotcold_features(self._gis, self._points, tile_size=0.001, max_tiles=10)
+
+        self.assertEqual(len(self._hotcold_layer.queries), query_count + 1)
+        self.assertEqual(len(tiled_features.features), len(full_extent_features.features))
+
+    def test_result_cache_with_tiles(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with self.assertRaises(ValueError):
+                fetch_hotcold_features(self._gis, self._points, result_cache=ResultCache(temp_dir), tile_size=0.01)
+
+    def test_exact_features_of_web_mercator_layer(self):
+        mercator_layer = FakeFeatureLayer(create_hotcold_features(cell_size=0.01, wkid=102100))
+        gis = FakeGIS({HOTCOLD_ITEM_ID: FakeItem(HOTCOLD_ITEM_ID, [mercator_layer])})
+        expected_ids = [feature.attributes["OBJECTID"] for feature in fetch_hotcold_features(self._gis, self._points, exact=True)[0].features]
+        self.assertEqual(len(expected_ids), 2)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for fetch_args in ({}, {"tile_size": 0.01}, {"result_cache": ResultCache(temp_dir)}):
+                feature_set, _ = fetch_hotcold_features(gis, self._points, exact=True, **fetch_args)
+                self.assertListEqual([feature.attributes["OBJECTID"] for feature in feature_set.features], expected_ids, fetch_args)
+                self.assertEqual(feature_set.spatial_reference["wkid"], 4326)
+
+if __name__ == '__main__':
+    unittest.main()
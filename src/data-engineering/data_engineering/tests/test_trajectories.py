@@ -0,0 +1,105 @@
+from synthetic import create_trips
+from urban_traffic.geodesy import EARTH_RADIUS_METERS
+from urban_traffic.trajectories import build_trajectories, collect_trajectories, order_positions, simplify_paths
+import numpy as np
+import pandas as pd
+import unittest
+
+
+def douglas_peucker(x: np.ndarray, y: np.ndarray, tolerance: float) -> list[int]:
+    """The recursive reference implementation using planar coordinates."""
+    def distances(start: int, end: int) -> np.ndarray:
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        length_squared = dx * dx + dy * dy
+        px, py = x[start + 1:end], y[start + 1:end]
+        t = np.clip(((px - x[start]) * dx + (py - y[start]) * dy) / length_squared, 0.0, 1.0) if 0 < length_squared else 0.0
+        return np.hypot(px - (x[start] + t * dx), py - (y[start] + t * dy))
+
+    def simplify(start: int, end: int) -> list[int]:
+        if end - start < 2:
+            return [start]
+        segment_distances = distances(start, end)
+        farthest = int(np.argmax(segment_distances))
+        if segment_distances[farthest] <= tolerance:
+            return [start]
+        return simplify(start, start + 1 + farthest) + simplify(start + 1 + farthest, end)
+
+    return simplify(0, len(x) - 1) + [len(x) - 1]
+
+
+class TestTrajectories(unittest.TestCase):
+
+    def setUp(self):
+        self._trips = create_trips(40, 200)
+
+    def test_order_positions(self):
+        order, offsets = order_positions(self._trips)
+        self.assertEqual(len(offsets), 41)
+        ordered = self._trips.iloc[order]
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            trip = ordered.iloc[start:end]
+            self.assertEqual(trip["trip"].nunique(), 1)
+            self.assertTrue(trip["trip_time"].is_monotonic_increasing)
+        self.assertTrue(ordered["trip"].is_monotonic_increasing)
+
+    def test_matches_recursive_douglas_peucker(self):
+        generator = np.random.default_rng(7)
+        paths = [generator.normal(0.0, 0.0005, (count, 2)).cumsum(axis=0) + [8.68, 50.11] for count in (1, 2, 3, 50, 300)]
+        offsets = np.concatenate([[0], np.cumsum([len(path) for path in paths])])
+        lon, lat = np.concatenate(paths).T
+        keep = simplify_paths(lon, lat, offsets, 20.0)
+
+        scale = np.radians(1.0) * EARTH_RADIUS_METERS
+        x, y = lon * scale * np.cos(np.radians(lat.mean())), lat * scale
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            expected = douglas_peucker(x[start:end], y[start:end], 20.0)
+            np.testing.assert_array_equal(np.flatnonzero(keep[start:end]), sorted(set(expected)))
+
+    def test_simplification_keeps_shape(self):
+        trajectories = collect_trajectories(self._trips)
+        simplified = trajectories.simplify(5.0)
+        self.assertEqual(len(simplified), 40)
+        self.assertLess(len(simplified.x), len(trajectories.x) / 10)
+
+        # Every dropped position is within the tolerance of its simplified trajectory
+        scale = np.radians(1.0) * EARTH_RADIUS_METERS
+        cos_lat = np.cos(np.radians(trajectories.y.mean()))
+        for index in range(len(trajectories)):
+            x = trajectories.x[trajectories.offsets[index]:trajectories.offsets[index + 1]] * scale * cos_lat
+            y = trajectories.y[trajectories.offsets[index]:trajectories.offsets[index + 1]] * scale
+            sx = simplified.x[simplified.offsets[index]:simplified.offsets[index + 1]] * scale * cos_lat
+            sy = simplified.y[simplified.offsets[index]:simplified.offsets[index + 1]] * scale
+            self.assertEqual((sx[0], sy[0], sx[-1], sy[-1]), (x[0], y[0], x[-1], y[-1]))
+            dx, dy = np.diff(sx)[None, :], np.diff(sy)[None, :]
+            t = np.clip(((x[:, None] - sx[None, :-1]) * dx + (y[:, None] - sy[None, :-1]) * dy) / (dx * dx + dy * dy), 0.0, 1.0)
+            deviations = np.hypot(x[:, None] - (sx[None, :-1] + t * dx), y[:, None] - (sy[None, :-1] + t * dy)).min(axis=1)
+            self.assertLessEqual(deviations.max(), 5.0 + 1e-6)
+
+    def test_zero_tolerance_keeps_corners(self):
+        lon = np.array([8.0, 8.001, 8.002, 8.002, 8.002])
+        lat = np.array([50.0, 50.0, 50.0, 50.001, 50.001])
+        keep = simplify_paths(lon, lat, np.array([0, 5]), 0.0)
+        np.testing.assert_array_equal(keep, [True, False, True, False, True])
+        with self.assertRaises(ValueError):
+            simplify_paths(lon, lat, np.array([0, 5]), -1.0)
+
+    def test_drops_single_positions(self):
+        trips = pd.concat([self._trips, self._trips.iloc[:1].assign(trip=1000)], ignore_index=True)
+        trajectories = collect_trajectories(trips)
+        self.assertEqual(len(trajectories), 40)
+        self.assertTrue((trajectories.attributes["point_count"] == 200).all())
+        self.assertTrue((trajectories.attributes["start_time"] < trajectories.attributes["end_time"]).all())
+
+    def test_build_trajectories(self):
+        routes = build_trajectories(self._trips, tolerance_meters=5.0)
+        self.assertEqual(len(routes), 40)
+        self.assertEqual(routes.spatial.geometry_type, ["polyline"])
+        self.assertEqual(routes["vertex_count"].sum(), sum(len(geometry["paths"][0]) for geometry in routes["SHAPE"]))
+        self.assertLess(routes["vertex_count"].sum(), len(self._trips) / 10)
+
+        empty_routes = collect_trajectories(self._trips.iloc[:0])
+        self.assertEqual(len(empty_routes), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()